@@ -9,15 +9,22 @@
 # Captures NMEA outputs from GPS card and allows user comments to be added
 # Records Long/Lat and comments in a table, and writes them to a CSV
 
+import atexit
 import base64
 from datetime import date
 import os
-import serial
-import serial.tools.list_ports as test_ser
-import simplekml
-import pynmea2 as gps
 from sys import version_info
-import webbrowser
+
+from gpstagger import coords, mapview, metrics, receiver
+from gpstagger.acquire import AveragingRequest, FixRequest
+from gpstagger.coords import Coordinate
+from gpstagger.csvout import COLUMNAR, CSVWriter
+from gpstagger.engine import make_serial
+from gpstagger.journal import Journal
+from gpstagger.kmlout import KMLWriter, to_kmz
+from gpstagger.reader import shared_reader, stop_all
+from gpstagger.spans import SPAN_FIELDS, span_lines, span_table
+from gpstagger.widgets import CoordsList
 
 try:
     import tkinter as tk  # Python 3.x
@@ -28,59 +35,68 @@ except ImportError:  # Python 2.x
     import tkMessageBox as tkMsg
     from tkFileDialog import asksaveasfilename
 
-if __name__ == '__main__':
-    root = tk.Tk()
-    root.withdraw()
-else:
-    root = tk.Tk()
-    root.deiconify()
-
-
-ser = serial.Serial()
-ser.baudrate = 9600
-ser.timeout = 1
+# Run on its own this has its own window; opened from the main tagger it's a
+# Toplevel of the main window and shares its GPS reader. See open_window()
+root = None
 
 # Feel free to add more here if you need them
-fields = 'gs_pri_pole_num', 'gs_pri_pole_coords', 'gs_secondary_1',\
-         'gs_secondary_2', 'gs_secondary_3', 'gs_secondary_4',\
-         'gs_secondary_5', 'gs_secondary_6', 'gs_secondary_7', 'gs_secondary_8',\
-         'gs_secondary_9', 'gs_secondary_10', 'gs_secondary_11', 'gs_secondary_12',\
-         'gs_secondary_13', 'gs_secondary_14', 'gs_secondary_15', 'gs_secondary_16',\
-         'gs_secondary_17', 'gs_secondary_18'
-
-labels = { 'gs_pri_pole_num':'Primary Pole #', 'gs_pri_pole_coords':'Primary Pole Coordinates',\
-           'gs_secondary_1':'Secondary #1', 'gs_secondary_2':'Secondary #2',\
-           'gs_secondary_3':'Secondary #3', 'gs_secondary_4':'Secondary #4',\
-           'gs_secondary_5':'Secondary #5', 'gs_secondary_6':'Secondary #6',\
-           'gs_secondary_7':'Secondary #7', 'gs_secondary_8':'Secondary #8',\
-           'gs_secondary_9':'Secondary #9', 'gs_secondary_10':'Secondary #10',\
-           'gs_secondary_11':'Secondary #11', 'gs_secondary_12':'Secondary #12',\
-           'gs_secondary_13':'Secondary #13', 'gs_secondary_14':'Secondary #14',\
-           'gs_secondary_15':'Secondary #15', 'gs_secondary_16':'Secondary #16',\
-           'gs_secondary_17':'Secondary #17', 'gs_secondary_18':'Secondary #18'
-         }
-
-# Iterate over all available ports and find the GPS
-ser_ports = list(test_ser.comports())
-
-for p in ser_ports:
-    if 'NMEA' in p.description:
-        ser.port = p.device
-        # Used for debugging
-        # print("GPS found at {0}\n{1}".format(p.device, p.description))
-if not ser.port:
-    no_gps_question = tkMsg.askyesno("Error", "No GPS Device found - do you wish to continue?")
-    if no_gps_question:
-        pass
-    else:
-        # ser.open() hasn't been called yet, nothing to flush
-        raise SystemExit
-
-
-# Initialize counter for iterating through secondaries
-# Starts at 1 (sorry...) because first field is Primary Pole
+# Secondaries aren't fields - there can be any number of them, see below
+fields = 'gs_pri_pole_num', 'gs_pri_pole_coords'
+
+labels = { 'gs_pri_pole_num':'Primary Pole #', 'gs_pri_pole_coords':'Primary Pole Coordinates' }
+
+
+def secondary_label(index):
+    return 'Secondary #{0}'.format(index + 1)
+
+# Keeps the port open and tracks the latest fix in the background
+gps_reader = None
+# Looks for the receiver when run on its own, see poll_port_finder()
+port_finder = None
+
+# The in-flight Get Long/Lat request, if any
+fix_request = None
+
+# Every keystroke and fix is journaled, so a crash before Save loses nothing.
+# It's kept in the one place, wherever this is started from, so it's always
+# found again; opened by open_window()
+journal_path = os.path.join(os.path.expanduser('~'), '.gpstagger', 'secondary_tagger.journal')
+journal = None
+
+# Every pole goes into one project KML, chosen on the first Save,
+# with span lengths and bearings alongside it in <project>_spans.csv
+kml_writer = None
+span_writer = None
+# Saving a primary pole within this many metres of another asks first
+duplicate_radius = 3.0
+# Set to True to also zip the project into a KMZ on quit
+save_kmz = False
+# Get Long/Lat holds out for at least this class of fix - 'gps', 'dgps',
+# 'float' (RTK float) or 'rtk' (RTK fixed) - for up to fix_timeout seconds
+fix_class = 'gps'
+fix_timeout = 30
+# Decimal places Long/Lat are shown and saved to when run on its own; opened
+# from the main tagger, it goes by that one's
+coord_precision = 7
+# The Map button shows the poles, secondaries and spans saved so far (and the
+# main tagger's poles, opened from there) over tiles from map_tile_url, a
+# {z}/{x}/{y} template for your own tile server or a provider that allows
+# offline use. Tiles are kept in ~/.gpstagger/tiles, up to map_cache_mb, for
+# when there's no signal. None only shows tiles already there, e.g. from
+# "python -m gpstagger tiles".
+map_tile_url = None
+map_cache_mb = 500
+
+
+# Secondaries for the current pole, as coords.Coordinate, or None for a skipped one
+secondaries = []
+# The fix put into Primary Pole Coordinates, kept at full precision
+primary_position = None
+
+# Which slot Get Long/Lat fills next: 0 is the Primary Pole Coordinates,
+# n is Secondary #n
 global counter
-counter = 1
+counter = 0
 
 # Fills root window with labels and text boxes
 def makeform(root, fields):
@@ -97,16 +113,91 @@ def makeform(root, fields):
     return entries
 
 
+def open_window(master=None, reader=None):
+    # Builds the window the first time, and brings it back after that
+    # With a master, it's a Toplevel driven by the master's mainloop
+    global root, gps_reader, journal, port_finder
+    if root is not None:
+        root.deiconify()
+        root.lift()
+        return root
+    if not os.path.isdir(os.path.dirname(journal_path)):
+        os.makedirs(os.path.dirname(journal_path))
+    journal = Journal(journal_path)
+    if master is None:
+        coords.PRECISION = coord_precision
+        root = tk.Tk()
+        root.withdraw()
+        # Tries the receiver from last time first, then scans - either way off
+        # the Tk thread, so a port that hangs on open can't hold up the form
+        port_finder = receiver.PortFinder()
+        port_finder.start()
+    else:
+        root = tk.Toplevel(master)
+        root.withdraw()
+        gps_reader = reader
+    get_input()
+    if master is None:
+        status_var.set("Looking for the GPS...")
+        root.after(200, poll_port_finder)
+        root.mainloop()
+    return root
+
+
+def poll_port_finder():
+    if not port_finder.done():
+        root.after(200, poll_port_finder)
+        return
+    if port_finder.ports:
+        set_reader(shared_reader(make_serial(port_finder.ports[0])))
+        status_var.set("GPS found on {0}".format(port_finder.ports[0]))
+        return
+    status_var.set("")
+    no_gps_question = tkMsg.askyesno("Error", "No GPS Device found - do you wish to continue?")
+    if not no_gps_question:
+        quit_prog()
+
+
+def set_reader(reader):
+    # For a receiver the main tagger found after this window was opened
+    global gps_reader
+    gps_reader = reader
+    if root is not None:
+        gps_button.config(state=tk.NORMAL)
+        average_check.config(state=tk.NORMAL)
+
+
 def get_input():
     global counter
     root.deiconify()
     root.title("GPS Secondary Tagger")
     ents = makeform(root, fields)
+    # Only a screenful of rows is ever built, however many secondaries there are
+    global secondary_view
+    secondary_view = CoordsList(root, secondaries, secondary_label,
+                                on_change=(lambda e=ents: save_draft(e)))
+    secondary_view.pack(side=tk.TOP, fill=tk.BOTH, expand=tk.YES)
     root.bind('<Return>', (lambda event, e=ents: fetch(e)))
-    # If there's no GPS, remove this button
-    if ser.port:
-        b1 = tk.Button(root, text="Get Long/Lat", command=(lambda e=ents: show_gps(e)))
-        b1.pack(side=tk.LEFT, padx=5, pady=5)
+    root.bind('<Escape>', (lambda event: cancel_gps()))
+    # Shows progress while waiting on a GPS fix
+    global status_var, gps_button, average_var, average_check
+    status_var = tk.StringVar()
+    status = tk.Label(root, textvariable=status_var, anchor='w')
+    status.pack(side=tk.BOTTOM, fill=tk.X, padx=5)
+    # Put back whatever was typed before a crash, then journal every keystroke
+    restore_draft(ents)
+    for field, ent in ents:
+        ent.bind('<KeyRelease>', (lambda event, e=ents: save_draft(e)))
+    gps_button = tk.Button(root, text="Get Long/Lat", command=(lambda e=ents: show_gps(e)))
+    gps_button.pack(side=tk.LEFT, padx=5, pady=5)
+    # Averages a window of good fixes instead of taking the first one
+    average_var = tk.IntVar()
+    average_check = tk.Checkbutton(root, text="Average", variable=average_var)
+    average_check.pack(side=tk.LEFT, padx=5, pady=5)
+    # No GPS (yet) - set_reader() turns these on if the main tagger finds one
+    if not gps_reader:
+        gps_button.config(state=tk.DISABLED)
+        average_check.config(state=tk.DISABLED)
     b2 = tk.Button(root, text="Save", command=(lambda e=ents: fetch(e)))
     b2.pack(side=tk.LEFT, padx=5, pady=5)
     b3 = tk.Button(root, text = "Clear All", command=(lambda e=ents: clear_entries(e)))
@@ -115,11 +206,15 @@ def get_input():
     b4.pack(side=tk.LEFT, padx=5, pady=5)
     b5 = tk.Button(root, text = "Previous", command=prev_entry)
     b5.pack(side=tk.LEFT, padx=5, pady=5)
+    b8 = tk.Button(root, text="Map", command=show_map)
+    b8.pack(side=tk.LEFT, padx=5, pady=5)
     b6 = tk.Button(root, text = "Help", command=help)
     b6.pack(side=tk.LEFT, padx=5, pady=5)
     b7 = tk.Button(root, text="Quit", command=quit_prog)
     b7.pack(side=tk.LEFT, padx=5, pady=5)
-    root.mainloop()
+    # Closing the window is the same as Quit - hidden, not destroyed, if it's
+    # part of the main tagger
+    root.protocol("WM_DELETE_WINDOW", quit_prog)
 
 
 # This is a HTML file encoded into base64, so I can launch a HTML webpage for help
@@ -180,6 +275,8 @@ def help():
     html = base64.b64decode(b64html).decode('utf-8', 'ignore')
     with open(path, 'w') as f:
         f.write(html)
+        # Only needed here, so it isn't imported until someone asks for help
+        import webbrowser
         webbrowser.open(url)
 
 
@@ -192,90 +289,203 @@ def quit_prog():
     # If program is launched as a stand-alone, Quit == Quit
     # If program is launched from main tagger, Quit == Hide
     if __name__ == '__main__':
+        close()
+        stop_all()
         raise SystemExit
     else:
         root.withdraw()
 
 
+def close():
+    # Called by the main tagger when it quits
+    close_kml()
+    if journal:
+        journal.close()
+
+
 def clear_entries(entries):
     for entry in entries:
         # Have to use the getter to get cleartext through
         # Have to use tkinter object for .delete and .insert
         text = entry[1]
         text.delete(0, tk.END)
-    global counter
-    counter = 1
+    # The view holds on to this list, so empty it rather than replacing it
+    del secondaries[:]
+    global counter, primary_position
+    counter = 0
+    primary_position = None
+    show_counter()
+    save_draft(entries)
+
+
+def save_draft(entries):
+    draft = dict((field, ent.get()) for field, ent in entries)
+    draft['secondaries'] = [s.to_list() if s else None for s in secondaries]
+    if primary_position:
+        draft['primary_position'] = primary_position.to_list()
+    journal.record_draft(draft)
+
+
+def restore_draft(entries):
+    global counter, primary_position
+    if not journal.draft or not any(journal.draft.values()):
+        return
+    for field, ent in entries:
+        ent.delete(0, tk.END)
+        ent.insert(0, journal.draft.get(field, ''))
+    secondaries[:] = [Coordinate.from_list(s) for s in journal.draft.get('secondaries', [])]
+    primary_position = Coordinate.from_list(journal.draft.get('primary_position'))
+    # Carry on from the first empty slot
+    counter = len(secondaries) + 1 if entries[1][1].get() else 0
+    show_counter()
+    status_var.set("Restored the unsaved form from last session")
 
 
 def next_entry():
     global counter
-    counter += 1
+    # One past the last secondary starts a new one
+    counter = min(counter + 1, len(secondaries) + 1)
+    show_counter()
 
 
 def prev_entry():
     global counter
-    counter -= 1
+    counter = max(counter - 1, 0)
+    show_counter()
+
+
+def show_counter():
+    secondary_view.select(counter - 1 if counter else None)
 
 
 def get_gps():
-    ser.open()
-    while True:
-        # Pull NMEA message, decode from binary, remove NULLs
-        raw_msg = ser.readline().decode().lstrip('\x00')
-        # $GPRMC is also useful, and contains speed as well
-        if raw_msg[0:6] == '$GPGGA':
-            break
-    msg = gps.parse(raw_msg)
-    ser.reset_input_buffer()
-    ser.reset_output_buffer()
-    ser.close()
-    return msg
+    # Latest fix from the reader thread - never touches the port, never blocks
+    with metrics.span('get_gps'):
+        return gps_reader.latest()
+
+
+def cancel_gps():
+    if fix_request:
+        fix_request.cancel()
+
+
+def show_map():
+    mapview.open_window(root.master or root, map_tile_url, map_cache_mb * 1024 * 1024)
+
+
+def get_kml_writer():
+    # Asks for the project KML the first time something is saved
+    global kml_writer, span_writer
+    if kml_writer is None:
+        kml_file_name = asksaveasfilename(title="Project KML Location",\
+                        defaultextension=".kml", filetypes=(("KML", "*.kml"),\
+                        ("All Files", "*.*")), initialfile=str(date.today()),\
+                        confirmoverwrite=False)
+        if not kml_file_name:
+            return None
+        kml_writer = KMLWriter(kml_file_name)
+        # Everything already in the project goes on the map
+        mapview.MAP.add_kml(kml_file_name)
+        span_writer = CSVWriter(os.path.splitext(kml_file_name)[0] + '_spans.csv',
+                                SPAN_FIELDS, COLUMNAR)
+        # Closes the document even if the main tagger quits out from under us
+        atexit.register(close_kml)
+    return kml_writer
+
+
+def close_kml():
+    if span_writer:
+        span_writer.close()
+    if kml_writer:
+        kml_writer.close()
+        if save_kmz:
+            to_kmz(kml_writer.path)
 
 
 def fetch(entries):
-    kml = simplekml.Kml()
-    inputs = {}
-    #span_coords = []
-    for entry in entries:
-        field = entry[0]
-        text = entry[1].get()
-        if field == 'gs_pri_pole_num':
-            pole_num = text
-        elif field == 'gs_pri_pole_coords':
-            if text:
-                coords_list = ''.join(text)
-                coords_list = coords_list.split(',')
-                geo_long = coords_list[0]
-                geo_lat = coords_list[1]
-                #span_coords.append([(geo_long, geo_lat)])
-                kml.newpoint(name=pole_num, coords=[(geo_long, geo_lat)])
-        else:
-            if text:
-                coords_list = ''.join(text)
-                coords_list = coords_list.split(',')
-                geo_long = coords_list[0]
-                geo_lat = coords_list[1]
-                #span_coords.append([(geo_long, geo_lat)])
-                kml.newpoint(name=labels[field], coords=[(geo_long, geo_lat)])
-    #print(span_coords)
-    #span = kml.newlinestring(name="Spans", coords=[span_coords])
-    kml_file_name = pole_num + '.kml'
-    kml.save(kml_file_name)
+    pole_num = entries[0][1].get()
+    if not pole_num:
+        tkMsg.showerror("Error", "Please input a Primary Pole # - it names the folder in the KML.")
+        return
+    placemarks = []
+    text = entries[1][1].get()
+    # The fix itself, unless it's been typed over since
+    primary = primary_position
+    if not primary or text.strip() != primary.format():
+        try:
+            primary = Coordinate.parse(text)
+        except ValueError:
+            tkMsg.showerror("Error", "{0} should look like Long,Lat.".format(labels['gs_pri_pole_coords']))
+            return
+    if primary:
+        placemarks.append((pole_num, primary.lon, primary.lat))
+    # Already Coordinates - no re-parsing of the form needed
+    named = [(secondary_label(i), s.lon, s.lat) for i, s in enumerate(secondaries) if s]
+    placemarks.extend(named)
+    # Spans run from the primary out to each secondary
+    span_rows = span_table(pole_num, primary, named) if primary else []
+
+    writer = get_kml_writer()
+    if not writer:
+        return
+    if writer.has_folder(pole_num):
+        if not tkMsg.askyesno("Just checking", "{0} is already in the project - add it again?".format(pole_num)):
+            return
+    if primary:
+        for metres, lat, lon, name, source in writer.poles.within(primary[1], primary[0], duplicate_radius):
+            if name != pole_num and not tkMsg.askyesno("Just checking",
+                    "{0} is {1:.1f} m from {2} - is it really a different pole?".format(pole_num, metres, name)):
+                return
+    # Only this pole's folder is written; the rest of the project is left alone
+    with metrics.span('secondary_save'):
+        writer.write_folder(pole_num, placemarks, span_lines(span_rows))
+        # All of the pole's spans in one go, on disk before the journal lets go
+        span_writer.write_many(span_rows)
+        span_writer.flush()
+    mapview.MAP.add_pole(pole_num, primary, named)
+    status_var.set("Saved {0} to {1}".format(pole_num, os.path.basename(writer.path)))
+    # It's all in the KML now, so the journal can start over
+    journal.mark_exported()
 
 
 def show_gps(entries):
-    msg = get_gps()
-    # Loop until a valid message is returned
-    while float(msg.latitude) == 0.0:
-        msg = get_gps()
-    field = entries[counter][0]
-    text = entries[counter][1]
-    text.delete(0, tk.END)
-    text.insert(0, float(msg.latitude))
-    text.insert(0, str(","))
-    text.insert(0, float(msg.longitude))
+    global fix_request
+    # Pressing the button again while waiting cancels the request
+    if fix_request and fix_request.active:
+        fix_request.cancel()
+        return
+    gps_button.config(text="Cancel GPS")
+    # Polls the reader from the mainloop, so the window stays responsive
+    on_done = (lambda msg, e=entries: fill_gps(e, msg))
+    if average_var.get() == 1:
+        fix_request = AveragingRequest(root, gps_reader.fixes_since, on_done, status_var.set,
+                                       fix_timeout, fix_class=fix_class)
+    else:
+        fix_request = FixRequest(root, get_gps, on_done, status_var.set, fix_timeout, fix_class)
+    fix_request.start()
+
+
+def fill_gps(entries, msg):
+    global primary_position
+    gps_button.config(text="Get Long/Lat")
+    # Timed out or cancelled
+    if not msg:
+        return
+    position = Coordinate.from_fix(msg)
+    if counter == 0:
+        field = labels['gs_pri_pole_coords']
+        primary_position = position
+        text = entries[1][1]
+        text.delete(0, tk.END)
+        text.insert(0, position.format())
+    else:
+        field = secondary_label(counter - 1)
+        secondary_view.set(counter - 1, position)
+    journal.record_fix(position.lat, position.lon, field=field, wait_s=round(fix_request.waited, 3))
+    save_draft(entries)
     # Once a valid message is returned, move to the next
-    if not text.get() == '0.0,0.0':
-        next_entry()
+    next_entry()
 
-get_input()
+
+if __name__ == '__main__':
+    open_window()
@@ -10,63 +10,151 @@
 # Records Long/Lat and comments in a table, and writes them to a CSV
 
 import base64
-import csv
+import importlib
 from datetime import date
 import random
 import os
-import serial
-import serial.tools.list_ports as test_ser
-import pynmea2 as gps
-import string
-import subprocess
-import sys
-import webbrowser
+import socket
+
+from gpstagger.acquire import AveragingRequest, FixRequest
+from gpstagger import coords, mapview, metrics, poleid, quality, receiver, validate
+from gpstagger.coords import format_number
+from gpstagger.csvout import PARAMETER
+from gpstagger.engine import CaptureEngine, open_receivers
+from gpstagger.multi import BEST
+from gpstagger.reader import stop_all
+from gpstagger.rtcm import CorrectionFeed
+from gpstagger.schema import FIELDS, LABELS, STAMP_FIELDS
 
 try:
     import tkinter as tk  # Python 3.x
     from tkinter import messagebox as tkMsg
     from tkinter.filedialog import asksaveasfilename
-    from importlib import reload
 except ImportError:  # Python 2.x
     import Tkinter as tk
     import tkMessageBox as tkMsg
     from tkFileDialog import asksaveasfilename
-    # Python 2.x has reload as a built-in
 
 root = tk.Tk()
 root.withdraw()
 
-ser = serial.Serial()
-ser.baudrate = 9600
-ser.timeout = 1
-
 # Used for various error checking
 pole_num_typo_deliberate = None
-line_ground_typo_deliberate = None
-
-fields = 'gs_equipment_location', 'gs_serial_number', 'gs_rated_input_voltage', \
-         'gs_rated_output_voltage', 'gs_substype_cd', 'gs_rated_kva', 'gs_phase', 'gs_secondary_feeds',\
-         'gs_amr_identification', 'long', 'lat', 'gs_height', 'gs_class'
-
-labels = { 'gs_equipment_location':'Pole #', 'gs_serial_number':'Transformer Serial #', 'gs_rated_input_voltage':'Vpri',\
-           'gs_rated_output_voltage':'Vsec', 'gs_substype_cd':'Overhead/Padmount', 'gs_rated_kva':'kVA',\
-           'gs_phase':'Phase', 'gs_secondary_feeds':'Secondary Feeds (Meter #s)',\
-           'gs_amr_identification':'Pole Meter #','long':'Longitude', 'lat':'Latitude',\
-           'gs_height':'Pole Height', 'gs_class':'Pole Class' }
+# Warnings from validate.check_entry() the user has said are deliberate
+deliberate_warnings = set()
+
+# The fields live in gpstagger/schema.py, so the command line uses the same ones
+fields = FIELDS
+labels = LABELS
+
+# How new CSVs are laid out - PARAMETER writes each entry as Parameter,Value rows,
+# COLUMNAR writes one row per entry with the fields above as the header
+# Existing files are always appended to in whatever layout they already use
+csv_layout = PARAMETER
+
+# Record every fix to <csv name>_track.fix while tagging, so positions can be
+# filled in or refined afterwards with "python -m gpstagger backfill"
+record_track = True
+# '.fix' is a compact binary log (export it with "python -m gpstagger fixes"),
+# '.csv' a CSV you can open straight away at about four times the size
+track_extension = '.fix'
+
+# Saving a pole within this many metres of one already in the CSV asks first
+duplicate_radius = 3.0
+
+# To use several receivers at once, list their ports here, e.g. ['COM3', 'COM7'].
+# Each capture takes the fix from whichever has the best accuracy right now, or
+# with receiver_mode = 'blend', a weighted average of them all.
+# 'all' uses every port that looks like a receiver, and None finds a single
+# receiver automatically.
+gps_ports = None
+receiver_mode = BEST
+
+# Get Long/Lat holds out for at least this class of fix - 'gps', 'dgps',
+# 'float' (RTK float) or 'rtk' (RTK fixed) - for up to fix_timeout seconds
+fix_class = 'gps'
+fix_timeout = 30
+
+# Decimal places Long/Lat are shown and saved to; 7 is about a centimetre.
+# Fixes are kept at full precision until the CSV is written.
+coord_precision = 7
+
+# RTCM corrections to feed the receiver, from a recorded file or a raw stream
+# on a local TCP port, e.g. 'tcp://127.0.0.1:2101'. None sends nothing.
+rtcm_source = None
+
+# The Map button shows every pole saved so far, with the Secondary Tagger's
+# secondaries and spans, over tiles from map_tile_url - a {z}/{x}/{y} template
+# for your own tile server or a provider that allows offline use. Tiles are
+# kept in ~/.gpstagger/tiles, up to map_cache_mb, for when there's no signal.
+# None only shows tiles already there, e.g. from "python -m gpstagger tiles".
+map_tile_url = None
+map_cache_mb = 500
+
+# Shows how long fixes, checks and saves have been taking under the status bar,
+# as a histogram of the recent ones and the median
+show_metrics = True
+status_spans = ('fix_wait', 'engine_check', 'engine_save', 'nmea_parse')
+status_counters = ('nmea_sentences', 'nmea_discarded', 'serial_retries')
+# Every timing and counter is also written here once a minute and on quit -
+# Prometheus text format for a .prom file, JSON otherwise. None writes nothing.
+metrics_file = None
+
+# The receiver that worked last time is tried first, and if it isn't there
+# every port is scanned - all in the background while the form comes up
+gps_reader = None
+port_finder = None
+correction_feed = None
+
+# The in-flight Get Long/Lat request, if any
+fix_request = None
+# The last fix put into the form, as a coords.Coordinate
+gps_position = None
+
+# The GPS Secondary Tagger module, once Secondary Capture has been pressed
+secondary = None
+
+# Opened once the form is up and a CSV has been picked, see open_csv()
+csv_file_name = None
+engine = None
+journal = None
+
+
+def attach_gps(ports):
+    global gps_reader, correction_feed
+    # Keeps the port(s) open and tracks the latest fix in the background
+    gps_reader = open_receivers(ports, mode=receiver_mode)
+    if rtcm_source:
+        # A mistyped file or a bad address shouldn't stop the tagger opening
+        try:
+            correction_feed = CorrectionFeed(rtcm_source, gps_reader)
+        except (IOError, OSError, socket.error, ValueError) as e:
+            tkMsg.showwarning("Corrections", "Couldn't read RTCM corrections from {0} ({1}) - carrying on without them.".format(rtcm_source, e))
+        else:
+            correction_feed.start()
+    if engine:
+        engine.attach_reader(gps_reader)
+    if secondary:
+        secondary.set_reader(gps_reader)
 
-# Iterate over all available ports and find the GPS
-ser_ports = list(test_ser.comports())
 
-for p in ser_ports:
-    if 'NMEA' in p.description:
-        ser.port = p.device
-if not ser.port:
+def poll_port_finder():
+    if not port_finder.done():
+        root.after(200, poll_port_finder)
+        return
+    if port_finder.ports:
+        attach_gps(port_finder.ports)
+        gps_button.config(state=tk.NORMAL)
+        average_check.config(state=tk.NORMAL)
+        status_var.set("GPS found on {0}".format(', '.join(port_finder.ports)))
+        return
+    # If there's no GPS, remove these buttons
+    gps_button.pack_forget()
+    average_check.pack_forget()
+    status_var.set("")
     no_gps_question = tkMsg.askyesno("Error", "No GPS Device found - do you wish to continue?")
-    if no_gps_question:
-        pass
-    else:
-        # ser.open() hasn't been called yet, nothing to flush
-        raise SystemExit
+    if not no_gps_question:
+        quit_prog()
 
 
 def get_save_loc():
@@ -77,15 +165,37 @@ def get_save_loc():
     return csv_file_name
 
 
-csv_file_name = get_save_loc()
-if not csv_file_name:
-    no_save_question = tkMsg.askyesno("Error", "You have not selected a savefile - do you wish to select one now?")
-    if no_save_question:
-        get_save_loc()
-    else:
-        pass
-# Open the serial port for the GPS
-#ser.open()
+def open_csv(entries):
+    global csv_file_name, engine, journal
+    # Draw the form before the dialogs go up
+    root.update_idletasks()
+    csv_file_name = get_save_loc()
+    if not csv_file_name:
+        no_save_question = tkMsg.askyesno("Error", "You have not selected a savefile - do you wish to select one now?")
+        if no_save_question:
+            csv_file_name = get_save_loc()
+        if not csv_file_name:
+            return
+
+    # The engine keeps the CSV open between saves, flushing periodically and on quit
+    # Every keystroke, fix and save hits the journal first, so a crash loses nothing
+    track_path = os.path.splitext(csv_file_name)[0] + '_track' + track_extension if record_track else None
+    engine = CaptureEngine(csv_file_name, fields + STAMP_FIELDS, csv_layout, gps_reader, track_path)
+    engine.duplicate_radius = duplicate_radius
+    journal = engine.journal
+    if engine.writer.path != csv_file_name:
+        tkMsg.showinfo("New CSV", "{0} doesn't have a column for every field, so entries are being saved to {1} instead.".format(
+            os.path.basename(csv_file_name), os.path.basename(engine.writer.path)))
+    # Everything already in the CSV goes on the map
+    mapview.MAP.add_index(engine.poles)
+    # Entries saved last session that never made it out of the CSV buffer
+    if engine.recovered:
+        tkMsg.showinfo("Recovered", "Recovered {0} saved entries that hadn't been written to the CSV.".format(len(engine.recovered)))
+    # Put back whatever was typed before a crash, then journal every keystroke
+    restore_draft(entries)
+    for field, ent in entries:
+        ent.bind('<KeyRelease>', (lambda event, e=entries: save_draft(e)))
+
 
 # Fills root window with labels and text boxes
 def makeform(root, fields):
@@ -114,23 +224,74 @@ def get_input():
     root.title("GPS Tagger")
     ents = makeform(root, fields)
     root.bind('<Return>', (lambda event, e=ents: fetch(e)))
-    # If there's no GPS, remove this button
-    if ser.port:
-        b1 = tk.Button(root, text="Get Long/Lat", command=(lambda e=ents: show_gps(e)))
-        b1.pack(side=tk.LEFT, padx=5, pady=5)
+    root.bind('<Escape>', (lambda event: cancel_gps()))
+    # Shows progress while waiting on a GPS fix
+    global status_var, fix_var, gps_button, average_var, average_check
+    status_var = tk.StringVar()
+    status = tk.Label(root, textvariable=status_var, anchor='w')
+    status.pack(side=tk.BOTTOM, fill=tk.X, padx=5)
+    # What kind of fix the receiver has right now
+    fix_var = tk.StringVar()
+    fix_label = tk.Label(root, textvariable=fix_var, anchor='w')
+    fix_label.pack(side=tk.BOTTOM, fill=tk.X, padx=5)
+    global metrics_var
+    metrics_var = tk.StringVar()
+    if show_metrics:
+        metrics_label = tk.Label(root, textvariable=metrics_var, anchor='w')
+        metrics_label.pack(side=tk.BOTTOM, fill=tk.X, padx=5)
+    gps_button = tk.Button(root, text="Get Long/Lat", command=(lambda e=ents: show_gps(e)))
+    gps_button.pack(side=tk.LEFT, padx=5, pady=5)
+    # Averages a window of good fixes instead of taking the first one
+    average_var = tk.IntVar()
+    average_check = tk.Checkbutton(root, text="Average", variable=average_var)
+    average_check.pack(side=tk.LEFT, padx=5, pady=5)
+    if not gps_reader:
+        # Still looking - enabled by poll_port_finder() if the scan finds one
+        gps_button.config(state=tk.DISABLED)
+        average_check.config(state=tk.DISABLED)
+        status_var.set("Looking for the GPS...")
+        root.after(200, poll_port_finder)
     #b2 = tk.Button(root, text="Save", command=(lambda e=ents: fetch(e)))
     #b2.pack(side=tk.LEFT, padx=5, pady=5)
     b3 = tk.Button(root, text="Save/Next Entry", command=(lambda e=ents: fetch(e)))
     b3.pack(side=tk.LEFT, padx=5, pady=5)
     b4 = tk.Button(root, text="Secondary Capture", command=secondary_capture)
     b4.pack(side=tk.LEFT, padx=5, pady=5)
+    b7 = tk.Button(root, text="Map", command=show_map)
+    b7.pack(side=tk.LEFT, padx=5, pady=5)
     b5 = tk.Button(root, text="Help", command=help)
     b5.pack(side=tk.LEFT, padx=5, pady=5)
     b6 = tk.Button(root, text="Quit", command=quit_prog)
     b6.pack(side=tk.LEFT, padx=5, pady=5)
+    # Closing the window should flush the CSV just like Quit does
+    root.protocol("WM_DELETE_WINDOW", quit_prog)
+    root.after(1000, poll_csv)
+    root.after(1000, poll_fix_status)
+    root.after(60000, poll_metrics)
+    root.after(0, (lambda e=ents: open_csv(e)))
     root.mainloop()
 
 
+def poll_csv():
+    if engine:
+        engine.poll()
+    root.after(1000, poll_csv)
+
+
+def poll_fix_status():
+    if gps_reader:
+        fix_var.set(quality.status_text(quality.fix_status(gps_reader.latest())))
+    if show_metrics:
+        metrics_var.set(metrics.summary(status_spans, status_counters))
+    root.after(1000, poll_fix_status)
+
+
+def poll_metrics():
+    if metrics_file:
+        metrics.dump(metrics_file)
+    root.after(60000, poll_metrics)
+
+
 # This is a HTML file encoded into base64, so I can launch a HTML webpage for help
 # The temporary file is stored temporarily in the path where the program is executed,
 # and removed once the program is exited
@@ -208,6 +369,8 @@ def help():
     html = base64.b64decode(b64html).decode('utf-8', 'ignore')
     with open(path, 'w') as f:
         f.write(html)
+        # Only needed here, so it isn't imported until someone asks for help
+        import webbrowser
         webbrowser.open(url)
 
 
@@ -216,6 +379,15 @@ def quit_prog():
         os.remove(os.path.abspath('temp_help.html'))
     except FileNotFoundError:
         pass
+    if engine:
+        engine.close()
+    if secondary:
+        secondary.close()
+    if correction_feed:
+        correction_feed.stop()
+    stop_all()
+    if metrics_file:
+        metrics.dump(metrics_file)
     raise SystemExit
 
 
@@ -241,16 +413,9 @@ def clear_entries(entries):
 
 def increment_pole_number(pole_field):
     global pole_num_typo_deliberate
-    text = pole_field[1].get()
-    mod_text = str(text)
-    last_ele = mod_text.split('-')[-1:][0]
-    last_alpha = ''.join(filter(lambda x: not x.isdigit(), mod_text))
+    text = str(pole_field[1].get())
 
-    if not any(x.isdigit() for x in last_ele):
-        # If the last element is entirely non-numeric, don't increment
-        pass
-    # Thanks to Brian on SO - https://stackoverflow.com/a/266162/4221094
-    elif not last_ele.translate(str.maketrans('', '', string.punctuation)) == last_ele:
+    if poleid.looks_like_typo(text):
         # If there are punctuation marks (assuming a typo), don't try to parse it
         # but also inquire if it was deliberate, so they can fix the error
         if not pole_num_typo_deliberate:
@@ -258,161 +423,162 @@ def increment_pole_number(pole_field):
             if typo_in_pole_name:
                 tkMsg.showinfo("", "OK! I won't ask you again.")
                 pole_num_typo_deliberate = True
-                pass
             else:
                 pole_num_typo_deliberate = False
                 return
-    else:
-        # Given an input like "BRW4-N6", it is split into ['BRW4', 'N6']
-        # The last element of the list is then converted into a string via slicing
-        # A filter is run to generate the numeric and non-numeric portions with .isdigit()
-        # It's all joined with map, with the original mod_text being sliced to exclude
-        # the last element, last_char, and last_num, which is incremented by one
-        last_num = int(''.join(filter(lambda x: x.isdigit(), last_ele)))
-        last_char = ''.join(filter(lambda x: not x.isdigit(), last_ele))
-
-        if "-" in mod_text:
-            if last_ele[1].isdigit() and last_ele[0].isalpha():
-                mod_text = '-'.join(map(str, mod_text.split('-')[:-1])) + '-' + last_char + str(last_num + 1)
-            else:
-                mod_text = '-'.join(map(str, mod_text.split('-')[:-1])) + '-' + str(last_num + 1) + last_char
-        # If the entry has no "-", e.g. BRW4, use this instead to avoid -BRW5
-        else:
-            mod_text = last_alpha + str(last_num + 1)
-    return mod_text
+        return text
+    # Given an input like "BRW4-N6", the grammar in gpstagger/poleid.py picks out
+    # the 6 and everything around it, and the next number that hasn't already been
+    # saved is put back in its place - BRW4-N7, or BRW4-N8 if N7 is taken.
+    # If the last part is entirely non-numeric, don't increment
+    if engine:
+        return engine.next_pole_number(text) or text
+    pole = poleid.parse(text)
+    return pole.with_number(pole.number + 1) if pole else text
 
 
 def get_gps():
-    ser.open()
-    while True:
-        # Pull NMEA message, decode from binary, remove NULLs
-        raw_msg = ser.readline().decode().lstrip('\x00')
-        # $GPRMC is also useful, and contains speed as well
-        if raw_msg[0:6] == '$GPGGA':
-            break
-    msg = gps.parse(raw_msg)
-    ser.reset_input_buffer()
-    ser.reset_output_buffer()
-    ser.close()
-    return msg
+    # Latest fix from the reader thread - never touches the port, never blocks
+    with metrics.span('get_gps'):
+        return gps_reader.latest()
+
+
+def cancel_gps():
+    if fix_request:
+        fix_request.cancel()
 
 
 def fetch(entries):
     if error_checking(entries):
-        clear_entries(entries)
+        # Grab everything before clear_entries() wipes (or increments) it
         inputs = {}
         for entry in entries:
             field = entry[0]
             text = entry[1].get()
             if text:
                 inputs[field] = str(text)
-        wrangle_data(inputs)
+        # Save the fix itself, unless Long/Lat have been typed over since
+        position = gps_position
+        if position and (inputs.get('long'), inputs.get('lat')) != (
+                format_number(position.lon), format_number(position.lat)):
+            position = None
+        clear_entries(entries)
+        wrangle_data(inputs, position)
+        save_draft(entries)
 
 
-def error_checking(entries):
-    global line_ground_typo_deliberate
-    common_input_voltages = ([2770, 4800, 7200, 12470, 13220, 22900, 19920, 34500,
-        39840, 69000, 66400, 115000, 132800, 230000, 199200, 345000,
-        288680, 500000, 441690, 765000])
-    common_output_voltages = [120, 208, 240, 415, 277, 480]
-    try:
-        if not entries[2][1].get() == '':
-            input_voltage = int(entries[2][1].get()) # gs_rated_input_voltage
-        else:
-            input_voltage = None
-        if not entries[3][1].get() == '':
-            output_voltage = int(entries[3][1].get()) # gs_rated_output_voltage
-        else:
-            output_voltage = None
-        if not entries[5][1].get() == '':
-            rated_kva = int(entries[3][1].get()) # gs_rated_kva
-    except ValueError:
-        tkMsg.showerror("Error", "Please only input numbers into voltage fields.")
+def save_draft(entries):
+    if journal:
+        journal.record_draft(dict((field, ent.get()) for field, ent in entries))
+
+
+def restore_draft(entries):
+    if not journal.draft or not any(journal.draft.values()):
         return
-    except TypeError:
-        pass
+    for field, ent in entries:
+        ent.delete(0, tk.END)
+        ent.insert(0, journal.draft.get(field, ''))
+    status_var.set("Restored the unsaved form from last session")
 
-    if  (
-        output_voltage in common_output_voltages[0::2]
-            and
-        input_voltage in common_input_voltages[1::2]
-        ):
-            if line_ground_typo_deliberate:
-                pass
-            else:
-                check_voltage_sanity = tkMsg.askyesno("Just checking", \
-                    "Did you mean to mix line-ground and line-phase voltages?")
-                if check_voltage_sanity:
-                    tkMsg.showinfo("", "OK! I won't ask you again.")
-                    line_ground_typo_deliberate = True
-                else:
-                    line_ground_typo_deliberate = False
-                    return
+
+def error_checking(entries):
+    inputs = dict((field, ent.get()) for field, ent in entries if ent.get())
+    # The engine adds a warning for poles already saved close by
+    errors, warnings = engine.check(inputs) if engine else validate.check_entry(inputs)
+    if errors:
+        tkMsg.showerror("Error", errors[0])
+        return
+    for code, message in warnings:
+        if code in deliberate_warnings:
+            continue
+        if tkMsg.askyesno("Just checking", message):
+            tkMsg.showinfo("", "OK! I won't ask you again.")
+            deliberate_warnings.add(code)
+        else:
+            return
     return True
 
 
 def show_gps(entries):
-    msg = get_gps()
-    # Loop until a valid message is returned
-    while float(msg.latitude) == 0.0:
-        msg = get_gps()
+    global fix_request
+    # Pressing the button again while waiting cancels the request
+    if fix_request and fix_request.active:
+        fix_request.cancel()
+        return
+    gps_button.config(text="Cancel GPS")
+    # Polls the reader from the mainloop, so data entry carries on while waiting
+    on_done = (lambda msg, e=entries: fill_gps(e, msg))
+    if average_var.get() == 1:
+        fix_request = AveragingRequest(root, gps_reader.fixes_since, on_done, status_var.set,
+                                       fix_timeout, fix_class=fix_class)
+    else:
+        fix_request = FixRequest(root, get_gps, on_done, status_var.set, fix_timeout, fix_class)
+    fix_request.start()
 
+
+def fill_gps(entries, msg):
+    global gps_position
+    gps_button.config(text="Get Long/Lat")
+    # Timed out or cancelled
+    if not msg:
+        return
+
+    gps_position = engine.record_fix(msg, wait_s=round(fix_request.waited, 3)) if engine \
+        else coords.Coordinate.from_fix(msg)
     # As entries are made in makeform() with an iterator, update Lat/Long here
     for entry in entries:
         field = entry[0]
         text = entry[1]
         if field == 'long':
             text.delete(0, tk.END)
-            text.insert(0, msg.longitude)
+            text.insert(0, format_number(gps_position.lon))
         elif field == 'lat':
             text.delete(0, tk.END)
-            text.insert(0, msg.latitude)
+            text.insert(0, format_number(gps_position.lat))
         else:
             pass
+    # How long it took, and with several receivers, which one it came from
+    status = quality.fix_status(msg) if hasattr(msg, 'gps_qual') else None
+    if status:
+        text = "{0} fix in {1:.1f}s".format(status.name, fix_request.waited)
+        if len(getattr(gps_reader, 'readers', ())) > 1 and getattr(msg, 'source', None):
+            text += " from {0}".format(msg.source)
+        status_var.set(text)
+    save_draft(entries)
+
+
+def wrangle_data(inputs, position=None):
+    if not engine:
+        tkMsg.showerror("Error", "No CSV save file was selected - restart to choose one.")
+        return
+    engine.save(inputs, position)
+    # Long/Lat are floats by now if they're anything
+    if isinstance(inputs.get('long'), float) and isinstance(inputs.get('lat'), float):
+        mapview.MAP.add_points([(inputs.get('gs_equipment_location'), inputs['long'], inputs['lat'])])
 
 
-def wrangle_data(inputs):
-    # Python 2 skips inserting blank rows if it's opened as a binary file
-    if sys.version_info.major == 2:
-        with open(csv_file_name, 'ab') as f:
-            writer = csv.writer(f)
-            if f.tell() == 0:
-                writer.writerow(["Parameter", "Value"])
-                for k,v in inputs.items():
-                    writer.writerow([k, v])
-                writer.writerow([]) # Inserts a blank row between entries
-            else:
-                for k,v in inputs.items():
-                    writer.writerow([k, v])
-                writer.writerow([])
-
-    # Naturally, Python 3 has a new way of dealing with this
-    else:
-        with open(csv_file_name, 'a', newline='') as f:
-            writer = csv.writer(f)
-            if f.tell() == 0:
-                writer.writerow(["Parameter", "Value"])
-                for k,v in inputs.items():
-                    writer.writerow([k, v])
-                writer.writerow([])
-            else:
-                for k,v in inputs.items():
-                    writer.writerow([k, v])
-                writer.writerow([])
+def show_map():
+    mapview.open_window(root, map_tile_url, map_cache_mb * 1024 * 1024)
 
 
 def secondary_capture():
-    try:
-        if 'python' in os.path.split(sys.executable)[1]:
-            try:
-                # Currently non-functional
-                GPS_Secondary_Tagger = reload(GPS_Secondary_Tagger)
-            except Exception:
-                GPS_Secondary_Tagger = __import__('GPS Secondary Tagger')
-        else:
-            subprocess.Popen('GPS Secondary Tagger.exe')
-    except FileNotFoundError:
-        tkMsg.showerror("File Not Found", "Secondary tagger not found")
-
-
+    global secondary
+    # Opened as a window of this one, sharing the GPS reader, so there's only
+    # ever one thing reading the port
+    if secondary is None:
+        try:
+            secondary = importlib.import_module('GPS Secondary Tagger')
+        except ImportError:
+            tkMsg.showerror("File Not Found", "Secondary tagger not found")
+            return
+    secondary.open_window(root, gps_reader)
+
+if gps_ports and gps_ports != receiver.ALL:
+    attach_gps(gps_ports)
+else:
+    # Tries the receiver from last time first, then scans - either way off
+    # the Tk thread, so a port that hangs on open can't hold up the form
+    port_finder = receiver.PortFinder(every=gps_ports == receiver.ALL)
+    port_finder.start()
+coords.PRECISION = coord_precision
 get_input()
@@ -0,0 +1,7 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------
+# gpstagger/__init__.py
+#
+# Created on: 2026-10-18
+#
+# Shared plumbing for GPS Tagger and GPS Secondary Tagger
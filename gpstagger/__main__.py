@@ -0,0 +1,16 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------
+# gpstagger/__main__.py
+#
+# Created on: 2026-10-18
+#
+# Lets the command line run as python -m gpstagger
+
+import sys
+
+from gpstagger.cli import main
+
+# Worker processes (see gpstagger/export.py) import this module again on
+# Windows, and mustn't start the command over
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------
+# gpstagger/acquire.py
+#
+# Created on: 2026-10-18
+#
+# Waits for a GPS fix without blocking the Tk mainloop, by polling the reader
+# thread's latest fix with root.after instead of looping in a button callback.
+#
+# A request can hold out for a fix class (see gpstagger.quality), e.g. RTK
+# float or better, for at most its timeout. How long it waited is kept in
+# .waited once it's done, so it can be journaled with the fix.
+
+import time
+
+from gpstagger import metrics
+from gpstagger.quality import CLASS_NAMES, QualityFilter, average_fixes, fix_status, meets
+
+
+class FixRequest(object):
+    # Milliseconds between checks of the latest fix
+    poll_interval = 100
+    # Seconds to wait for a fix before giving up
+    timeout = 30
+    # Span that successful requests are timed under, see gpstagger.metrics
+    metric = 'fix_wait'
+
+    def __init__(self, root, get_fix, on_done, on_status=None, timeout=None, fix_class=None):
+        # get_fix returns the latest message without blocking
+        # on_done is called once with the message, or None on timeout/cancel
+        # on_status gets a short progress string for the status bar
+        # fix_class is the worst fix class to accept, None for any real fix
+        self.root = root
+        self.get_fix = get_fix
+        self.on_done = on_done
+        self.on_status = on_status
+        if timeout is not None:
+            self.timeout = timeout
+        self.fix_class = fix_class
+        self.active = False
+        # Seconds from start() to done
+        self.waited = None
+        self._after_id = None
+        self._started = None
+
+    def _wanted(self):
+        return CLASS_NAMES[self.fix_class] + " fix" if self.fix_class else "GPS fix"
+
+    def start(self):
+        self.active = True
+        self._started = time.time()
+        self._poll()
+
+    def cancel(self):
+        if not self.active:
+            return
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+        metrics.count('fix_cancelled')
+        self._finish(None, "GPS request cancelled")
+
+    def _poll(self):
+        self._after_id = None
+        metrics.count('fix_polls')
+        msg = self.get_fix()
+        if meets(msg, self.fix_class):
+            self._finish(msg, "")
+            return
+        # What the receiver has got so far, if it's not enough
+        status = fix_status(msg)
+        have = ", have {0}".format(status.name) if status and status.rank else ""
+        elapsed = time.time() - self._started
+        if elapsed >= self.timeout:
+            metrics.count('fix_timeouts')
+            self._finish(None, "No {0} after {1}s{2} - try again".format(
+                self._wanted(), int(self.timeout), have))
+            return
+        self._status("Waiting for {0}... {1}/{2}s{3} (Esc to cancel)".format(
+            self._wanted(), int(elapsed), int(self.timeout), have))
+        self._after_id = self.root.after(self.poll_interval, self._poll)
+
+    def _finish(self, msg, status):
+        self.active = False
+        self.waited = time.time() - self._started
+        if msg is not None:
+            metrics.observe(self.metric, self.waited)
+        self._status(status)
+        self.on_done(msg)
+
+    def _status(self, text):
+        if self.on_status:
+            self.on_status(text)
+
+
+class AveragingRequest(FixRequest):
+    # Stop after this many good fixes, or after this many seconds if we have any
+    samples = 10
+    duration = 15
+    metric = 'fix_average'
+
+    def __init__(self, root, get_fixes, on_done, on_status=None, timeout=None,
+                 samples=None, duration=None, quality=None, fix_class=None):
+        # get_fixes is GPSReader.fixes_since; on_done gets an AveragedFix or None
+        FixRequest.__init__(self, root, None, on_done, on_status, timeout, fix_class)
+        self.get_fixes = get_fixes
+        if samples is not None:
+            self.samples = samples
+        if duration is not None:
+            self.duration = duration
+        self.quality = quality or QualityFilter(fix_class=fix_class)
+        self.accepted = []
+        self.rejected = 0
+        self._seq = None
+
+    def start(self):
+        # Only count fixes that arrive after the button was pressed
+        self._seq, _ = self.get_fixes(-1)
+        FixRequest.start(self)
+
+    def _poll(self):
+        self._after_id = None
+        metrics.count('fix_polls')
+        self._seq, msgs = self.get_fixes(self._seq)
+        for msg in msgs:
+            if self.quality.accepts(msg):
+                self.accepted.append(msg)
+            else:
+                self.rejected += 1
+                metrics.count('fix_rejected')
+
+        elapsed = time.time() - self._started
+        if len(self.accepted) >= self.samples or (self.accepted and elapsed >= self.duration):
+            avg = average_fixes(self.accepted)
+            self._finish(avg, "Averaged {0} fixes ({1} rejected), spread {2:.2f} m".format(
+                avg.samples, self.rejected, avg.spread))
+            return
+        if elapsed >= self.timeout:
+            metrics.count('fix_timeouts')
+            self._finish(None, "No usable {0}es after {1}s ({2} rejected) - try again".format(
+                self._wanted(), int(self.timeout), self.rejected))
+            return
+        self._status("Averaging... {0}/{1} fixes, {2} rejected (Esc to cancel)".format(
+            len(self.accepted), self.samples, self.rejected))
+        self._after_id = self.root.after(self.poll_interval, self._poll)
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------
+# gpstagger/bench.py
+#
+# Created on: 2026-10-18
+#
+# Offline benchmarks for the capture and save paths, run against a recorded
+# NMEA log or a repeatable synthetic one:
+#
+#   python -m gpstagger bench [--log day.nmea] [--epochs 2000] [--json out.json]
+#
+# framer       - sentences framed/filtered per second, and GGA parsed per second
+# time_to_fix  - from starting a reader on the log to the first usable fix
+# save         - latency of CaptureEngine.save() (what Save/Next Entry does)
+# kml          - folders per second through KMLWriter, a primary and 5 secondaries each
+
+from __future__ import print_function
+
+import json
+import os
+import shutil
+import tempfile
+
+from gpstagger import nmea
+from gpstagger.engine import CaptureEngine
+from gpstagger.kmlout import KMLWriter
+from gpstagger.metrics import clock
+from gpstagger.reader import GPSReader
+from gpstagger.replay import ReplaySerial, synthetic_log
+from gpstagger.spans import span_lines, span_table
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100.0))]
+
+
+def latency_stats(samples):
+    # Seconds in, milliseconds out
+    ms = [s * 1000 for s in samples]
+    return {'count': len(ms), 'mean_ms': sum(ms) / len(ms), 'p50_ms': percentile(ms, 50),
+            'p95_ms': percentile(ms, 95), 'max_ms': max(ms)}
+
+
+def bench_framer(data, chunk=4096):
+    framer = nmea.NMEAFramer()
+    start = clock()
+    lines = []
+    for i in range(0, len(data), chunk):
+        lines.extend(framer.feed(data[i:i + chunk]))
+    framed = clock() - start
+    start = clock()
+    parsed = [nmea.parse(line) for line in lines]
+    parse_time = clock() - start
+    return {'bytes': len(data), 'sentences': framer.sentences, 'kept': len(lines),
+            'sentences_per_s': framer.sentences / framed if framed else None,
+            'parsed_per_s': len(parsed) / parse_time if parse_time else None}
+
+
+def bench_time_to_fix(data, runs=5):
+    samples = []
+    for _ in range(runs):
+        reader = GPSReader(ReplaySerial(data, speed=None))
+        start = clock()
+        reader.start()
+        reader.wait_for_fix(timeout=10)
+        samples.append(clock() - start)
+        reader.stop()
+        reader.join()
+    return latency_stats(samples)
+
+
+def bench_save(count, workdir):
+    engine = CaptureEngine(os.path.join(workdir, 'bench.csv'))
+    samples = []
+    for i in range(count):
+        inputs = {'gs_equipment_location': 'BRW{0}'.format(i), 'gs_rated_input_voltage': '12470',
+                  'gs_rated_output_voltage': '240', 'gs_rated_kva': '25',
+                  'long': '-84.{0:06d}'.format(i), 'lat': '33.{0:06d}'.format(i)}
+        start = clock()
+        engine.save(inputs)
+        samples.append(clock() - start)
+    engine.close()
+    return latency_stats(samples)
+
+
+def bench_kml(count, workdir):
+    writer = KMLWriter(os.path.join(workdir, 'bench.kml'))
+    start = clock()
+    for i in range(count):
+        primary = (-84.0 + i * 1e-4, 33.0)
+        secondaries = [('Secondary #{0}'.format(n + 1), primary[0] + n * 1e-4, primary[1] + 1e-4)
+                       for n in range(5)]
+        rows = span_table('P{0}'.format(i), primary, secondaries)
+        writer.write_folder('P{0}'.format(i), [('P{0}'.format(i),) + primary] + secondaries,
+                            span_lines(rows))
+    writer.close()
+    elapsed = clock() - start
+    return {'folders': count, 'folders_per_s': count / elapsed if elapsed else None,
+            'bytes': os.path.getsize(writer.path)}
+
+
+def run(log=None, epochs=2000, seed=1, saves=500, folders=2000):
+    if log:
+        with open(log, 'rb') as f:
+            data = f.read()
+    else:
+        data = synthetic_log(epochs, seed)
+    workdir = tempfile.mkdtemp(prefix='gpstagger-bench-')
+    try:
+        return {'framer': bench_framer(data),
+                'time_to_fix': bench_time_to_fix(data),
+                'save': bench_save(saves, workdir),
+                'kml': bench_kml(folders, workdir)}
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def report(results, out=None):
+    for name, stats in results.items():
+        print(name)
+        for key in sorted(stats):
+            value = stats[key]
+            print("  {0:<16} {1}".format(key, '{0:.3f}'.format(value) if isinstance(value, float) else value))
+    if out:
+        with open(out, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
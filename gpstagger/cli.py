@@ -0,0 +1,457 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------
+# gpstagger/cli.py
+#
+# Created on: 2026-10-18
+#
+# Headless front end, for a vehicle PC with no screen or for scripting:
+#
+#   python -m gpstagger log fixes.csv
+#       Logs every fix the receiver reports until Ctrl-C (or --duration/--count),
+#       to a binary fix log instead if the file name ends in .fix
+#   python -m gpstagger fixes day.fix out.csv
+#       Exports a fix log, or the part of it between --start and --end, to a
+#       CSV, or to a KML track if out ends in .kml
+#   python -m gpstagger wait --fix-class rtk
+#       Waits (up to --timeout) for a fix at least that good, then prints it
+#       and how long it took
+#   python -m gpstagger ingest assets.csv output.csv
+#       Validates a batch of assets (either CSV layout) and saves them through
+#       the same journal and writer as the form, optionally stamping each one
+#       with the current GPS position
+#   python -m gpstagger check assets.csv
+#       Runs every asset in a CSV through the same checks as the form
+#   python -m gpstagger convert input.csv output.csv
+#       Converts a Parameter,Value CSV to one row per asset, with --crs adding
+#       each one's easting and northing in UTM or another projected CRS
+#   python -m gpstagger backfill assets.csv track.csv [track.csv ...] -o output.csv
+#       Fills in (or with --refine, replaces) asset positions from the track
+#       recorded while they were captured, matched by capture time
+#   python -m gpstagger export assets.csv [assets.csv ...] -o territory.kmz
+#       Renders every asset (with --secondary spans CSVs or project KMLs) to
+#       a KML per grid tile or --by field, in parallel, and zips them into a
+#       KMZ with an index of network links
+#   python -m gpstagger duplicates assets.csv [project.kml ...]
+#       Lists poles within --radius metres of each other across all the files
+#   python -m gpstagger nearest LAT LONG assets.csv [project.kml ...]
+#       Lists the -n poles nearest a point
+#   python -m gpstagger tiles --url URL assets.csv [project.kml ...]
+#       Fills the map's tile cache for the area the files cover (or --bbox)
+#       at each --zoom, so the map works there with no signal
+#   python -m gpstagger bench
+#       Runs the offline benchmarks in gpstagger/bench.py
+#
+# Anywhere a --port is taken, replay:path/to/log.nmea plays back a recorded log,
+# and --rtcm feeds the receiver corrections from a file or tcp://host:port.
+# --metrics out.prom (before the command) writes timings and counters for the
+# run, in Prometheus text format or, for any other extension, JSON.
+
+from __future__ import print_function
+
+import argparse
+import sys
+import time
+
+from gpstagger import bench, coords, export, metrics, quality, validate
+from gpstagger.coords import Coordinate, Projection
+from gpstagger.csvout import COLUMNAR, PARAMETER, CSVWriter, convert_to_columnar, read_records
+from gpstagger.engine import CaptureEngine, open_reader
+from gpstagger.fixlog import EXTENSION, FixLog, FixLogReader
+from gpstagger.fixlog import to_csv as fixes_to_csv, to_kml as fixes_to_kml
+from gpstagger.multi import BEST, BLEND
+from gpstagger.reader import stop_all
+from gpstagger.rtcm import CorrectionFeed
+from gpstagger.schema import CSV_FIELDS
+from gpstagger.spatial import index_files
+from gpstagger.tiles import CACHE_DIR, TileCache
+from gpstagger.track import TRACK_FIELDS, backfill, fix_row, to_epoch
+
+
+def get_reader(args):
+    # Several --port options read several receivers at once
+    ports = args.port[0] if args.port and len(args.port) == 1 else args.port
+    reader = open_reader(ports, args.baud, BLEND if args.blend else BEST)
+    if reader is None:
+        print("No GPS device found - use --port to pick one", file=sys.stderr)
+    return reader
+
+
+def start_corrections(args, reader):
+    if not args.rtcm:
+        return None
+    feed = CorrectionFeed(args.rtcm, reader)
+    feed.start()
+    return feed
+
+
+def cmd_log(args):
+    reader = get_reader(args)
+    if reader is None:
+        return 1
+    feed = start_corrections(args, reader)
+    binary = args.output.lower().endswith(EXTENSION)
+    writer = FixLog(args.output) if binary else CSVWriter(args.output, TRACK_FIELDS, COLUMNAR)
+    count = 0
+    seq = 0
+    deadline = time.time() + args.duration if args.duration else None
+    try:
+        while not (args.count and count >= args.count):
+            if deadline and time.time() >= deadline:
+                break
+            seq, msgs = reader.wait_since(seq, timeout=1)
+            for msg in msgs:
+                if binary:
+                    writer(msg, time.time())
+                else:
+                    writer.write(fix_row(msg))
+                count += 1
+            if not binary:
+                writer.poll()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if feed:
+            feed.stop()
+        writer.close()
+        stop_all()
+    print("Logged {0} fixes".format(count))
+    return 0
+
+
+def cmd_wait(args):
+    reader = get_reader(args)
+    if reader is None:
+        return 1
+    feed = start_corrections(args, reader)
+    started = time.time()
+    try:
+        msg = reader.wait_for_fix(args.timeout, lambda m: quality.meets(m, args.fix_class))
+    except KeyboardInterrupt:
+        msg = None
+    finally:
+        if feed:
+            feed.stop()
+        stop_all()
+    waited = time.time() - started
+    if msg is None:
+        metrics.count('fix_timeouts')
+        print("No {0} fix after {1:.1f}s, last: {2}".format(
+            quality.CLASS_NAMES[args.fix_class], waited,
+            quality.status_text(quality.fix_status(reader.latest()))), file=sys.stderr)
+        return 1
+    metrics.observe('fix_wait', waited)
+    print("{0} {1} after {2:.1f}s".format(
+        Coordinate.from_fix(msg).format(), quality.status_text(quality.fix_status(msg)), waited))
+    return 0
+
+
+def parse_time(text):
+    # Seconds since 1970, or a UTC time like 2026-10-18T14:30:00
+    try:
+        return float(text)
+    except ValueError:
+        return to_epoch(text)
+
+
+def cmd_fixes(args):
+    start = parse_time(args.start) if args.start else None
+    end = parse_time(args.end) if args.end else None
+    if not args.output:
+        with FixLogReader(args.input) as reader:
+            lo, hi = reader.index_range(start, end)
+            print("{0} fixes, {1} in range".format(len(reader), hi - lo))
+        return 0
+    if args.output.lower().endswith('.kml'):
+        written = fixes_to_kml(args.input, args.output, start, end, args.every)
+    else:
+        written = fixes_to_csv(args.input, args.output, start, end, args.every, args.crs)
+    print("Exported {0} fixes".format(written))
+    return 0
+
+
+def cmd_ingest(args):
+    reader = get_reader(args) if args.gps else None
+    if args.gps and reader is None:
+        return 1
+    engine = CaptureEngine(args.output, CSV_FIELDS, args.layout, reader, corrections=args.rtcm)
+    saved = rejected = 0
+    waits = []
+    try:
+        for n, inputs in enumerate(read_records(args.input), 1):
+            position = None
+            if reader and not (inputs.get('lat') and inputs.get('long')):
+                msg = engine.wait_for_fix(args.fix_timeout, args.fix_class)
+                waits.append(engine.last_wait)
+                if msg is None:
+                    print("Asset {0}: no {1} fix, saved without a position".format(
+                        n, quality.CLASS_NAMES[args.fix_class]), file=sys.stderr)
+                else:
+                    position = engine.record_fix(msg, asset=n, wait_s=round(engine.last_wait, 3))
+                    inputs['long'], inputs['lat'] = position
+            errors, warnings = engine.check(inputs)
+            for message in errors:
+                print("Asset {0}: {1}".format(n, message), file=sys.stderr)
+            for code, message in warnings:
+                print("Asset {0}: warning: {1}".format(n, message), file=sys.stderr)
+            if errors or (warnings and args.strict):
+                rejected += 1
+                continue
+            engine.save(inputs, position)
+            saved += 1
+    finally:
+        engine.close()
+        stop_all()
+    print("Saved {0} assets, rejected {1}".format(saved, rejected))
+    if waits:
+        print("Waited {0:.1f}s for fixes in all, {1:.1f}s at most".format(sum(waits), max(waits)))
+    return 0 if not rejected else 2
+
+
+def cmd_check(args):
+    results = validate.check_records(read_records(args.input))
+    failed = 0
+    for n, (errors, warnings) in enumerate(results, 1):
+        for message in errors:
+            print("Asset {0}: {1}".format(n, message))
+        for code, message in warnings:
+            print("Asset {0}: warning: {1}".format(n, message))
+        if errors or (warnings and args.strict):
+            failed += 1
+    print("Checked {0} assets, {1} failed".format(len(results), failed))
+    return 0 if not failed else 2
+
+
+def cmd_convert(args):
+    print("Converted {0} records".format(convert_to_columnar(args.input, args.output, CSV_FIELDS, args.crs)))
+    return 0
+
+
+def cmd_backfill(args):
+    assets, positioned = backfill(args.input, args.track, args.output, args.refine, args.max_gap)
+    print("Positioned {0} of {1} assets from the track".format(positioned, assets))
+    return 0
+
+
+def cmd_export(args):
+    assets, skipped, parts = export.export(args.input, args.output, args.secondary or (),
+                                           args.by, args.tile, args.jobs)
+    print("Exported {0} assets in {1} partitions to {2}".format(assets, parts, args.output))
+    if skipped:
+        print("{0} assets had no position and were left out".format(skipped), file=sys.stderr)
+    return 0
+
+
+def pole_text(pole):
+    lat, lon, name, source = pole
+    return "{0} ({1},{2}) in {3}".format(name or '(no pole #)', lon, lat, source)
+
+
+def cmd_duplicates(args):
+    pairs = index_files(args.files).duplicates(args.radius)
+    for metres, pole, other in pairs:
+        print("{0:.1f} m: {1} / {2}".format(metres, pole_text(pole), pole_text(other)))
+    print("{0} pairs within {1} m".format(len(pairs), args.radius))
+    return 0
+
+
+def cmd_nearest(args):
+    for found in index_files(args.files).nearest(args.lat, args.long, args.n):
+        print("{0:.1f} m: {1}".format(found[0], pole_text(found[1:])))
+    return 0
+
+
+def cmd_tiles(args):
+    if args.bbox:
+        south, west, north, east = args.bbox
+    else:
+        points = [(lat, lon) for cell in index_files(args.files).cells.values()
+                  for lat, lon, name, source in cell]
+        if not points:
+            print("No positions in {0} - give --bbox instead".format(', '.join(args.files)), file=sys.stderr)
+            return 1
+        lats = [p[0] for p in points]
+        lons = [p[1] for p in points]
+        south, west = min(lats) - args.margin, min(lons) - args.margin
+        north, east = max(lats) + args.margin, max(lons) + args.margin
+    cache = TileCache(args.cache, args.url, args.max_mb * 1024 * 1024)
+
+    def progress(done, total):
+        if done % 100 == 0 or done == total:
+            print("\r{0} of {1} tiles".format(done, total), end='', file=sys.stderr)
+            sys.stderr.flush()
+
+    try:
+        fetched, cached, failed = cache.seed(south, west, north, east, args.zoom, progress)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+    print(file=sys.stderr)
+    print("Fetched {0} tiles, {1} already cached, {2} failed; the cache holds {3:.1f} MB".format(
+        fetched, cached, failed, cache.size / 1048576.0))
+    return 0 if not failed else 2
+
+
+def bbox_arg(text):
+    # south,west,north,east
+    try:
+        south, west, north, east = [float(v) for v in text.split(',')]
+    except ValueError:
+        raise argparse.ArgumentTypeError("expected south,west,north,east: {0!r}".format(text))
+    return south, west, north, east
+
+
+def zoom_arg(text):
+    # 15, or a range like 12-17
+    try:
+        first, _, last = text.partition('-')
+        return list(range(int(first), int(last or first) + 1))
+    except ValueError:
+        raise argparse.ArgumentTypeError("expected a zoom level or a range like 12-17: {0!r}".format(text))
+
+
+def cmd_bench(args):
+    bench.report(bench.run(args.log, args.epochs, args.seed, args.saves, args.folders), args.json)
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='gpstagger', description="Headless GPS Tagger")
+    parser.add_argument('--metrics', help="write timings and counters here when done (.prom or .json)")
+    sub = parser.add_subparsers(dest='command')
+    sub.required = True
+
+    def add_gps_options(p):
+        p.add_argument('--port', action='append',
+                       help="serial port of the receiver (default: find it); repeat for several receivers, "
+                            "or 'all' for every port that looks like one")
+        p.add_argument('--baud', type=int, default=9600)
+        p.add_argument('--blend', action='store_true',
+                       help="with several receivers, average their fixes instead of taking the best")
+        p.add_argument('--rtcm', help="feed RTCM corrections to the receiver from a file or tcp://host:port")
+
+    def add_crs(p):
+        p.add_argument('--crs', type=crs_arg,
+                       help="also give positions as easting/northing in this CRS: utm, utm:17n, "
+                            "or an EPSG code such as a state plane zone (needs pyproj)")
+
+    def add_fix_class(p, default):
+        p.add_argument('--fix-class', choices=quality.FIX_CLASSES, default=default,
+                       help="worst fix to accept (default: {0})".format(default))
+
+    p = sub.add_parser('log', help="log every fix from the receiver to a CSV")
+    add_gps_options(p)
+    p.add_argument('--duration', type=float, help="stop after this many seconds")
+    p.add_argument('--count', type=int, help="stop after this many fixes")
+    p.add_argument('output')
+    p.set_defaults(func=cmd_log)
+
+    p = sub.add_parser('wait', help="wait for a fix of at least a given class")
+    add_gps_options(p)
+    add_fix_class(p, 'rtk')
+    p.add_argument('--timeout', type=float, default=120, help="seconds to wait (default 120)")
+    p.set_defaults(func=cmd_wait)
+
+    p = sub.add_parser('fixes', help="export a binary fix log to CSV or KML")
+    p.add_argument('--start', help="UTC time (2026-10-18T14:30:00) or seconds since 1970")
+    p.add_argument('--end', help="UTC time or seconds since 1970, not included")
+    p.add_argument('--every', type=int, default=1, help="keep every nth fix")
+    p.add_argument('input')
+    p.add_argument('output', nargs='?', help="a .csv or .kml; leave out to just count the fixes")
+    p.add_argument('--precision', type=int,
+                   help="decimal places for Long/Lat (default {0})".format(coords.PRECISION))
+    add_crs(p)
+    p.set_defaults(func=cmd_fixes)
+
+    p = sub.add_parser('ingest', help="validate and save a batch of assets")
+    add_gps_options(p)
+    add_fix_class(p, 'gps')
+    p.add_argument('--gps', action='store_true', help="stamp assets without lat/long with the current fix")
+    p.add_argument('--fix-timeout', type=float, default=30, help="seconds to wait for a fix per asset")
+    p.add_argument('--strict', action='store_true', help="reject assets with warnings too")
+    p.add_argument('--layout', choices=(PARAMETER, COLUMNAR), default=PARAMETER,
+                   help="layout for a new output file")
+    p.add_argument('input')
+    p.add_argument('output')
+    p.set_defaults(func=cmd_ingest)
+
+    p = sub.add_parser('check', help="check every asset in a CSV")
+    p.add_argument('--strict', action='store_true', help="count assets with warnings as failed too")
+    p.add_argument('input')
+    p.set_defaults(func=cmd_check)
+
+    p = sub.add_parser('convert', help="convert a Parameter,Value CSV to one row per asset")
+    p.add_argument('input')
+    p.add_argument('output')
+    add_crs(p)
+    p.set_defaults(func=cmd_convert)
+
+    p = sub.add_parser('backfill', help="position assets from a recorded track by capture time")
+    p.add_argument('--refine', action='store_true', help="replace positions the assets already have")
+    p.add_argument('--max-gap', type=float, default=5,
+                   help="seconds between track fixes beyond which an asset isn't positioned")
+    p.add_argument('-o', '--output', required=True)
+    p.add_argument('input')
+    p.add_argument('track', nargs='+', help="track CSVs or .fix logs, e.g. the _track.csv next to the asset CSV")
+    p.set_defaults(func=cmd_backfill)
+
+    p = sub.add_parser('export', help="export a whole project to a KMZ, a KML per partition")
+    p.add_argument('-o', '--output', required=True, help="a .kmz, or a folder for the KMLs")
+    p.add_argument('--secondary', action='append',
+                   help="Secondary Tagger spans CSV or project KML; repeat for several")
+    p.add_argument('--by', help="partition by this field (e.g. a feeder column) instead of grid tiles")
+    p.add_argument('--tile', type=float, default=export.TILE_SIZE,
+                   help="grid tile size in degrees (default {0})".format(export.TILE_SIZE))
+    p.add_argument('--jobs', type=int, help="worker processes (default: one per CPU)")
+    p.add_argument('input', nargs='+', help="asset CSVs, either layout")
+    p.set_defaults(func=cmd_export)
+
+    p = sub.add_parser('duplicates', help="find poles captured more than once under different numbers")
+    p.add_argument('--radius', type=float, default=3, help="metres (default 3)")
+    p.add_argument('files', nargs='+', help="asset CSVs and/or Secondary Tagger project KMLs")
+    p.set_defaults(func=cmd_duplicates)
+
+    p = sub.add_parser('nearest', help="list the poles nearest a point")
+    p.add_argument('-n', type=int, default=5)
+    p.add_argument('lat', type=float)
+    p.add_argument('long', type=float)
+    p.add_argument('files', nargs='+', help="asset CSVs and/or Secondary Tagger project KMLs")
+    p.set_defaults(func=cmd_nearest)
+
+    p = sub.add_parser('tiles', help="fill the map's tile cache for an area, for use offline")
+    p.add_argument('--url', required=True, help="tile URL template, e.g. https://tiles.example.com/{z}/{x}/{y}.png")
+    p.add_argument('--bbox', type=bbox_arg, help="south,west,north,east instead of the files' extent")
+    p.add_argument('--margin', type=float, default=0.005,
+                   help="degrees added around the files' extent (default 0.005)")
+    p.add_argument('--zoom', type=zoom_arg, default=zoom_arg('12-17'), help="zoom levels (default 12-17)")
+    p.add_argument('--cache', default=CACHE_DIR, help="cache folder (default {0})".format(CACHE_DIR))
+    p.add_argument('--max-mb', type=int, default=500, help="cache size limit (default 500 MB)")
+    p.add_argument('files', nargs='*', help="asset CSVs and/or Secondary Tagger project KMLs")
+    p.set_defaults(func=cmd_tiles)
+
+    p = sub.add_parser('bench', help="benchmark parsing, time-to-fix, saving and KML export")
+    p.add_argument('--log', help="recorded NMEA log to use (default: a synthetic one)")
+    p.add_argument('--epochs', type=int, default=2000, help="length of the synthetic log")
+    p.add_argument('--seed', type=int, default=1, help="seed for the synthetic log")
+    p.add_argument('--saves', type=int, default=500)
+    p.add_argument('--folders', type=int, default=2000)
+    p.add_argument('--json', help="also write the results here")
+    p.set_defaults(func=cmd_bench)
+    return parser
+
+
+def crs_arg(text):
+    try:
+        return Projection(text)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if getattr(args, 'precision', None) is not None:
+        coords.PRECISION = args.precision
+    try:
+        return args.func(args)
+    finally:
+        if args.metrics:
+            metrics.dump(args.metrics)
@@ -0,0 +1,295 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------
+# gpstagger/coords.py
+#
+# Created on: 2026-10-18
+#
+# Positions as numbers from the receiver to the file. A Coordinate holds the
+# fix as float64 Long/Lat along with what's known about it (fix quality,
+# HDOP, satellites, which receiver), and is what the taggers and the engine
+# pass around; text only comes into it when something is shown in the form
+# or written out to a CSV or KML, at PRECISION decimal places.
+#
+# Exports can also give positions in a projected CRS - UTM, or with pyproj
+# installed any EPSG code, e.g. a state plane zone - converted a batch at a
+# time rather than point by point:
+#
+#   utm                 the UTM zone the data is in (WGS84)
+#   utm:17n             a given UTM zone
+#   EPSG:2240           anything else pyproj knows (needs pyproj)
+
+import math
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional
+    np = None
+
+try:
+    import pyproj
+except ImportError:  # Only needed for CRSs other than UTM
+    pyproj = None
+
+# Decimal places of a degree written out; 7 is about a centimetre
+PRECISION = 7
+# Decimal places of projected metres written out, a millimetre
+METRE_PRECISION = 3
+
+# WGS84, and the UTM projection on it
+WGS84_A = 6378137.0
+WGS84_F = 1 / 298.257223563
+UTM_SCALE = 0.9996
+UTM_FALSE_EASTING = 500000.0
+UTM_FALSE_NORTHING = 10000000.0  # Southern hemisphere only
+UTM_PREFIX = 'utm'
+EPSG_PREFIX = 'epsg:'
+# Columns added to an export in a projected CRS
+PROJECTED_FIELDS = ('easting', 'northing', 'crs')
+# Columns of a CSV that hold a position in degrees, written out at PRECISION
+# places, and in projected metres, at METRE_PRECISION
+COORDINATE_FIELDS = frozenset(('lat', 'long', 'from_long', 'from_lat', 'to_long', 'to_lat'))
+METRE_FIELDS = frozenset(('easting', 'northing'))
+
+
+def format_number(value, precision=None):
+    # value to precision places without the trailing zeros, so 12.5 stays
+    # 12.5 rather than 12.5000000 - and never as 1e-07 or -0.0
+    precision = PRECISION if precision is None else precision
+    text = '{0:.{1}f}'.format(float(value), precision)
+    if '.' in text:
+        text = text.rstrip('0')
+        if text.endswith('.'):
+            text += '0'
+    if text.startswith('-') and float(text) == 0:
+        text = text[1:]
+    return text
+
+
+def _number(value, kind=float):
+    try:
+        return kind(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class Coordinate(object):
+    # Unpacks as (lon, lat), so it can go anywhere a (lon, lat) pair does
+    __slots__ = ('lon', 'lat', 'alt', 'quality', 'hdop', 'sats', 'source')
+
+    def __init__(self, lon, lat, alt=None, quality=None, hdop=None, sats=None, source=None):
+        self.lon = float(lon)
+        self.lat = float(lat)
+        self.alt = alt
+        self.quality = quality
+        self.hdop = hdop
+        self.sats = sats
+        self.source = source
+
+    @classmethod
+    def from_fix(cls, msg):
+        # From a GGA message (or a BlendedFix, or another Coordinate)
+        if isinstance(msg, cls):
+            return msg
+        return cls(msg.longitude, msg.latitude, _number(msg.altitude),
+                   _number(getattr(msg, 'gps_qual', None), int),
+                   _number(getattr(msg, 'horizontal_dil', None)),
+                   _number(getattr(msg, 'num_sats', None), int),
+                   getattr(msg, 'source', None) or None)
+
+    @classmethod
+    def parse(cls, text):
+        # 'Long,Lat' as typed or shown in the form. Blank gives None; anything
+        # else that doesn't parse raises ValueError
+        text = text.strip()
+        if not text:
+            return None
+        parts = text.split(',')
+        if len(parts) != 2:
+            raise ValueError("Expected Long,Lat: {0!r}".format(text))
+        return cls(parts[0], parts[1])
+
+    @classmethod
+    def from_list(cls, data):
+        # Undoes to_list(); a plain [lon, lat] from an older journal works too
+        if not data:
+            return None
+        return cls(*data[:2], **(data[2] if len(data) > 2 else {}))
+
+    def to_list(self):
+        # For the journal: [lon, lat, {whatever else is known}]
+        extra = dict((k, getattr(self, k)) for k in self.__slots__[2:] if getattr(self, k) is not None)
+        return [self.lon, self.lat, extra] if extra else [self.lon, self.lat]
+
+    def format(self, precision=None):
+        return '{0},{1}'.format(format_number(self.lon, precision), format_number(self.lat, precision))
+
+    def __iter__(self):
+        yield self.lon
+        yield self.lat
+
+    def __len__(self):
+        return 2
+
+    def __getitem__(self, i):
+        return (self.lon, self.lat)[i]
+
+    def __eq__(self, other):
+        return isinstance(other, Coordinate) and (self.lon, self.lat) == (other.lon, other.lat)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash((self.lon, self.lat))
+
+    def __repr__(self):
+        return 'Coordinate({0!r}, {1!r})'.format(self.lon, self.lat)
+
+
+def utm_zone(lon, lat):
+    # (zone number, north?) for a point; Norway and Svalbard's odd zones aren't
+    # worth the trouble for pole surveys
+    return int((lon + 180) // 6) % 60 + 1, lat >= 0
+
+
+def _krueger():
+    # Series coefficients for the transverse Mercator projection on WGS84
+    n = WGS84_F / (2 - WGS84_F)
+    big_a = WGS84_A / (1 + n) * (1 + n ** 2 / 4 + n ** 4 / 64)
+    alpha = (n / 2 - 2 * n ** 2 / 3 + 5 * n ** 3 / 16,
+             13 * n ** 2 / 48 - 3 * n ** 3 / 5,
+             61 * n ** 3 / 240)
+    return big_a, alpha, 2 * math.sqrt(n) / (1 + n)
+
+
+RECTIFYING_RADIUS, KRUEGER_ALPHA, KRUEGER_E = _krueger()
+
+
+def _utm_numpy(lons, lats, zone, north):
+    phi = np.radians(np.asarray(lats, dtype=np.float64))
+    dlam = np.radians(np.asarray(lons, dtype=np.float64) - (zone * 6 - 183))
+    sin_phi = np.sin(phi)
+    t = np.sinh(np.arctanh(sin_phi) - KRUEGER_E * np.arctanh(KRUEGER_E * sin_phi))
+    xi = np.arctan2(t, np.cos(dlam))
+    eta = np.arctanh(np.sin(dlam) / np.sqrt(1 + t * t))
+    x = eta.copy()
+    y = xi.copy()
+    for j, a in enumerate(KRUEGER_ALPHA, 1):
+        x += a * np.cos(2 * j * xi) * np.sinh(2 * j * eta)
+        y += a * np.sin(2 * j * xi) * np.cosh(2 * j * eta)
+    k = UTM_SCALE * RECTIFYING_RADIUS
+    return (UTM_FALSE_EASTING + k * x).tolist(), ((0 if north else UTM_FALSE_NORTHING) + k * y).tolist()
+
+
+def _utm_math(lons, lats, zone, north):
+    k = UTM_SCALE * RECTIFYING_RADIUS
+    eastings = []
+    northings = []
+    for lon, lat in zip(lons, lats):
+        phi = math.radians(lat)
+        dlam = math.radians(lon - (zone * 6 - 183))
+        sin_phi = math.sin(phi)
+        t = math.sinh(math.atanh(sin_phi) - KRUEGER_E * math.atanh(KRUEGER_E * sin_phi))
+        xi = math.atan2(t, math.cos(dlam))
+        eta = math.atanh(math.sin(dlam) / math.sqrt(1 + t * t))
+        x = eta
+        y = xi
+        for j, a in enumerate(KRUEGER_ALPHA, 1):
+            x += a * math.cos(2 * j * xi) * math.sinh(2 * j * eta)
+            y += a * math.sin(2 * j * xi) * math.cosh(2 * j * eta)
+        eastings.append(UTM_FALSE_EASTING + k * x)
+        northings.append((0 if north else UTM_FALSE_NORTHING) + k * y)
+    return eastings, northings
+
+
+class Projection(object):
+    # Converts batches of Long/Lat to a projected CRS, see the top of the file
+    # for how to name one. UTM is built in; anything else goes to pyproj.
+
+    def __init__(self, crs):
+        self.spec = crs
+        self.zone = None
+        self.north = True
+        self._transformer = None
+        spec = crs.strip().lower()
+        code = spec[len(EPSG_PREFIX):] if spec.startswith(EPSG_PREFIX) else ''
+        if spec.startswith(UTM_PREFIX):
+            zone = spec[len(UTM_PREFIX):].lstrip(':')
+            if zone:
+                self.zone, self.north = self._parse_zone(zone)
+        elif pyproj is None and code.isdigit() and int(code) // 100 in (326, 327):
+            # WGS84 UTM by its EPSG code, e.g. EPSG:32617 for 17N
+            self.zone, self.north = int(code) % 100, int(code) // 100 == 326
+            if not 1 <= self.zone <= 60:
+                raise ValueError("No such UTM zone: {0}".format(crs))
+        elif pyproj is None:
+            raise ValueError("Projecting to {0} needs pyproj installed (UTM doesn't)".format(crs))
+        else:
+            try:
+                self._transformer = pyproj.Transformer.from_crs('EPSG:4326', crs, always_xy=True)
+            except pyproj.exceptions.CRSError as e:
+                raise ValueError("Unknown CRS {0}: {1}".format(crs, e))
+
+    @staticmethod
+    def _parse_zone(zone):
+        # '17n', '17s', or just '17' for the northern hemisphere
+        hemisphere = zone[-1] if zone[-1] in 'ns' else 'n'
+        number = zone.rstrip('ns')
+        if not number.isdigit() or not 1 <= int(number) <= 60:
+            raise ValueError("No such UTM zone: {0}".format(zone))
+        return int(number), hemisphere == 'n'
+
+    @property
+    def name(self):
+        # What went into the crs column, e.g. EPSG:32617
+        if self._transformer is not None:
+            return self.spec
+        if self.zone is None:
+            return None
+        return 'EPSG:{0}'.format((32600 if self.north else 32700) + self.zone)
+
+    def transform(self, lons, lats):
+        # Two lists, eastings and northings, in the CRS's units (metres for UTM)
+        if not len(lons):
+            return [], []
+        if self._transformer is not None:
+            if np is not None:
+                lons, lats = np.asarray(lons, dtype=np.float64), np.asarray(lats, dtype=np.float64)
+            xs, ys = self._transformer.transform(lons, lats)
+            return list(xs), list(ys)
+        if self.zone is None:
+            # Plain 'utm' sticks with the zone of the first batch, so the
+            # whole export is in the one grid
+            self.zone, self.north = utm_zone(math.fsum(lons) / len(lons), math.fsum(lats) / len(lats))
+        if np is not None:
+            return _utm_numpy(lons, lats, self.zone, self.north)
+        return _utm_math(lons, lats, self.zone, self.north)
+
+
+def project_records(records, crs, lon_field='long', lat_field='lat', chunk=10000):
+    # Yields records with PROJECTED_FIELDS added, projecting chunk records at a
+    # time. crs is a Projection or a name for one. Records without a usable
+    # position are passed through as they are.
+    projection = crs if isinstance(crs, Projection) else Projection(crs)
+    batch = []
+
+    def flush():
+        placed = []
+        for record in batch:
+            lon, lat = _number(record.get(lon_field)), _number(record.get(lat_field))
+            if lon is not None and lat is not None:
+                placed.append((record, lon, lat))
+        xs, ys = projection.transform([p[1] for p in placed], [p[2] for p in placed])
+        for (record, lon, lat), x, y in zip(placed, xs, ys):
+            record['easting'], record['northing'] = x, y
+            record['crs'] = projection.name
+        return batch
+
+    for record in records:
+        batch.append(record)
+        if len(batch) >= chunk:
+            for done in flush():
+                yield done
+            batch = []
+    for done in flush():
+        yield done
@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------
+# gpstagger/csvout.py
+#
+# Created on: 2026-10-18
+#
+# Long-lived CSV writer for the tagger. The file is opened once and records
+# are buffered, then flushed (and fsynced) every few records, every so
+# often, and on close - instead of reopening the file on every Save
+#
+# Two layouts are supported:
+#   parameter - each asset is a block of Parameter,Value rows followed by a
+#               blank row (the original format)
+#   columnar  - one row per asset, with the field names as the header, which
+#               GIS tools and spreadsheets can load directly
+
+import csv
+import os
+import sys
+import time
+
+from gpstagger import metrics
+from gpstagger.coords import (COORDINATE_FIELDS, METRE_FIELDS, METRE_PRECISION, PROJECTED_FIELDS,
+                              format_number, project_records)
+
+PARAMETER = 'parameter'
+COLUMNAR = 'columnar'
+PARAMETER_HEADER = ["Parameter", "Value"]
+
+
+def cell(value, field=None):
+    # Positions are kept as floats until they're written, and only then
+    # rounded - degrees to coords.PRECISION places, metres to a millimetre;
+    # other numbers go out as they are
+    if isinstance(value, float):
+        if field in COORDINATE_FIELDS:
+            return format_number(value)
+        if field in METRE_FIELDS:
+            return format_number(value, METRE_PRECISION)
+    return value
+
+
+def open_csv(path, mode='a'):
+    # Python 2 skips inserting blank rows if it's opened as a binary file,
+    # Python 3 wants text mode with newline translation turned off
+    if sys.version_info.major == 2:
+        return open(path, mode + 'b')
+    return open(path, mode, newline='')
+
+
+def read_header(path):
+    # First row of an existing file, or None if it's missing or empty
+    try:
+        with open_csv(path, 'r') as f:
+            return next(csv.reader(f), None)
+    except (IOError, OSError):
+        return None
+
+
+def read_records(path):
+    # Yields one dict per asset from a file in either layout, a record at a time
+    with open_csv(path, 'r') as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return
+        if header == PARAMETER_HEADER:
+            record = {}
+            for row in reader:
+                # A blank row ends the asset
+                if not any(row):
+                    if record:
+                        yield record
+                        record = {}
+                else:
+                    record[row[0]] = row[1] if len(row) > 1 else ''
+            if record:
+                yield record
+        else:
+            for row in reader:
+                if any(row):
+                    # Blank cells weren't filled in, same as a missing Parameter row
+                    yield dict((k, v) for k, v in zip(header, row) if v)
+
+
+def convert_to_columnar(src, dst, fields=(), crs=None):
+    # Streams a Parameter,Value file into the columnar layout. Two passes - one
+    # to find every parameter used, one to write - so memory use stays flat
+    # no matter how many assets there are. Columns follow fields, then any
+    # other parameters in the order they first appear. With crs (see
+    # gpstagger.coords) each asset's easting and northing in it are added.
+    columns = list(fields)
+    seen = set(columns)
+    for record in read_records(src):
+        for k in record:
+            if k not in seen:
+                seen.add(k)
+                columns.append(k)
+    if crs:
+        columns.extend(k for k in PROJECTED_FIELDS if k not in seen)
+
+    count = 0
+    with open_csv(dst, 'w') as f:
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        records = read_records(src)
+        for record in project_records(records, crs) if crs else records:
+            writer.writerow([cell(record.get(k, ''), k) for k in columns])
+            count += 1
+    return count
+
+
+class CSVWriter(object):
+    # Flush after this many buffered records...
+    flush_every = 10
+    # ...or once the oldest buffered record is this many seconds old
+    flush_interval = 30
+
+    def __init__(self, path, fields=(), layout=PARAMETER, flush_every=None, flush_interval=None,
+                 on_flush=None):
+        # Called once buffered records are safely on disk, e.g. Journal.mark_exported
+        self.on_flush = on_flush
+        if flush_every is not None:
+            self.flush_every = flush_every
+        if flush_interval is not None:
+            self.flush_interval = flush_interval
+        self._pending = []
+        self._pending_since = None
+
+        # Appending to an existing file keeps whatever layout it already has.
+        # A columnar file without a column for each of fields would lose them,
+        # so those go to a new file alongside it instead: <name>_2.csv, _3...
+        root, ext = os.path.splitext(path)
+        n = 1
+        header = read_header(path)
+        while header and header != PARAMETER_HEADER and not set(fields) <= set(header):
+            n += 1
+            path = '{0}_{1}{2}'.format(root, n, ext)
+            header = read_header(path)
+        # Where it's actually writing, which may not be the path it was given
+        self.path = path
+        if header:
+            layout = PARAMETER if header == PARAMETER_HEADER else COLUMNAR
+            fields = header
+        self.layout = layout
+        self.fields = list(fields)
+        if self.layout == COLUMNAR and not self.fields:
+            raise ValueError("The columnar layout needs a list of fields")
+
+        self._file = open_csv(path)
+        self._writer = csv.writer(self._file)
+        if not header:
+            self._writer.writerow(PARAMETER_HEADER if layout == PARAMETER else self.fields)
+            self._sync()
+
+    def write(self, inputs):
+        if not self._pending:
+            self._pending_since = time.time()
+        self._pending.append(inputs)
+        if len(self._pending) >= self.flush_every:
+            self.flush()
+
+    def write_many(self, records):
+        # Several records with at most one flush, however many there are
+        records = list(records)
+        if not records:
+            return
+        if not self._pending:
+            self._pending_since = time.time()
+        self._pending.extend(records)
+        if len(self._pending) >= self.flush_every:
+            self.flush()
+
+    def poll(self):
+        # Call this every so often (e.g. from root.after) to honour flush_interval
+        if self._pending and time.time() - self._pending_since >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        # Nothing waiting means nothing to fsync
+        if not self._pending:
+            return
+        start = metrics.clock()
+        size = self._file.tell()
+        for inputs in self._pending:
+            if self.layout == COLUMNAR:
+                self._writer.writerow([cell(inputs.get(k, ''), k) for k in self.fields])
+            else:
+                for k, v in inputs.items():
+                    self._writer.writerow([k, cell(v, k)])
+                self._writer.writerow([])  # Inserts a blank row between entries
+        self._pending = []
+        self._pending_since = None
+        self._sync()
+        metrics.count('csv_bytes', self._file.tell() - size)
+        metrics.observe('csv_flush', metrics.clock() - start)
+        if self.on_flush:
+            self.on_flush()
+
+    def _sync(self):
+        # Push it all the way to disk, so a crash or yanked SD card loses nothing
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        if self._file.closed:
+            return
+        self.flush()
+        self._file.close()
+
@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------
+# gpstagger/engine.py
+#
+# Created on: 2026-10-18
+#
+# Everything GPS Tagger does short of drawing the form: finding the receiver,
+# keeping a fix, validating and journaling entries, and writing the CSV.
+# Nothing in here needs a display, so it can be scripted or benchmarked
+
+import os
+import time
+
+import serial
+
+from gpstagger import metrics, quality, receiver, validate
+from gpstagger.coords import Coordinate
+from gpstagger.csvout import PARAMETER, CSVWriter, read_records
+from gpstagger.journal import Journal
+from gpstagger.multi import BEST, ReceiverSet
+from gpstagger.poleid import PoleRegistry
+from gpstagger.reader import has_position, shared_reader
+from gpstagger.replay import REPLAY_PREFIX, ReplaySerial
+from gpstagger.rtcm import CorrectionFeed
+from gpstagger.schema import CSV_FIELDS
+from gpstagger.spatial import PoleIndex, add_records
+from gpstagger.track import recorder, to_iso
+
+
+def find_gps_port():
+    # The receiver that worked last time if it's still there, otherwise a full scan
+    return receiver.find_port()
+
+
+def make_serial(port=None, baudrate=9600):
+    # Not opened here - the reader thread does that
+    # 'replay:log.nmea' plays back a recorded log instead of opening a port
+    if port and port.startswith(REPLAY_PREFIX):
+        return ReplaySerial(port[len(REPLAY_PREFIX):])
+    ser = serial.Serial()
+    ser.baudrate = baudrate
+    ser.timeout = 1
+    ser.port = port
+    return ser
+
+
+def open_reader(port=None, baudrate=9600, mode=BEST):
+    # Starts (or reuses) the reader for port, finding the receiver if no port is
+    # given. Returns None if there's no receiver.
+    # A list of ports reads all of them at once, see open_receivers(), and
+    # receiver.ALL every port that looks like a receiver
+    if port == receiver.ALL:
+        port = receiver.scan_all()
+    if isinstance(port, (list, tuple)):
+        return open_receivers(port, baudrate, mode)
+    port = port or find_gps_port()
+    if not port:
+        return None
+    return shared_reader(make_serial(port, baudrate))
+
+
+def open_receivers(ports, baudrate=9600, mode=BEST):
+    # A reader thread per port, behind a ReceiverSet that picks (or blends) the
+    # best fix. Just the one reader if there's only one port.
+    readers = [shared_reader(make_serial(port, baudrate)) for port in ports]
+    if not readers:
+        return None
+    if len(readers) == 1:
+        return readers[0]
+    return ReceiverSet(readers, mode)
+
+
+class CaptureEngine(object):
+    # Metres within which a new pole is probably one that's already been saved
+    duplicate_radius = 3.0
+
+    def __init__(self, csv_path, fields=CSV_FIELDS, layout=PARAMETER, reader=None, track_path=None,
+                 corrections=None):
+        # corrections is an RTCM source for gpstagger.rtcm.open_source(), fed
+        # to the receiver once there is one
+        self.reader = None
+        self.track = None
+        self.track_path = track_path
+        self.corrections = corrections
+        self.feed = None
+        # Seconds the last wait_for_fix() took
+        self.last_wait = None
+        if reader:
+            self.attach_reader(reader)
+        # Every fix and save hits the journal first, so a crash loses nothing
+        self.journal = Journal(csv_path + '.journal')
+        # Where every pole saved to this CSV so far is, and what it's numbered,
+        # for check() to compare against
+        self.poles = PoleIndex()
+        self.pole_ids = PoleRegistry()
+        self.writer = CSVWriter(csv_path, fields, layout, on_flush=self.journal.mark_exported)
+        # If csv_path is missing some of fields, the writer moves on to
+        # <name>_2.csv, so the poles in both count
+        for path in sorted(set((csv_path, self.writer.path))):
+            if os.path.exists(path):
+                for inputs in read_records(path):
+                    self._index(inputs, path)
+        # Entries saved last session that never made it out of the CSV buffer
+        self.recovered = list(self.journal.pending)
+        for inputs in self.recovered:
+            self.writer.write(inputs)
+            self._index(inputs, csv_path)
+        if self.recovered:
+            self.writer.flush()
+
+    def _index(self, inputs, source):
+        add_records(self.poles, [inputs], source)
+        self.pole_ids.add(inputs.get('gs_equipment_location'))
+
+    def attach_reader(self, reader):
+        # For a receiver found after the engine was started
+        self.reader = reader
+        # Every fix the reader sees goes to the track, for gpstagger.track.backfill()
+        if self.track_path and not self.track:
+            self.track = recorder(self.track_path)
+            reader.add_listener(self.track)
+        if self.corrections and not self.feed:
+            self.feed = CorrectionFeed(self.corrections, reader)
+            self.feed.start()
+
+    def latest_fix(self):
+        # Latest fix with a real position, or None - never blocks
+        msg = self.reader.latest() if self.reader else None
+        return msg if has_position(msg) else None
+
+    def fix_status(self):
+        # quality.FixStatus for the latest fix, or None if nothing's been heard
+        return quality.fix_status(self.reader.latest()) if self.reader else None
+
+    def wait_for_fix(self, timeout=None, fix_class=None):
+        # Blocks until there's a fix of at least fix_class, for at most timeout
+        # seconds; how long it took is left in last_wait
+        if not self.reader:
+            return None
+        started = time.time()
+        msg = self.reader.wait_for_fix(timeout, lambda m: quality.meets(m, fix_class))
+        self.last_wait = time.time() - started
+        if msg is None:
+            metrics.count('fix_timeouts')
+        else:
+            metrics.observe('fix_wait', self.last_wait)
+        return msg
+
+    def record_fix(self, msg, **extra):
+        # Journals a fix as it's put into the form, and returns it as a
+        # Coordinate to hand back to save()
+        position = Coordinate.from_fix(msg)
+        # Which receiver it came from, if there's more than one
+        if position.source:
+            extra.setdefault('source', position.source)
+        # What kind of fix it was, unless it's an average of several
+        status = quality.fix_status(msg) if hasattr(msg, 'gps_qual') else None
+        if status:
+            extra.setdefault('fix', status.name)
+            if status.correction_age is not None:
+                extra.setdefault('correction_age', status.correction_age)
+        self.journal.record_fix(position.lat, position.lon, **extra)
+        return position
+
+    @metrics.timed('engine_check')
+    def check(self, inputs):
+        errors, warnings = validate.check_entry(inputs)
+        name = inputs.get('gs_equipment_location')
+        if name and name in self.pole_ids:
+            warnings.append(((validate.DUPLICATE_POLE, name),
+                             "{0} has already been saved - did you mean to save it again?".format(name)))
+        for metres, lat, lon, name, source in self.nearby(inputs):
+            warnings.append(((validate.NEARBY_POLE, name),
+                             "This is {0:.1f} m from {1} - did you mean to save another pole here?".format(
+                                 metres, name or "a pole without a number")))
+        return errors, warnings
+
+    def nearby(self, inputs, radius=None):
+        # Saved poles within radius metres of this one, other than itself
+        try:
+            lat, lon = float(inputs['lat']), float(inputs['long'])
+        except (KeyError, ValueError):
+            return []
+        radius = self.duplicate_radius if radius is None else radius
+        name = inputs.get('gs_equipment_location')
+        return [p for p in self.poles.within(lat, lon, radius) if not name or p[3] != name]
+
+    @metrics.timed('engine_save')
+    def save(self, inputs, position=None):
+        # position is the Coordinate from record_fix() if the entry's Long/Lat
+        # came from the receiver, so it's saved at full precision rather than
+        # as the form showed it. Either way they're kept as floats until the
+        # CSV is written.
+        if position is not None:
+            inputs['long'], inputs['lat'] = position.lon, position.lat
+        for field in ('long', 'lat'):
+            try:
+                inputs[field] = float(inputs[field])
+            except (KeyError, ValueError):
+                pass
+        # Stamped with the same clock as the track, so the two can be matched up later
+        if not inputs.get('capture_time'):
+            inputs['capture_time'] = to_iso(time.time())
+        self.journal.record_entry(inputs)
+        self.writer.write(inputs)
+        self._index(inputs, self.writer.path)
+
+    def next_pole_number(self, name):
+        # The next unused number in name's sequence, e.g. BRW4 -> BRW5
+        return self.pole_ids.next_free(name)
+
+    def poll(self):
+        self.writer.poll()
+
+    def close(self):
+        if self.feed:
+            self.feed.stop()
+        if self.track:
+            self.reader.remove_listener(self.track)
+            self.track.close()
+        self.writer.close()
+        self.journal.close()
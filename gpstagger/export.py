@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------
+# gpstagger/export.py
+#
+# Created on: 2026-10-18
+#
+# Builds the map deliverable for a whole project in one go, from the asset
+# CSVs GPS Tagger wrote (plus any saves still waiting in their journals) and
+# the Secondary Tagger's spans CSVs or project KMLs, instead of one pole at
+# a time through the Secondary Tagger.
+#
+# Assets are split into partitions - grid tiles, or by the value of a field
+# such as a feeder - and each partition is rendered to its own KML by a pool
+# of worker processes. The result is a KMZ holding every partition and an
+# index doc.kml of network links, each with a Region so Google Earth only
+# loads the partitions in view; or the same files in a folder.
+
+import itertools
+import math
+import multiprocessing
+import os
+import re
+import shutil
+import tempfile
+from xml.sax.saxutils import escape
+import zipfile
+
+from gpstagger.csvout import read_records
+from gpstagger.journal import pending_entries
+from gpstagger.kmlout import KML_HEAD, KML_TAIL, KMLWriter, read_points
+from gpstagger.schema import FIELDS, LABELS
+from gpstagger.spans import span_lines, span_table
+
+# Assets without a value for the partition field
+UNASSIGNED = 'unassigned'
+# Grid tiles are this many degrees on a side, about 5 km north-south
+TILE_SIZE = 0.05
+UNSAFE = re.compile(r'[^A-Za-z0-9_.-]+')
+# Partitions are drawn once they cover this many pixels on screen
+MIN_LOD_PIXELS = 128
+
+
+def tile_name(lat, lon, size=TILE_SIZE):
+    return 'tile_{0}_{1}'.format(int(math.floor(lat / size)), int(math.floor(lon / size)))
+
+
+def tile_bounds(lat, lon, size=TILE_SIZE):
+    # (south, north, west, east) of the grid tile holding lat, lon
+    row, col = math.floor(lat / size), math.floor(lon / size)
+    return row * size, (row + 1) * size, col * size, (col + 1) * size
+
+
+def padded_bounds(assets, size=TILE_SIZE):
+    # (south, north, west, east) around assets, widened to at least size
+    # degrees each way - a lone pole's box has no area, and Google Earth would
+    # never draw it
+    lats = [a['lat'] for a in assets]
+    lons = [a['long'] for a in assets]
+    south, north, west, east = min(lats), max(lats), min(lons), max(lons)
+    pad_lat = max(size - (north - south), 0.0) / 2
+    pad_lon = max(size - (east - west), 0.0) / 2
+    return (max(south - pad_lat, -90.0), min(north + pad_lat, 90.0),
+            max(west - pad_lon, -180.0), min(east + pad_lon, 180.0))
+
+
+def file_name(partition):
+    return (UNSAFE.sub('_', partition) or UNASSIGNED) + '.kml'
+
+
+def load_assets(paths):
+    # (assets, skipped): every asset with a usable position, and how many had none
+    assets = []
+    skipped = 0
+    for path in paths:
+        # Saves the tagger hasn't flushed to the CSV yet are in its journal
+        for record in itertools.chain(read_records(path), pending_entries(path + '.journal')):
+            try:
+                record['long'], record['lat'] = float(record['long']), float(record['lat'])
+            except (KeyError, ValueError):
+                skipped += 1
+                continue
+            assets.append(record)
+    return assets, skipped
+
+
+def load_secondaries(paths):
+    # primary pole -> [(secondary, lon, lat)], from spans CSVs or project KMLs
+    found = {}
+    for path in paths:
+        if path.lower().endswith('.kml'):
+            for folder, name, lon, lat in read_points(path):
+                # The primary is the placemark named after its folder
+                if folder is not None and name != folder:
+                    found.setdefault(folder, []).append((name, lon, lat))
+            continue
+        for row in read_records(path):
+            try:
+                found.setdefault(row['primary_pole'], []).append(
+                    (row['secondary'], float(row['to_long']), float(row['to_lat'])))
+            except (KeyError, ValueError):
+                continue
+    return found
+
+
+def partition(assets, field=None, tile_size=TILE_SIZE):
+    # partition name -> assets, by field's value or by grid tile
+    parts = {}
+    for asset in assets:
+        if field:
+            key = asset.get(field) or UNASSIGNED
+        else:
+            key = tile_name(asset['lat'], asset['long'], tile_size)
+        parts.setdefault(key, []).append(asset)
+    return parts
+
+
+def asset_data(asset):
+    # The asset's fields for ExtendedData, labelled as on the form
+    return [(LABELS.get(k, k), asset[k]) for k in FIELDS + tuple(sorted(set(asset) - set(FIELDS)))
+            if k not in ('lat', 'long') and asset.get(k) not in (None, '')]
+
+
+def render_partition(job):
+    # Runs in a worker process. job is (name, path, assets, secondaries) with
+    # secondaries only for this partition's poles. Returns (name, file, assets).
+    name, path, assets, secondaries = job
+    writer = KMLWriter(path, name)
+    for n, asset in enumerate(assets):
+        pole = asset.get('gs_equipment_location') or 'Asset {0}'.format(n + 1)
+        primary = (asset['long'], asset['lat'])
+        named = secondaries.get(pole, [])
+        lines = span_lines(span_table(pole, primary, named)) if named else []
+        writer.write_folder(pole, [(pole, primary[0], primary[1], asset_data(asset))] + named, lines)
+    writer.close()
+    return name, os.path.basename(path), len(assets)
+
+
+def index_xml(title, parts, prefix=''):
+    # The top-level KML: a network link per partition, loaded when in view.
+    # parts are (name, file, assets, (south, north, west, east)).
+    out = [KML_HEAD.format(escape(title))]
+    for name, file, count, (south, north, west, east) in sorted(parts):
+        out.append(
+            u'<NetworkLink><name>{0} ({1})</name>'
+            u'<Region><LatLonAltBox><north>{2!r}</north><south>{3!r}</south><east>{4!r}</east>'
+            u'<west>{5!r}</west></LatLonAltBox><Lod><minLodPixels>{6}</minLodPixels></Lod></Region>'
+            u'<Link><href>{7}</href><viewRefreshMode>onRegion</viewRefreshMode></Link>'
+            u'</NetworkLink>\n'.format(escape(name), count, north, south, east, west,
+                                       MIN_LOD_PIXELS, escape(prefix + file)))
+    out.append(KML_TAIL)
+    return u''.join(out)
+
+
+def export(asset_paths, output, secondary_paths=(), field=None, tile_size=TILE_SIZE, jobs=None):
+    # Writes output (a .kmz, or otherwise a folder) and returns
+    # (assets, skipped, partitions)
+    assets, skipped = load_assets(asset_paths)
+    secondaries = load_secondaries(secondary_paths)
+    parts = partition(assets, field, tile_size)
+
+    kmz = output.lower().endswith('.kmz')
+    work = tempfile.mkdtemp(prefix='gpstagger-export-') if kmz else output
+    if not os.path.isdir(work):
+        os.makedirs(work)
+    title = os.path.splitext(os.path.basename(output.rstrip('/\\')))[0]
+    try:
+        job_list = []
+        # A partition called 'index' mustn't overwrite the folder's index.kml
+        used = set(['index.kml'])
+        for name, members in parts.items():
+            # 'A B' and 'A/B' would both be A_B.kml
+            file = file_name(name)
+            while file.lower() in used:
+                file = file[:-len('.kml')] + '_.kml'
+            used.add(file.lower())
+            path = os.path.join(work, file)
+            if os.path.exists(path):
+                os.remove(path)  # KMLWriter would add to it
+            poles = set(a.get('gs_equipment_location') for a in members)
+            job_list.append((name, path, members,
+                             dict((p, secondaries[p]) for p in poles if p in secondaries)))
+        # Biggest first, so one large partition isn't left running on its own at the end
+        job_list.sort(key=lambda j: -len(j[2]))
+        done = []
+        for name, file, count in run_jobs(render_partition, job_list, jobs):
+            members = parts[name]
+            # A tile's Region is the tile, so neighbouring tiles load alike
+            bounds = (padded_bounds(members, tile_size) if field else
+                      tile_bounds(members[0]['lat'], members[0]['long'], tile_size))
+            done.append((name, file, count, bounds))
+
+        if kmz:
+            with zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED) as z:
+                z.writestr('doc.kml', index_xml(title, done, 'files/').encode('utf-8'))
+                for name, file, count, bounds in done:
+                    z.write(os.path.join(work, file), 'files/' + file)
+        else:
+            with open(os.path.join(work, 'index.kml'), 'wb') as f:
+                f.write(index_xml(title, done).encode('utf-8'))
+    finally:
+        if kmz:
+            shutil.rmtree(work, ignore_errors=True)
+    return len(assets), skipped, len(parts)
+
+
+def run_jobs(func, job_list, jobs=None):
+    # func over job_list on a pool of jobs processes (default: one per CPU),
+    # or right here if there's only one job or one process
+    jobs = jobs or multiprocessing.cpu_count()
+    if jobs <= 1 or len(job_list) <= 1:
+        for job in job_list:
+            yield func(job)
+        return
+    pool = multiprocessing.Pool(min(jobs, len(job_list)))
+    try:
+        for result in pool.imap_unordered(func, job_list):
+            yield result
+    finally:
+        pool.close()
+        pool.join()
@@ -0,0 +1,372 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------
+# gpstagger/fixlog.py
+#
+# Created on: 2026-10-18
+#
+# A compact binary log of every fix, for recording all day at up to 10 Hz.
+# Each fix is a fixed-width 36 byte record, about a quarter the size of a
+# track CSV row:
+#
+#   time     float64  computer clock, seconds since 1970 (like the track CSV)
+#   lat/lon  float64  degrees
+#   alt      float32  metres, NaN if the receiver didn't say
+#   hdop100  uint16   HDOP in hundredths, 65535 if unknown
+#   sats     uint8    255 if unknown
+#   quality  uint8    GGA fix quality
+#   source   uint8    which receiver it came from, 255 if unknown
+#   (3 bytes spare)
+#
+# The records follow a 16 byte header and a table of up to 16 receiver names
+# (32 bytes each, UTF-8, zero padded), filled in as receivers first appear;
+# source is a position in that table. Logs from before there was a source
+# (version 1: 32 byte records straight after the header) can still be read,
+# and are appended to in their own format.
+#
+# Fixes are appended in the order they arrive, so the file is sorted by time
+# and a time range can be found by bisection. FixLogReader memory-maps the
+# file - as a NumPy structured array if NumPy is there, so a query is a view
+# of the file rather than a copy - and exports any range to CSV or KML.
+# A record cut short by a crash is ignored.
+
+from bisect import bisect_left
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+from xml.sax.saxutils import escape
+
+from gpstagger import metrics
+from gpstagger.coords import PROJECTED_FIELDS, format_number, project_records
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional
+    np = None
+
+# Anything recording a track to a file with this extension writes a fix log
+EXTENSION = '.fix'
+MAGIC = b'GPSFIX\x00\x02'
+MAGIC_V1 = b'GPSFIX\x00\x01'
+# magic, record size, reserved
+HEADER = struct.Struct('<8sI4x')
+MAX_SOURCES = 16
+SOURCE_SIZE = 32
+DATA_OFFSET = HEADER.size + MAX_SOURCES * SOURCE_SIZE
+RECORD = struct.Struct('<dddfHBBB3x')
+RECORD_V1 = struct.Struct('<dddfHBB')
+FIELDS = ('time', 'lat', 'lon', 'alt', 'hdop100', 'sats', 'quality', 'source')
+if np is not None:
+    FIX_DTYPE = np.dtype({'names': FIELDS,
+                          'formats': ['<f8', '<f8', '<f8', '<f4', '<u2', 'u1', 'u1', 'u1'],
+                          'offsets': [0, 8, 16, 24, 28, 30, 31, 32], 'itemsize': RECORD.size})
+    FIX_DTYPE_V1 = np.dtype([('time', '<f8'), ('lat', '<f8'), ('lon', '<f8'), ('alt', '<f4'),
+                             ('hdop100', '<u2'), ('sats', 'u1'), ('quality', 'u1')])
+NO_HDOP = 0xFFFF
+NO_SATS = 0xFF
+NO_SOURCE = 0xFF
+
+# Columns of an exported CSV
+EXPORT_FIELDS = ('time', 'utc', 'lat', 'long', 'alt', 'quality', 'sats', 'hdop', 'source')
+
+
+def _number(text, kind=float):
+    try:
+        return kind(text)
+    except (TypeError, ValueError):
+        return None
+
+
+def fix_values(msg, when, source=NO_SOURCE):
+    # A record's values, in FIELDS order
+    alt = _number(msg.altitude)
+    hdop = _number(msg.horizontal_dil)
+    sats = _number(msg.num_sats, int)
+    return (when, float(msg.latitude), float(msg.longitude),
+            float('nan') if alt is None else alt,
+            NO_HDOP if hdop is None else min(int(round(hdop * 100)), NO_HDOP - 1),
+            NO_SATS if sats is None else min(sats, NO_SATS - 1),
+            _number(msg.gps_qual, int) or 0, source)
+
+
+def pack_fix(msg, when, source=NO_SOURCE):
+    return RECORD.pack(*fix_values(msg, when, source))
+
+
+def read_layout(f):
+    # (version, record struct, where the records start, receiver names) from
+    # an open log; raises ValueError if it isn't one
+    magic, record_size = HEADER.unpack(f.read(HEADER.size).ljust(HEADER.size, b'\x00'))
+    if magic == MAGIC_V1 and record_size == RECORD_V1.size:
+        return 1, RECORD_V1, HEADER.size, []
+    if magic != MAGIC or record_size != RECORD.size:
+        raise ValueError("Not a fix log")
+    table = f.read(DATA_OFFSET - HEADER.size)
+    names = []
+    for i in range(0, len(table), SOURCE_SIZE):
+        name = table[i:i + SOURCE_SIZE].rstrip(b'\x00')
+        if not name:
+            break
+        names.append(name.decode('utf-8', 'replace'))
+    return 2, RECORD, DATA_OFFSET, names
+
+
+def is_fixlog(path):
+    try:
+        with open(path, 'rb') as f:
+            return f.read(len(MAGIC)) in (MAGIC, MAGIC_V1)
+    except (IOError, OSError):
+        return False
+
+
+class FixLog(object):
+    # Appends fixes to a fix log. Also a GPSReader listener, like TrackRecorder,
+    # so it can be handed straight to reader.add_listener().
+    flush_every = 60
+    flush_interval = 10
+
+    def __init__(self, path):
+        self.path = path
+        exists = os.path.exists(path) and os.path.getsize(path) >= HEADER.size
+        self._file = open(path, 'r+b' if exists else 'wb')
+        if exists:
+            try:
+                self.version, self._record, offset, self.sources = read_layout(self._file)
+            except ValueError:
+                self._file.close()
+                raise ValueError("{0} isn't a fix log".format(path))
+            # Drop any record cut short last time, so the next one lines up
+            size = max(os.path.getsize(path), offset)
+            self._file.truncate(size - (size - offset) % self._record.size)
+            self._file.seek(0, os.SEEK_END)
+        else:
+            self.version, self._record, self.sources = 2, RECORD, []
+            self._file.write(HEADER.pack(MAGIC, RECORD.size))
+            self._file.write(b'\x00' * (DATA_OFFSET - HEADER.size))
+            self._sync()
+        # A version 1 log has nowhere to put the source
+        self._columns = len(FIELDS) if self.version > 1 else len(FIELDS) - 1
+        self._buf = bytearray()
+        self._buffered = 0
+        self._since = None
+        # close() comes from the main thread, possibly mid-write
+        self._lock = threading.Lock()
+
+    def __call__(self, msg, when):
+        if float(msg.latitude) == 0.0:
+            return
+        self.write(msg, when)
+
+    def write(self, msg, when=None):
+        when = time.time() if when is None else when
+        with self._lock:
+            if self._file.closed:
+                return
+            values = fix_values(msg, when, self._source(getattr(msg, 'source', None)))
+            self._buf += self._record.pack(*values[:self._columns])
+            self._buffered += 1
+            if self._since is None:
+                self._since = time.time()
+            if self._buffered >= self.flush_every or time.time() - self._since >= self.flush_interval:
+                self._flush()
+
+    def _source(self, name):
+        # name's place in the header's table, adding it if it's new
+        if not name or self.version < 2:
+            return NO_SOURCE
+        if name in self.sources:
+            return self.sources.index(name)
+        if len(self.sources) >= MAX_SOURCES:
+            return NO_SOURCE
+        self.sources.append(name)
+        # Goes to disk with the next batch of records, which are the first to use it
+        self._file.seek(HEADER.size + (len(self.sources) - 1) * SOURCE_SIZE)
+        self._file.write(name.encode('utf-8')[:SOURCE_SIZE].ljust(SOURCE_SIZE, b'\x00'))
+        self._file.seek(0, os.SEEK_END)
+        return len(self.sources) - 1
+
+    def _flush(self):
+        if not self._buf:
+            return
+        self._file.write(bytes(self._buf))
+        self._sync()
+        metrics.count('fixlog_bytes', len(self._buf))
+        del self._buf[:]
+        self._buffered = 0
+        self._since = None
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def close(self):
+        with self._lock:
+            if self._file.closed:
+                return
+            self._flush()
+            self._file.close()
+
+
+class _Times(object):
+    # The time column of a memory-mapped log as a sequence, for bisect
+    def __init__(self, data, count, offset, size):
+        self.data = data
+        self.count = count
+        self.offset = offset
+        self.size = size
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        return struct.unpack_from('<d', self.data, self.offset + i * self.size)[0]
+
+
+class FixLogReader(object):
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            try:
+                self.version, self._record, self._offset, self.sources = read_layout(f)
+            except ValueError:
+                raise ValueError("{0} isn't a fix log".format(path))
+        self.count = max(0, os.path.getsize(path) - self._offset) // self._record.size
+        # Version 1 rows get NO_SOURCE tacked on, so rows() always has every field
+        self._extra = () if self.version > 1 else (NO_SOURCE,)
+        self._file = None
+        self._map = None
+        self.fixes = None
+        if np is not None:
+            dtype = FIX_DTYPE if self.version > 1 else FIX_DTYPE_V1
+        if not self.count:
+            self.fixes = np.zeros(0, dtype) if np is not None else []
+        elif np is not None:
+            self.fixes = np.memmap(path, dtype, 'r', self._offset, (self.count,))
+        else:
+            self._file = open(path, 'rb')
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __len__(self):
+        return self.count
+
+    def index_range(self, start=None, end=None):
+        # (first, last + 1) of the fixes from start up to (not including) end
+        if np is not None:
+            times = self.fixes['time']
+            lo = int(np.searchsorted(times, start, 'left')) if start is not None else 0
+            hi = int(np.searchsorted(times, end, 'left')) if end is not None else self.count
+        else:
+            times = _Times(self._map, self.count, self._offset, self._record.size)
+            lo = bisect_left(times, start) if start is not None else 0
+            hi = bisect_left(times, end) if end is not None else self.count
+        return lo, max(lo, hi)
+
+    def source_name(self, index):
+        # The receiver a fix's source refers to, or '' if it isn't known
+        return self.sources[index] if index < len(self.sources) else ''
+
+    def _unpack(self, i):
+        return self._record.unpack_from(self._map, self._offset + i * self._record.size) + self._extra
+
+    def query(self, start=None, end=None):
+        # The fixes between start and end (epoch seconds): a view of the file
+        # with NumPy (without a source field for a version 1 log), otherwise a
+        # list of tuples in FIELDS order
+        lo, hi = self.index_range(start, end)
+        if np is not None:
+            return self.fixes[lo:hi]
+        return [self._unpack(i) for i in range(lo, hi)]
+
+    def rows(self, start=None, end=None, every=1, chunk=10000):
+        # Plain tuples in FIELDS order, a chunk at a time so exporting a whole
+        # day doesn't turn it all into Python objects at once
+        lo, hi = self.index_range(start, end)
+        for first in range(lo, hi, chunk * every):
+            last = min(hi, first + chunk * every)
+            if np is not None:
+                for fix in self.fixes[first:last:every].tolist():
+                    yield fix + self._extra
+            else:
+                for i in range(first, last, every):
+                    yield self._unpack(i)
+
+    def close(self):
+        # Views from query() are no good after this
+        if self._map is not None:
+            self._map.close()
+            self._file.close()
+        # A NumPy memmap closes once nothing is using it
+        self.fixes = self._map = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def export_row(fix, to_iso, source_name=None):
+    # source_name turns a source index into the receiver's name, e.g.
+    # FixLogReader.source_name
+    when, lat, lon, alt, hdop100, sats, quality, source = fix
+    return {'time': '{0:.3f}'.format(when), 'utc': to_iso(when), 'lat': lat, 'long': lon,
+            'alt': '' if math.isnan(alt) else '{0:.2f}'.format(alt), 'quality': quality,
+            'sats': '' if sats == NO_SATS else sats,
+            'hdop': '' if hdop100 == NO_HDOP else '{0:.2f}'.format(hdop100 / 100.0),
+            'source': source_name(source) if source_name else ''}
+
+
+def to_csv(src, dst, start=None, end=None, every=1, crs=None):
+    # Returns the number of fixes written. With crs (see gpstagger.coords),
+    # each fix's easting and northing in it are added.
+    from gpstagger.csvout import COLUMNAR, CSVWriter
+    from gpstagger.track import to_iso  # track reads fix logs too
+    fields = EXPORT_FIELDS + (PROJECTED_FIELDS if crs else ())
+    writer = CSVWriter(dst, fields, COLUMNAR, flush_every=5000)
+    written = 0
+    with FixLogReader(src) as reader:
+        rows = (export_row(fix, to_iso, reader.source_name) for fix in reader.rows(start, end, every))
+        for row in project_records(rows, crs) if crs else rows:
+            writer.write(row)
+            written += 1
+    writer.close()
+    return written
+
+
+def to_kml(src, dst, start=None, end=None, every=1, max_gap=30.0):
+    # The fixes as a track of LineStrings, broken wherever the receiver went
+    # quiet for more than max_gap seconds. every=10 keeps every tenth fix.
+    # Returns the number of fixes written.
+    from gpstagger.kmlout import KML_HEAD, KML_TAIL
+    from gpstagger.track import to_iso
+    written = 0
+    segment = []
+    with FixLogReader(src) as reader, open(dst, 'wb') as f:
+        f.write(KML_HEAD.format(escape(os.path.splitext(os.path.basename(src))[0])).encode('utf-8'))
+        for fix in reader.rows(start, end, every):
+            if segment and fix[0] - segment[-1][0] > max_gap * every:
+                f.write(track_xml(segment, to_iso).encode('utf-8'))
+                written += len(segment)
+                segment = []
+            segment.append((fix[0], fix[2], fix[1]))
+        if segment:
+            f.write(track_xml(segment, to_iso).encode('utf-8'))
+            written += len(segment)
+        f.write(KML_TAIL.encode('utf-8'))
+    return written
+
+
+def track_xml(segment, to_iso):
+    # segment is a list of (time, lon, lat); a single fix is a Point
+    name = u'{0} - {1}'.format(to_iso(segment[0][0]), to_iso(segment[-1][0]))
+    coords = u' '.join(u'{0},{1},0'.format(format_number(lon), format_number(lat))
+                       for when, lon, lat in segment)
+    shape = u'Point' if len(segment) == 1 else u'LineString'
+    return u'<Placemark><name>{0}</name><{1}><coordinates>{2}</coordinates></{1}></Placemark>\n'.format(
+        name, shape, coords)
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------
+# gpstagger/geodesy.py
+#
+# Created on: 2026-10-18
+#
+# Distances and bearings between poles. Spans are tens of metres, so a
+# spherical earth (haversine) is well inside GPS error - no need for Vincenty.
+# Everything works on whole lists at once; with NumPy installed the maths is
+# vectorised, without it it falls back to plain Python
+
+import math
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional
+    np = None
+
+# Mean earth radius in metres
+EARTH_RADIUS = 6371008.8
+FEET_PER_METRE = 3.28084
+
+
+def spans(lat0, lon0, lats, lons):
+    # Distance (metres) and initial bearing (degrees from true north) from one
+    # point to each of many, returned as two lists
+    if not lats:
+        return [], []
+    if np is not None:
+        return _spans_numpy(lat0, lon0, lats, lons)
+    return _spans_math(lat0, lon0, lats, lons)
+
+
+def _spans_numpy(lat0, lon0, lats, lons):
+    phi1 = math.radians(lat0)
+    phi2 = np.radians(np.asarray(lats, dtype=np.float64))
+    dlam = np.radians(np.asarray(lons, dtype=np.float64) - lon0)
+    cos_phi2 = np.cos(phi2)
+    a = np.sin((phi2 - phi1) / 2) ** 2 + math.cos(phi1) * cos_phi2 * np.sin(dlam / 2) ** 2
+    dist = 2 * EARTH_RADIUS * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+    y = np.sin(dlam) * cos_phi2
+    x = math.cos(phi1) * np.sin(phi2) - math.sin(phi1) * cos_phi2 * np.cos(dlam)
+    bearing = np.degrees(np.arctan2(y, x)) % 360
+    return dist.tolist(), bearing.tolist()
+
+
+def _spans_math(lat0, lon0, lats, lons):
+    phi1 = math.radians(lat0)
+    sin_phi1 = math.sin(phi1)
+    cos_phi1 = math.cos(phi1)
+    dists = []
+    bearings = []
+    for lat, lon in zip(lats, lons):
+        phi2 = math.radians(lat)
+        dlam = math.radians(lon - lon0)
+        cos_phi2 = math.cos(phi2)
+        a = math.sin((phi2 - phi1) / 2) ** 2 + cos_phi1 * cos_phi2 * math.sin(dlam / 2) ** 2
+        dists.append(2 * EARTH_RADIUS * math.asin(math.sqrt(min(max(a, 0.0), 1.0))))
+        y = math.sin(dlam) * cos_phi2
+        x = cos_phi1 * math.sin(phi2) - sin_phi1 * cos_phi2 * math.cos(dlam)
+        bearings.append(math.degrees(math.atan2(y, x)) % 360)
+    return dists, bearings
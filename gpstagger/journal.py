@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------
+# gpstagger/journal.py
+#
+# Created on: 2026-10-18
+#
+# Append-only write-ahead journal, so nothing typed or captured is lost if the
+# program dies (or the COM port locks up the machine) before it reaches the CSV
+#
+# Each record is a 4-byte length, a 4-byte CRC32 and a JSON payload. A record
+# that was only half written when the power went is detected by its length or
+# CRC and dropped, along with anything after it.
+#
+# Record kinds:
+#   draft    - the whole form, written on every keystroke (not fsynced)
+#   fix      - a GPS fix as it was put into the form
+#   entry    - a saved entry that may still be sitting in the CSV buffer
+#   exported - everything before this made it into the CSV
+
+import json
+import os
+import struct
+import time
+import zlib
+
+from gpstagger import metrics
+
+HEADER = struct.Struct('<II')
+
+
+def read_journal(path):
+    # Returns the intact records and the byte offset where they end
+    records = []
+    good = 0
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except (IOError, OSError):
+        return records, good
+    while good + HEADER.size <= len(data):
+        length, crc = HEADER.unpack_from(data, good)
+        start = good + HEADER.size
+        payload = data[start:start + length]
+        if len(payload) != length or zlib.crc32(payload) & 0xffffffff != crc:
+            break
+        try:
+            records.append(json.loads(payload.decode('utf-8')))
+        except ValueError:
+            break
+        good = start + length
+    return records, good
+
+
+def replay(records):
+    # (pending, draft): the entries that never made it to the CSV, and the
+    # form as it was last left
+    pending = []
+    draft = None
+    for record in records:
+        kind = record.get('kind')
+        if kind == 'entry':
+            pending.append(record['data'])
+            draft = None
+        elif kind == 'exported':
+            pending = []
+        elif kind == 'draft':
+            draft = record['data']
+    return pending, draft
+
+
+def pending_entries(path):
+    # Saved entries still waiting in the journal at path, without opening it
+    # for writing - for reading a project while the tagger may have it open
+    return replay(read_journal(path)[0])[0]
+
+
+class Journal(object):
+    def __init__(self, path):
+        self.path = path
+        records, good = read_journal(path)
+        # Work out what never made it to the CSV last time
+        self.pending, self.draft = replay(records)
+        self._file = open(path, 'ab')
+        # Chop off a torn record from a crash mid-write
+        self._file.truncate(good)
+        self._file.seek(good)
+
+    def _append(self, kind, data, sync):
+        payload = json.dumps({'kind': kind, 'time': time.time(), 'data': data}).encode('utf-8')
+        self._file.write(HEADER.pack(len(payload), zlib.crc32(payload) & 0xffffffff) + payload)
+        self._file.flush()
+        metrics.count('journal_bytes', HEADER.size + len(payload))
+        if sync:
+            with metrics.span('journal_fsync'):
+                os.fsync(self._file.fileno())
+
+    def record_draft(self, values):
+        # Cheap enough to call on every keystroke; the OS gets it to disk soon enough
+        self.draft = values
+        self._append('draft', values, sync=False)
+
+    def record_fix(self, latitude, longitude, **extra):
+        extra.update(latitude=latitude, longitude=longitude)
+        self._append('fix', extra, sync=True)
+
+    def record_entry(self, inputs):
+        self.pending.append(inputs)
+        self.draft = None
+        self._append('entry', inputs, sync=True)
+
+    def mark_exported(self):
+        # Everything journaled so far is safely in the CSV, so start over,
+        # carrying across the form as it stands right now
+        self.pending = []
+        self._file.seek(0)
+        self._file.truncate()
+        self._append('exported', None, sync=False)
+        if self.draft:
+            self._append('draft', self.draft, sync=False)
+        os.fsync(self._file.fileno())
+
+    def close(self, discard=True):
+        # A clean quit leaves nothing to recover, so the journal goes away
+        if self._file.closed:
+            return
+        self._file.close()
+        if discard and not self.pending:
+            os.remove(self.path)
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------
+# gpstagger/kmlout.py
+#
+# Created on: 2026-10-18
+#
+# Streams placemarks into one project KML, a folder per primary pole, instead
+# of building a whole document in memory and writing a file per pole. Folders
+# are appended as they're saved; the closing tags are written on close() and
+# stripped off again when an existing project is reopened. A file left
+# unclosed by a crash is picked up where it left off.
+
+import io
+import os
+import re
+from xml.sax.saxutils import escape, unescape
+import zipfile
+
+from gpstagger import metrics
+from gpstagger.coords import format_number
+from gpstagger.spatial import PoleIndex
+
+KML_HEAD = (u'<?xml version="1.0" encoding="UTF-8"?>\n'
+            u'<kml xmlns="http://www.opengis.net/kml/2.2">\n'
+            u'<Document>\n'
+            u'<name>{0}</name>\n')
+KML_TAIL = u'</Document>\n</kml>\n'
+FOLDER_NAME = re.compile(r'^<Folder><name>(.*)</name>$')
+POINT = re.compile(r'^<Placemark><name>(.*?)</name>(?:<ExtendedData>.*?</ExtendedData>)?'
+                   r'<Point><coordinates>([^,]*),([^,]*),')
+
+
+def point_xml(name, lon, lat, data=()):
+    return (u'<Placemark><name>{0}</name>{3}<Point><coordinates>{1},{2},0</coordinates>'
+            u'</Point></Placemark>\n').format(escape(name), format_number(lon), format_number(lat),
+                                              extended_xml(data))
+
+
+def extended_xml(data):
+    # data is a list of (name, value) pairs
+    if not data:
+        return u''
+    return u'<ExtendedData>{0}</ExtendedData>'.format(u''.join(
+        u'<Data name="{0}"><value>{1}</value></Data>'.format(
+            escape(k), escape(format_number(v) if isinstance(v, float) else str(v)))
+        for k, v in data))
+
+
+def line_xml(name, start, end, data=()):
+    # start and end are (lon, lat)
+    return (u'<Placemark><name>{0}</name>{1}<LineString><coordinates>{2},{3},0 {4},{5},0'
+            u'</coordinates></LineString></Placemark>\n').format(
+                escape(name), extended_xml(data), format_number(start[0]), format_number(start[1]),
+                format_number(end[0]), format_number(end[1]))
+
+
+def folder_xml(name, placemarks, lines=()):
+    # placemarks is a list of (name, lon, lat) or (name, lon, lat, data), lines a
+    # list of (name, start, end, data)
+    parts = [u'<Folder><name>{0}</name>\n'.format(escape(name))]
+    parts.extend(point_xml(*p) for p in placemarks)
+    parts.extend(line_xml(*l) for l in lines)
+    parts.append(u'</Folder>\n')
+    return u''.join(parts)
+
+
+class KMLWriter(object):
+    def __init__(self, path, title=None):
+        self.path = path
+        # Folder names already in the project, to catch a pole saved twice
+        self.folders = set()
+        # Where each primary pole is, to catch the same pole saved under two names
+        self.poles = PoleIndex()
+        exists = os.path.exists(path) and os.path.getsize(path) > 0
+        if exists:
+            self._scan()
+        self._file = io.open(path, 'r+b' if exists else 'wb')
+        if exists:
+            self._strip_tail()
+        else:
+            title = title or os.path.splitext(os.path.basename(path))[0]
+            self._write(KML_HEAD.format(escape(title)))
+
+    def _scan(self):
+        for folder, name, lon, lat in read_points(self.path):
+            if folder is None:
+                continue
+            self.folders.add(escape(folder))
+            # The primary is the placemark named after its folder
+            if name == folder:
+                self.poles.add(lat, lon, name, self.path)
+
+    def _strip_tail(self):
+        # Only the last few bytes need looking at, however big the project is
+        tail = KML_TAIL.encode('utf-8')
+        self._file.seek(0, os.SEEK_END)
+        size = self._file.tell()
+        self._file.seek(max(0, size - len(tail)))
+        if self._file.read() == tail:
+            self._file.seek(size - len(tail))
+            self._file.truncate()
+        self._file.seek(0, os.SEEK_END)
+
+    def _write(self, text):
+        data = text.encode('utf-8')
+        self._file.write(data)
+        self._file.flush()
+        metrics.count('kml_bytes', len(data))
+
+    def write_folder(self, name, placemarks, lines=()):
+        with metrics.span('kml_write'):
+            self._write(folder_xml(name, placemarks, lines))
+        self.folders.add(escape(name))
+        for placemark in placemarks:
+            if placemark[0] == name:
+                self.poles.add(placemark[2], placemark[1], name, self.path)
+
+    def has_folder(self, name):
+        return escape(name) in self.folders
+
+    def close(self):
+        if self._file.closed:
+            return
+        self._write(KML_TAIL)
+        self._file.close()
+
+
+def read_points(path):
+    # (folder, name, lon, lat) for every point placemark in a KML written by
+    # KMLWriter - one placemark per line, so no XML parser needed
+    folder = None
+    with io.open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            match = FOLDER_NAME.match(line.rstrip('\n'))
+            if match:
+                folder = unescape(match.group(1))
+                continue
+            match = POINT.match(line)
+            if match:
+                try:
+                    lon, lat = float(match.group(2)), float(match.group(3))
+                except ValueError:
+                    continue
+                yield folder, unescape(match.group(1)), lon, lat
+
+
+def to_kmz(kml_path, kmz_path=None):
+    # A KMZ is just the KML zipped up as doc.kml
+    kmz_path = kmz_path or os.path.splitext(kml_path)[0] + '.kmz'
+    with zipfile.ZipFile(kmz_path, 'w', zipfile.ZIP_DEFLATED) as z:
+        z.write(kml_path, 'doc.kml')
+    return kmz_path
@@ -0,0 +1,449 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------
+# gpstagger/mapview.py
+#
+# Created on: 2026-10-18
+#
+# A map of what's been captured, so a crew can check their poles on the spot
+# instead of opening the KML in Google Earth back at the office. The main
+# tagger's poles and the Secondary Tagger's secondaries and spans all go into
+# MAP, one per process like metrics.METRICS, and turn up on the map as
+# they're saved. The basemap comes from the on-disk cache in gpstagger.tiles,
+# so anywhere that's been seeded or looked at before still has one with no
+# signal.
+#
+# Tens of thousands of poles stay quick to pan and zoom: points are projected
+# once, as they're added; only the ones in view are looked at; and those are
+# gathered into clusters CLUSTER_PIXELS across, drawn as one circle with a
+# count. Names only appear from LABEL_ZOOM, and spans from LINE_ZOOM.
+
+from collections import OrderedDict
+import math
+import threading
+
+try:
+    import tkinter as tk  # Python 3.x
+except ImportError:  # Python 2.x
+    import Tkinter as tk
+
+from gpstagger import metrics
+from gpstagger.kmlout import read_points
+from gpstagger.tiles import CACHE_DIR, MAX_ZOOM, TILE_SIZE, TileCache, TileFetcher, lonlat, mercator, mercator_many
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional
+    np = None
+
+PRIMARY = 'primary'
+SECONDARY = 'secondary'
+COLOURS = {PRIMARY: 'red', SECONDARY: 'blue'}
+LINE_COLOUR = 'dark orange'
+CLUSTER_PIXELS = 40
+LABEL_ZOOM = 17
+LINE_ZOOM = 15
+# Past this many spans in view, they're left off until zoomed in further
+MAX_LINES = 5000
+# Zoom levels below the current one that "Save for offline" also fetches
+SEED_LEVELS = 3
+# Tile images kept decoded, for panning back and forth
+MAX_IMAGES = 100
+POLL_MS = 300
+
+
+class MapData(object):
+    # Everything to be drawn, in tiles.mercator() units
+    def __init__(self):
+        # One entry a point
+        self.xs = []
+        self.ys = []
+        self.names = []
+        self.kinds = []
+        # Spans, as (x0, y0, x1, y1)
+        self.lines = []
+        # Goes up with every change, for the map to notice
+        self.version = 0
+        # Where the last point went, for the map to follow
+        self.latest = None
+        self._primaries = set()
+        self._arrays = None
+
+    def __len__(self):
+        return len(self.xs)
+
+    def add_points(self, points, kind=PRIMARY):
+        # points is a list of (name, lon, lat). A primary pole already on the
+        # map under the same name isn't added again - both taggers may save it.
+        if kind == PRIMARY:
+            points = [p for p in points if p[0] is None or p[0] not in self._primaries]
+            self._primaries.update(p[0] for p in points)
+        if not points:
+            return
+        xs, ys = mercator_many([p[1] for p in points], [p[2] for p in points])
+        self.xs.extend(xs)
+        self.ys.extend(ys)
+        self.names.extend(p[0] for p in points)
+        self.kinds.extend([kind] * len(points))
+        self.latest = (xs[-1], ys[-1])
+        self.version += 1
+
+    def add_pole(self, name, primary, secondaries):
+        # A pole from the Secondary Tagger: primary is (lon, lat) or None,
+        # secondaries a list of (name, lon, lat), with a span out to each
+        if primary:
+            self.add_points([(name, primary[0], primary[1])], PRIMARY)
+        self.add_points(secondaries, SECONDARY)
+        if primary and secondaries:
+            x0, y0 = mercator(primary[0], primary[1])
+            xs, ys = mercator_many([s[1] for s in secondaries], [s[2] for s in secondaries])
+            self.lines.extend((x0, y0, x, y) for x, y in zip(xs, ys))
+            self.version += 1
+
+    def add_index(self, index):
+        # Every pole in a spatial.PoleIndex, e.g. the engine's
+        self.add_points([(name, lon, lat) for cell in index.cells.values()
+                         for lat, lon, name, source in cell])
+
+    def add_kml(self, path):
+        # A Secondary Tagger project KML, spans and all
+        folders = OrderedDict()
+        for folder, name, lon, lat in read_points(path):
+            folders.setdefault(folder, []).append((name, lon, lat))
+        for folder, placemarks in folders.items():
+            primary = [(lon, lat) for name, lon, lat in placemarks if name == folder]
+            self.add_pole(folder, primary[0] if primary else None,
+                          [p for p in placemarks if p[0] != folder])
+
+    def bounds(self):
+        # (left, top, right, bottom), or None if there's nothing yet
+        if not self.xs:
+            return None
+        return min(self.xs), min(self.ys), max(self.xs), max(self.ys)
+
+    def arrays(self):
+        # kind -> (xs, ys, indexes) of its points, and the spans as one array,
+        # as NumPy arrays if it's there. Rebuilt only after a change.
+        if self._arrays is None or self._arrays[0] != self.version:
+            by_kind = {}
+            if np is not None:
+                xs, ys = np.asarray(self.xs), np.asarray(self.ys)
+                kinds = np.asarray(self.kinds, dtype=object)
+                for kind in COLOURS:
+                    index = np.nonzero(kinds == kind)[0]
+                    by_kind[kind] = (xs[index], ys[index], index)
+                lines = np.asarray(self.lines, dtype=np.float64).reshape(-1, 4)
+            else:
+                for kind in COLOURS:
+                    index = [i for i, k in enumerate(self.kinds) if k == kind]
+                    by_kind[kind] = ([self.xs[i] for i in index], [self.ys[i] for i in index], index)
+                lines = self.lines
+            self._arrays = (self.version, by_kind, lines)
+        return self._arrays[1], self._arrays[2]
+
+    def clear(self):
+        self.__init__()
+
+
+# The process-wide map data, shared by both taggers
+MAP = MapData()
+
+
+def clusters(xs, ys, indexes, scale, left, top, width, height, cell=CLUSTER_PIXELS):
+    # Gathers the points in view into cells `cell` pixels across, fixed to the
+    # world rather than the window so they don't jump about while panning.
+    # Returns (x, y, count, index) for each cell with anything in it: where
+    # its points' centre is on the canvas, how many there are, and one of them.
+    if np is not None:
+        return _clusters_numpy(xs, ys, indexes, scale, left, top, width, height, cell)
+    found = {}
+    for x, y, index in zip(xs, ys, indexes):
+        px = x * scale - left
+        py = y * scale - top
+        if not (-cell <= px < width + cell and -cell <= py < height + cell):
+            continue
+        key = (int((px + left) // cell), int((py + top) // cell))
+        entry = found.get(key)
+        if entry is None:
+            found[key] = [px, py, 1, index]
+        else:
+            entry[0] += px
+            entry[1] += py
+            entry[2] += 1
+    return [(sx / n, sy / n, n, index) for sx, sy, n, index in found.values()]
+
+
+def _clusters_numpy(xs, ys, indexes, scale, left, top, width, height, cell):
+    px = xs * scale - left
+    py = ys * scale - top
+    inside = np.nonzero((px >= -cell) & (px < width + cell) & (py >= -cell) & (py < height + cell))[0]
+    if not len(inside):
+        return []
+    px = px[inside]
+    py = py[inside]
+    kx = np.floor((px + left) / cell).astype(np.int64)
+    ky = np.floor((py + top) / cell).astype(np.int64)
+    keys, first, inverse, counts = np.unique(kx * (1 << 32) + ky, return_index=True,
+                                             return_inverse=True, return_counts=True)
+    inverse = inverse.ravel()
+    sx = np.bincount(inverse, px) / counts
+    sy = np.bincount(inverse, py) / counts
+    return list(zip(sx.tolist(), sy.tolist(), counts.tolist(), indexes[inside[first]].tolist()))
+
+
+def visible_lines(lines, scale, left, top, width, height):
+    # The spans with any part in view, in canvas pixels
+    if np is not None:
+        if not len(lines):
+            return []
+        px = lines * scale - np.array([left, top, left, top])
+        inside = ((np.minimum(px[:, 0], px[:, 2]) < width) & (np.maximum(px[:, 0], px[:, 2]) >= 0) &
+                  (np.minimum(px[:, 1], px[:, 3]) < height) & (np.maximum(px[:, 1], px[:, 3]) >= 0))
+        return px[inside].tolist()
+    found = []
+    for x0, y0, x1, y1 in lines:
+        x0, y0, x1, y1 = x0 * scale - left, y0 * scale - top, x1 * scale - left, y1 * scale - top
+        if min(x0, x1) < width and max(x0, x1) >= 0 and min(y0, y1) < height and max(y0, y1) >= 0:
+            found.append((x0, y0, x1, y1))
+    return found
+
+
+class MapView(tk.Frame):
+    def __init__(self, master, data=None, cache=None, width=640, height=480):
+        # cache is a tiles.TileCache; without one there's no basemap
+        tk.Frame.__init__(self, master)
+        self.data = MAP if data is None else data
+        self.cache = cache
+        self.fetcher = None
+        if cache is not None and cache.url:
+            self.fetcher = TileFetcher(cache)
+            self.fetcher.start()
+        self.width = width
+        self.height = height
+        self.canvas = tk.Canvas(self, width=width, height=height, bg='#e8e8e0', highlightthickness=0)
+        self.canvas.pack(side=tk.TOP, fill=tk.BOTH, expand=tk.YES)
+        bar = tk.Frame(self)
+        bar.pack(side=tk.TOP, fill=tk.X)
+        tk.Button(bar, text="+", width=3, command=(lambda: self.zoom_by(1))).pack(side=tk.LEFT, padx=2, pady=2)
+        tk.Button(bar, text="-", width=3, command=(lambda: self.zoom_by(-1))).pack(side=tk.LEFT, padx=2, pady=2)
+        tk.Button(bar, text="Show All", command=self.fit).pack(side=tk.LEFT, padx=2, pady=2)
+        # Keeps the newest pole in view as they're saved
+        self.follow_var = tk.IntVar()
+        self.follow_var.set(1)
+        tk.Checkbutton(bar, text="Follow", variable=self.follow_var).pack(side=tk.LEFT, padx=2, pady=2)
+        self.seed_button = tk.Button(bar, text="Save Area for Offline", command=self.seed_view)
+        self.seed_button.pack(side=tk.LEFT, padx=2, pady=2)
+        if not self.fetcher:
+            self.seed_button.config(state=tk.DISABLED)
+        self.status_var = tk.StringVar()
+        tk.Label(bar, textvariable=self.status_var, anchor='w').pack(side=tk.LEFT, fill=tk.X, padx=5)
+
+        self.zoom = 3
+        self.centre = (0.5, 0.5)
+        self._images = OrderedDict()
+        self._drag = None
+        self._drawn = None
+        self._seen = None
+        self._offline = False
+        self._redraw_pending = False
+        self._seed_thread = None
+        self._seed_status = None
+        self.canvas.bind('<ButtonPress-1>', self._press)
+        self.canvas.bind('<B1-Motion>', self._move)
+        self.canvas.bind('<MouseWheel>', (lambda e: self.zoom_by(1 if e.delta > 0 else -1, (e.x, e.y))))
+        self.canvas.bind('<Button-4>', (lambda e: self.zoom_by(1, (e.x, e.y))))
+        self.canvas.bind('<Button-5>', (lambda e: self.zoom_by(-1, (e.x, e.y))))
+        self.canvas.bind('<Configure>', (lambda e: self.redraw_soon()))
+        self.fit()
+        self.after(POLL_MS, self._poll)
+
+    def _size(self):
+        width, height = self.canvas.winfo_width(), self.canvas.winfo_height()
+        # Not on screen yet
+        if width <= 1 or height <= 1:
+            return self.width, self.height
+        return width, height
+
+    def _view(self):
+        # (pixels per mercator unit, left, top, width, height)
+        width, height = self._size()
+        scale = TILE_SIZE * 2.0 ** self.zoom
+        return scale, self.centre[0] * scale - width / 2.0, self.centre[1] * scale - height / 2.0, width, height
+
+    def fit(self):
+        bounds = self.data.bounds()
+        if bounds is None:
+            self.redraw_soon()
+            return
+        left, top, right, bottom = bounds
+        width, height = self._size()
+        self.centre = ((left + right) / 2, (top + bottom) / 2)
+        span = max(right - left, bottom - top, 1e-12)
+        fits = math.log(min(width, height) * 0.8 / (TILE_SIZE * span), 2)
+        self.zoom = int(max(1, min(MAX_ZOOM - 1, math.floor(fits))))
+        self.redraw_soon()
+
+    def zoom_by(self, step, at=None):
+        # Zooms in (step > 0) or out, keeping the point under `at` (canvas
+        # pixels) where it is
+        zoom = max(1, min(MAX_ZOOM, self.zoom + step))
+        if zoom == self.zoom:
+            return
+        scale, left, top, width, height = self._view()
+        if at is not None:
+            wx, wy = (left + at[0]) / scale, (top + at[1]) / scale
+            new_scale = TILE_SIZE * 2.0 ** zoom
+            self.centre = (wx - (at[0] - width / 2.0) / new_scale, wy - (at[1] - height / 2.0) / new_scale)
+        self.zoom = zoom
+        self.redraw_soon()
+
+    def _press(self, event):
+        self._drag = (event.x, event.y, self.centre)
+
+    def _move(self, event):
+        if self._drag is None:
+            return
+        x, y, centre = self._drag
+        scale = TILE_SIZE * 2.0 ** self.zoom
+        self.centre = (centre[0] - (event.x - x) / scale, centre[1] - (event.y - y) / scale)
+        self.redraw_soon()
+
+    def redraw_soon(self):
+        # Drags and wheel spins come in bursts - draw once they've been handled
+        if not self._redraw_pending:
+            self._redraw_pending = True
+            self.after_idle(self.redraw)
+
+    def _poll(self):
+        if self.data.version != self._seen and self.follow_var.get() and self.data.latest:
+            scale, left, top, width, height = self._view()
+            x, y = self.data.latest[0] * scale - left, self.data.latest[1] * scale - top
+            if not (0 <= x < width and 0 <= y < height):
+                self.centre = self.data.latest
+        self._seen = self.data.version
+        if self._state() != self._drawn:
+            self.redraw_soon()
+        elif self.status_var.get() != self._status():
+            self.status_var.set(self._status())
+        self.after(POLL_MS, self._poll)
+
+    def _status(self):
+        parts = ["{0} points, zoom {1}".format(len(self.data), self.zoom)]
+        if self._offline:
+            parts.append("no map here offline")
+        if self._seed_status:
+            parts.append(self._seed_status)
+        return " - ".join(parts)
+
+    def _state(self):
+        return self.data.version, self.fetcher.fetched if self.fetcher else 0, self.zoom, self.centre, self._size()
+
+    def redraw(self):
+        self._redraw_pending = False
+        with metrics.span('map_draw'):
+            self.canvas.delete('all')
+            scale, left, top, width, height = self._view()
+            shown = self._draw_tiles(scale, left, top, width, height)
+            by_kind, lines = self.data.arrays()
+            if self.zoom >= LINE_ZOOM:
+                spans = visible_lines(lines, scale, left, top, width, height)
+                if len(spans) <= MAX_LINES:
+                    for x0, y0, x1, y1 in spans:
+                        self.canvas.create_line(x0, y0, x1, y1, fill=LINE_COLOUR, width=2)
+            for kind in (SECONDARY, PRIMARY):
+                xs, ys, indexes = by_kind[kind]
+                for x, y, count, index in clusters(xs, ys, indexes, scale, left, top, width, height):
+                    self._draw_cluster(kind, x, y, count, index)
+        self._drawn = self._state()
+        self._offline = self.cache is not None and not shown
+        self.status_var.set(self._status())
+
+    def _draw_cluster(self, kind, x, y, count, index):
+        colour = COLOURS[kind]
+        if count == 1:
+            self.canvas.create_oval(x - 4, y - 4, x + 4, y + 4, fill=colour, outline='white')
+            name = self.data.names[index]
+            if self.zoom >= LABEL_ZOOM and name:
+                self.canvas.create_text(x + 7, y, text=name, anchor=tk.W, fill=colour)
+            return
+        r = 9 + 3 * math.log10(count)
+        self.canvas.create_oval(x - r, y - r, x + r, y + r, fill=colour, outline='white', width=2)
+        self.canvas.create_text(x, y, text=str(count), fill='white')
+
+    def _draw_tiles(self, scale, left, top, width, height):
+        # Returns how many tiles there were to draw
+        if self.cache is None:
+            return 0
+        n = 2 ** self.zoom
+        shown = 0
+        for tx in range(int(left // TILE_SIZE), int((left + width) // TILE_SIZE) + 1):
+            for ty in range(max(0, int(top // TILE_SIZE)), min(n, int((top + height) // TILE_SIZE) + 1)):
+                path = self.cache.get(self.zoom, tx % n, ty)
+                image = self._image(path) if path else None
+                if image is None:
+                    if self.fetcher:
+                        self.fetcher.request(self.zoom, tx % n, ty)
+                    continue
+                self.canvas.create_image(tx * TILE_SIZE - left, ty * TILE_SIZE - top, image=image, anchor=tk.NW)
+                shown += 1
+        return shown
+
+    def _image(self, path):
+        # Decoded tiles, least recently used thrown out first
+        image = self._images.pop(path, None)
+        if image is None:
+            try:
+                image = tk.PhotoImage(file=path)
+            except tk.TclError:
+                return None  # Not a PNG Tk can read
+            while len(self._images) >= MAX_IMAGES:
+                self._images.popitem(last=False)
+        self._images[path] = image
+        return image
+
+    def seed_view(self):
+        # Fetches the tiles for what's in view, down to SEED_LEVELS zooms
+        # closer, in the background
+        if self._seed_thread and self._seed_thread.is_alive():
+            return
+        scale, left, top, width, height = self._view()
+        west, north = lonlat(left / scale, top / scale)
+        east, south = lonlat((left + width) / scale, (top + height) / scale)
+        zooms = range(self.zoom, min(self.zoom + SEED_LEVELS, MAX_ZOOM) + 1)
+
+        def progress(done, total):
+            self._seed_status = "Saving map for offline: {0} of {1} tiles".format(done, total)
+
+        def seed():
+            try:
+                fetched, cached, failed = self.cache.seed(south, west, north, east, zooms, progress)
+            except ValueError as e:
+                self._seed_status = str(e)
+                return
+            self._seed_status = "Saved {0} tiles for offline ({1} already saved, {2} failed)".format(
+                fetched, cached, failed)
+
+        self._seed_status = "Saving map for offline..."
+        self._seed_thread = threading.Thread(target=seed, name='TileSeeder')
+        self._seed_thread.daemon = True
+        self._seed_thread.start()
+
+
+# The map window, once it's been opened
+window = None
+
+
+def open_window(master, tile_url=None, max_bytes=None):
+    # Builds the map window the first time, and brings it back after that.
+    # Closing it only hides it, so it keeps its place. Without a tile_url only
+    # tiles already in the cache are shown.
+    global window
+    if window is not None:
+        window.deiconify()
+        window.lift()
+        return window
+    window = tk.Toplevel(master)
+    window.title("Map")
+    cache = TileCache(CACHE_DIR, tile_url, max_bytes)
+    MapView(window, MAP, cache).pack(side=tk.TOP, fill=tk.BOTH, expand=tk.YES)
+    window.protocol("WM_DELETE_WINDOW", window.withdraw)
+    return window
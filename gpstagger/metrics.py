@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------
+# gpstagger/metrics.py
+#
+# Created on: 2026-10-18
+#
+# Timings and counters for the hot paths - reading the port, parsing,
+# waiting for a fix, checking and saving an entry, writing KML - so a slow
+# Get Long/Lat or Save can be pinned on one of them. Everything goes into
+# one registry per process, shared by the tagger, the Secondary Tagger and
+# the reader threads:
+#
+#   with metrics.span('engine_save'):
+#       ...
+#   metrics.count('nmea_bytes', len(data))
+#
+# Each span keeps cumulative buckets, for the Prometheus-style dump, and the
+# last few hundred samples, for percentiles and the status bar's sparkline.
+# dump() writes the lot as JSON or, for a .prom file, Prometheus text format,
+# which node_exporter's textfile collector can pick up off each truck.
+
+from bisect import bisect_left
+from collections import deque
+import json
+import os
+import threading
+import time
+
+clock = getattr(time, 'perf_counter', time.time)
+
+# Upper bounds in seconds, from parsing a sentence to waiting for RTK
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+           0.25, 0.5, 1, 2.5, 5, 10, 30, 60, float('inf'))
+# Sparkline characters, emptiest first
+BARS = u' ▁▂▃▄▅▆▇█'
+PROM_PREFIX = 'gpstagger_'
+
+
+def format_seconds(seconds):
+    if seconds < 1:
+        return '{0:.1f} ms'.format(seconds * 1000)
+    return '{0:.1f} s'.format(seconds)
+
+
+class Histogram(object):
+    # How many recent samples are kept for percentiles
+    window = 500
+
+    def __init__(self):
+        self.buckets = [0] * len(BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+        self.recent = deque(maxlen=self.window)
+
+    def observe(self, seconds):
+        self.buckets[bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        self.recent.append(seconds)
+
+    def percentile(self, pct):
+        if not self.recent:
+            return None
+        values = sorted(self.recent)
+        return values[min(len(values) - 1, int(len(values) * pct / 100.0))]
+
+    def sparkline(self):
+        # The recent samples by bucket, from the fastest bucket used to the
+        # slowest, one character a bucket
+        if not self.recent:
+            return u''
+        counts = [0] * len(BUCKETS)
+        for seconds in self.recent:
+            counts[bisect_left(BUCKETS, seconds)] += 1
+        used = [i for i, n in enumerate(counts) if n]
+        counts = counts[used[0]:used[-1] + 1]
+        top = max(counts)
+        return u''.join(BARS[int(round(n * (len(BARS) - 1) / float(top)))] for n in counts)
+
+    def to_dict(self):
+        return {'count': self.count, 'sum': self.sum,
+                'p50': self.percentile(50), 'p95': self.percentile(95),
+                'max': max(self.recent) if self.recent else None,
+                'buckets': dict(('+Inf' if b == float('inf') else repr(b), n)
+                                for b, n in zip(BUCKETS, self.buckets))}
+
+
+class Metrics(object):
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.spans = {}
+        self.counters = {}
+        self.started = time.time()
+
+    def observe(self, name, seconds):
+        with self._lock:
+            histogram = self.spans.get(name)
+            if histogram is None:
+                histogram = self.spans[name] = Histogram()
+            histogram.observe(seconds)
+
+    def count(self, name, n=1):
+        if not n:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def span(self, name):
+        return Span(self, name)
+
+    def timed(self, name):
+        # Decorator form of span()
+        def decorate(func):
+            def wrapper(*args, **kwargs):
+                with Span(self, name):
+                    return func(*args, **kwargs)
+            wrapper.__name__ = func.__name__
+            wrapper.__doc__ = func.__doc__
+            return wrapper
+        return decorate
+
+    def summary(self, names=None, counters=None):
+        # One line for a status bar: each span's recent spread and median,
+        # then the counters. Everything unless names/counters are given.
+        with self._lock:
+            parts = []
+            for name in sorted(self.spans) if names is None else names:
+                histogram = self.spans.get(name)
+                if histogram and histogram.recent:
+                    parts.append(u'{0} {1} {2}'.format(name, histogram.sparkline(),
+                                                       format_seconds(histogram.percentile(50))))
+            for name in sorted(self.counters) if counters is None else counters:
+                if name in self.counters:
+                    parts.append(u'{0} {1}'.format(name, self.counters[name]))
+        return u'  '.join(parts)
+
+    def to_dict(self):
+        with self._lock:
+            return {'started': self.started, 'time': time.time(),
+                    'spans': dict((k, h.to_dict()) for k, h in self.spans.items()),
+                    'counters': dict(self.counters)}
+
+    def prometheus_text(self):
+        lines = []
+        with self._lock:
+            for name in sorted(self.spans):
+                histogram = self.spans[name]
+                metric = PROM_PREFIX + name + '_seconds'
+                lines.append('# TYPE {0} histogram'.format(metric))
+                cumulative = 0
+                for bound, n in zip(BUCKETS, histogram.buckets):
+                    cumulative += n
+                    lines.append('{0}_bucket{{le="{1}"}} {2}'.format(
+                        metric, '+Inf' if bound == float('inf') else repr(bound), cumulative))
+                lines.append('{0}_sum {1!r}'.format(metric, histogram.sum))
+                lines.append('{0}_count {1}'.format(metric, histogram.count))
+            for name in sorted(self.counters):
+                metric = PROM_PREFIX + name + '_total'
+                lines.append('# TYPE {0} counter'.format(metric))
+                lines.append('{0} {1}'.format(metric, self.counters[name]))
+        return '\n'.join(lines) + '\n'
+
+    def dump(self, path):
+        # Prometheus text for a .prom file, JSON otherwise. Written to a
+        # temporary file and renamed, so a collector never reads half a file.
+        if path.endswith('.prom'):
+            text = self.prometheus_text()
+        else:
+            text = json.dumps(self.to_dict(), indent=2, sort_keys=True)
+        temp = path + '.tmp'
+        with open(temp, 'w') as f:
+            f.write(text)
+        if os.path.exists(path):
+            os.remove(path)  # Windows won't rename over it
+        os.rename(temp, path)
+
+    def reset(self):
+        with self._lock:
+            self.spans.clear()
+            self.counters.clear()
+            self.started = time.time()
+
+
+class Span(object):
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+        self._start = None
+
+    def __enter__(self):
+        self._start = clock()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe(self.name, clock() - self._start)
+        return False
+
+
+# The process-wide registry
+METRICS = Metrics()
+observe = METRICS.observe
+count = METRICS.count
+span = METRICS.span
+timed = METRICS.timed
+summary = METRICS.summary
+dump = METRICS.dump
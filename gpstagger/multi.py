@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------
+# gpstagger/multi.py
+#
+# Created on: 2026-10-18
+#
+# Several receivers at once, e.g. the laptop's own GNSS card and an external
+# high-accuracy one. Each receiver keeps its own GPSReader thread, so they're
+# all read concurrently; ReceiverSet sits in front of them and looks like a
+# single GPSReader to everything else. Picking a fix only compares the latest
+# fix from each reader, so Get Long/Lat is no slower with more receivers.
+#
+# Fixes are compared by their expected error: HDOP times a nominal range error
+# for their fix type. In 'best' mode the one with the smallest wins; in 'blend'
+# mode the fresh fixes are averaged, weighted by the inverse of that squared.
+
+from collections import namedtuple
+import math
+import time
+
+from gpstagger.quality import FIX_DGPS, FIX_FLOAT_RTK, FIX_GPS, FIX_PPS, FIX_RTK
+from gpstagger.reader import has_position
+
+# Rough one-sigma range error in metres for each GGA fix quality
+UERE = {FIX_GPS: 5.0, FIX_DGPS: 1.0, FIX_PPS: 3.0, FIX_RTK: 0.02, FIX_FLOAT_RTK: 0.5}
+
+BEST = 'best'
+BLEND = 'blend'
+
+# Stands in for a GGA message when fixes are blended
+BlendedFix = namedtuple('BlendedFix', 'latitude longitude altitude gps_qual num_sats '
+                                      'horizontal_dil timestamp source')
+
+
+def expected_error(msg):
+    # Metres, or None if the fix can't be used
+    if not has_position(msg):
+        return None
+    try:
+        uere = UERE[int(msg.gps_qual)]
+        hdop = float(msg.horizontal_dil)
+    except (KeyError, TypeError, ValueError):
+        return None
+    return max(hdop, 0.1) * uere
+
+
+def blend(msgs):
+    # Inverse-variance weighted mean of msgs, which all have an expected error
+    weights = [1 / expected_error(m) ** 2 for m in msgs]
+    total = math.fsum(weights)
+    lat = math.fsum(w * float(m.latitude) for w, m in zip(weights, msgs)) / total
+    lon = math.fsum(w * float(m.longitude) for w, m in zip(weights, msgs)) / total
+    alts = [(w, float(m.altitude)) for w, m in zip(weights, msgs) if m.altitude is not None]
+    alt = math.fsum(w * a for w, a in alts) / math.fsum(w for w, a in alts) if alts else None
+    best = max(zip(weights, msgs), key=lambda p: p[0])[1]
+    # Reported as the HDOP that would give the blend's expected error at the
+    # best receiver's fix type, so it can be screened like any other fix
+    hdop = 1 / math.sqrt(total) / UERE[int(best.gps_qual)]
+    return BlendedFix(lat, lon, alt, best.gps_qual, max(int(m.num_sats or 0) for m in msgs),
+                      hdop, best.timestamp, '+'.join(m.source for m in msgs))
+
+
+class ReceiverSet(object):
+    # Seconds after which a receiver's last fix is too old to be used
+    max_age = 2.0
+
+    def __init__(self, readers, mode=BEST):
+        self.readers = list(readers)
+        self.mode = mode
+
+    @property
+    def source(self):
+        return '+'.join(r.source for r in self.readers)
+
+    def _fresh(self):
+        # (expected error, reader, fix) for every receiver with a usable, recent fix
+        fresh = []
+        for reader in self.readers:
+            age = reader.fix_age()
+            if age is None or age > self.max_age:
+                continue
+            msg = reader.latest()
+            error = expected_error(msg)
+            if error is not None:
+                fresh.append((error, reader, msg))
+        fresh.sort(key=lambda f: f[0])
+        return fresh
+
+    def best_reader(self):
+        fresh = self._fresh()
+        return fresh[0][1] if fresh else None
+
+    def latest(self):
+        fresh = self._fresh()
+        if not fresh:
+            # Nothing usable - pass on whatever the first receiver has, like a
+            # single reader would before it gets a fix
+            for reader in self.readers:
+                msg = reader.latest()
+                if msg is not None:
+                    return msg
+            return None
+        if self.mode == BLEND and len(fresh) > 1:
+            return blend([msg for error, reader, msg in fresh])
+        return fresh[0][2]
+
+    def fix_age(self):
+        ages = [a for a in (r.fix_age() for r in self.readers) if a is not None]
+        return min(ages) if ages else None
+
+    def fixes_since(self, seq, every_receiver=False):
+        # seq is a tuple of each reader's seq (anything else means from the start).
+        # In best mode only the currently best receiver's fixes are returned,
+        # unless every_receiver is set.
+        if not isinstance(seq, tuple):
+            seq = (-1,) * len(self.readers)
+        best = self.best_reader() if self.mode == BEST and not every_receiver else None
+        seqs = []
+        msgs = []
+        for reader, since in zip(self.readers, seq):
+            new_seq, new = reader.fixes_since(since)
+            seqs.append(new_seq)
+            if best is None or reader is best:
+                msgs.extend(new)
+        return tuple(seqs), msgs
+
+    def wait_since(self, seq, timeout=None):
+        # Every receiver's fixes, for logging
+        deadline = None if timeout is None else time.time() + timeout
+        while True:
+            seq, msgs = self.fixes_since(seq, every_receiver=True)
+            if msgs or (deadline is not None and time.time() >= deadline):
+                return seq, msgs
+            time.sleep(0.05)
+
+    def wait_for_fix(self, timeout=None, accept=has_position):
+        deadline = None if timeout is None else time.time() + timeout
+        while True:
+            msg = self.latest()
+            if accept(msg):
+                return msg
+            if deadline is not None and time.time() >= deadline:
+                return None
+            time.sleep(0.05)
+
+    def write(self, data):
+        # Corrections go to every receiver; any that can't use them ignore them
+        sent = False
+        for reader in self.readers:
+            sent = reader.write(data) or sent
+        return sent
+
+    def add_listener(self, listener):
+        for reader in self.readers:
+            reader.add_listener(listener)
+
+    def remove_listener(self, listener):
+        for reader in self.readers:
+            reader.remove_listener(listener)
+
+    def stop(self):
+        for reader in self.readers:
+            reader.stop()
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------
+# gpstagger/nmea.py
+#
+# Created on: 2026-10-18
+#
+# Splits the raw serial byte stream into NMEA sentences and throws away the
+# ones we don't care about (GSV, GSA, RMC...) before anything is decoded.
+# Talker IDs are ignored, so $GNGGA/$GLGGA from multi-constellation
+# receivers are picked up the same as $GPGGA
+
+import pynmea2 as gps
+
+# The longest legal sentence is 82 characters; anything longer is line noise
+MAX_SENTENCE = 82
+
+
+def checksum_ok(line):
+    # line is b'$GPGGA,...*hh' with the line ending already stripped
+    star = line.rfind(b'*')
+    if star < 0 or len(line) - star != 3:
+        return False
+    calc = 0
+    for c in bytearray(line[1:star]):
+        calc ^= c
+    try:
+        return calc == int(line[star + 1:], 16)
+    except ValueError:
+        return False
+
+
+class NMEAFramer(object):
+    # Only GGA by default - it's all the tagger reads; pass others to keep them
+    def __init__(self, sentence_types=(b'GGA',)):
+        self.sentence_types = frozenset(sentence_types)
+        self._buf = bytearray()
+        # Running totals, handy for working out how noisy a receiver is
+        self.sentences = 0
+        self.skipped = 0
+        self.bad_checksums = 0
+
+    def feed(self, data):
+        # Returns every complete, wanted, valid sentence found so far as bytes
+        self._buf += data
+        found = []
+        while True:
+            end = self._buf.find(b'\n')
+            if end < 0:
+                break
+            # A sentence cut short by a dropped byte is followed by the next
+            # one on the same line, so start from the last '$'
+            start = self._buf.rfind(b'$', 0, end)
+            line = bytes(self._buf[start:end]).rstrip(b'\r') if start >= 0 else None
+            del self._buf[:end + 1]
+            if line is None:
+                continue
+            self.sentences += 1
+            # Talker is 2 characters ($GP, $GN, $GL...), proprietary $P... is skipped
+            if line[3:6] not in self.sentence_types or line[1:2] == b'P':
+                self.skipped += 1
+                continue
+            if not checksum_ok(line):
+                self.bad_checksums += 1
+                continue
+            found.append(line)
+
+        # No newline in sight - keep the partial sentence, drop garbage
+        start = self._buf.rfind(b'$')
+        if start < 0:
+            del self._buf[:]
+        elif start > 0 or len(self._buf) > MAX_SENTENCE:
+            del self._buf[:start]
+            if len(self._buf) > MAX_SENTENCE:
+                del self._buf[:]
+        return found
+
+
+def parse(line):
+    # Builds the full pynmea2 object for a sentence the framer let through
+    try:
+        return gps.parse(line.decode('ascii'))
+    except (gps.ParseError, UnicodeDecodeError):
+        return None
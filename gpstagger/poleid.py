@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------
+# gpstagger/poleid.py
+#
+# Created on: 2026-10-18
+#
+# Pole numbers, and which ones have already been used. A pole number is any
+# number of dash-separated parts, the last of which is optional letters, a
+# number, and optional letters again:
+#
+#   BRW4     -> ('', 'BRW', 4, '')       next: BRW5
+#   BRW4-N9  -> ('BRW4-', 'N', 9, '')    next: BRW4-N10
+#   BRW4-6A  -> ('BRW4-', '', 6, 'A')    next: BRW4-7A
+#
+# Everything but the number identifies the sequence, so the registry can say
+# what the next unused number in it is without looking at every pole.
+
+from collections import namedtuple
+import re
+
+POLE_ID = re.compile(r'^(?P<head>(?:[^-]*-)*)(?P<lead>[A-Za-z]*)(?P<number>[0-9]+)(?P<trail>[A-Za-z]*)$')
+DIGIT = re.compile(r'[0-9]')
+
+
+class PoleID(namedtuple('PoleID', 'head lead number trail width')):
+    __slots__ = ()
+
+    @property
+    def sequence(self):
+        # Case doesn't make a different pole
+        return (self.head.upper(), self.lead.upper(), self.trail.upper())
+
+    def with_number(self, number):
+        # Zero padding is kept, e.g. BRW09 -> BRW10
+        return '{0}{1}{2:0{3}d}{4}'.format(self.head, self.lead, number, self.width, self.trail)
+
+
+def parse(text):
+    # PoleID for text, or None if it doesn't end in a number
+    match = POLE_ID.match(text.strip())
+    if not match:
+        return None
+    digits = match.group('number')
+    return PoleID(match.group('head'), match.group('lead'), int(digits),
+                  match.group('trail'), len(digits) if digits.startswith('0') else 1)
+
+
+def looks_like_typo(text):
+    # True for a last part that has a number in it but won't parse, which is
+    # usually a slip of the finger rather than a real pole number
+    last = text.strip().split('-')[-1]
+    return parse(text) is None and DIGIT.search(last) is not None
+
+
+class PoleRegistry(object):
+    def __init__(self, names=()):
+        self.names = set()
+        # sequence -> numbers used in it
+        self.numbers = {}
+        for name in names:
+            self.add(name)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name.strip().upper() in self.names
+
+    def add(self, name):
+        if not name or not name.strip():
+            return
+        self.names.add(name.strip().upper())
+        pole = parse(name)
+        if pole:
+            self.numbers.setdefault(pole.sequence, set()).add(pole.number)
+
+    def next_free(self, name):
+        # The next number after name's in its sequence that hasn't been used,
+        # or None if name doesn't end in a number
+        pole = parse(name)
+        if pole is None:
+            return None
+        used = self.numbers.get(pole.sequence, ())
+        number = pole.number + 1
+        while number in used:
+            number += 1
+        return pole.with_number(number)
@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------
+# gpstagger/quality.py
+#
+# Created on: 2026-10-18
+#
+# Screens GGA fixes by quality and averages a window of them into a single
+# position, along with an estimate of how much the samples wandered.
+#
+# Fix types are ranked into classes - gps < dgps < float < rtk - so a capture
+# can ask for, say, at least an RTK float fix. A differential fix whose
+# corrections have stopped arriving is only as good as an autonomous one, so
+# it's ranked as plain gps once the GGA's correction age passes max_correction_age.
+
+from collections import namedtuple
+import math
+
+from gpstagger.geodesy import EARTH_RADIUS
+from gpstagger.reader import has_position
+
+# GGA fix quality indicators
+FIX_INVALID = 0
+FIX_GPS = 1
+FIX_DGPS = 2
+FIX_PPS = 3
+FIX_RTK = 4
+FIX_FLOAT_RTK = 5
+FIX_ESTIMATED = 6
+FIX_MANUAL = 7
+FIX_SIMULATED = 8
+
+FIX_NAMES = {FIX_INVALID: 'no fix', FIX_GPS: 'GPS', FIX_DGPS: 'DGPS', FIX_PPS: 'PPS',
+             FIX_RTK: 'RTK', FIX_FLOAT_RTK: 'RTK float', FIX_ESTIMATED: 'dead reckoning',
+             FIX_MANUAL: 'manual', FIX_SIMULATED: 'simulated'}
+
+# Fix classes that can be asked for, best last. Fix types not ranked here
+# (estimated, manual, simulated) never count as a fix.
+FIX_CLASSES = ('gps', 'dgps', 'float', 'rtk')
+CLASS_NAMES = {'gps': 'GPS', 'dgps': 'DGPS', 'float': 'RTK float', 'rtk': 'RTK'}
+FIX_RANK = {FIX_GPS: 1, FIX_PPS: 1, FIX_DGPS: 2, FIX_FLOAT_RTK: 3, FIX_RTK: 4}
+DIFFERENTIAL = frozenset((FIX_DGPS, FIX_FLOAT_RTK, FIX_RTK))
+
+# Seconds after which differential corrections are too old to trust
+max_correction_age = 30
+
+# What the receiver says about its latest fix, for the status bar and the journal.
+# correction_age is None for an autonomous fix or when the receiver doesn't say.
+FixStatus = namedtuple('FixStatus', 'quality name rank sats hdop correction_age station')
+
+# spread is the DRMS of the samples about the mean, in metres
+AveragedFix = namedtuple('AveragedFix', 'latitude longitude altitude samples spread')
+
+
+class QualityFilter(object):
+    def __init__(self, max_hdop=2.5, min_sats=5,
+                 fix_types=(FIX_GPS, FIX_DGPS, FIX_PPS, FIX_RTK, FIX_FLOAT_RTK), fix_class=None):
+        self.max_hdop = max_hdop
+        self.min_sats = min_sats
+        self.fix_types = frozenset(fix_types)
+        # Also rejects anything below this class, stale corrections included
+        self.fix_class = fix_class
+
+    def accepts(self, msg):
+        if not has_position(msg):
+            return False
+        # pynmea2 leaves most of these as strings, and blank when unknown
+        try:
+            qual = int(msg.gps_qual)
+            sats = int(msg.num_sats)
+            hdop = float(msg.horizontal_dil)
+        except (TypeError, ValueError):
+            return False
+        return qual in self.fix_types and sats >= self.min_sats and hdop <= self.max_hdop and \
+            (self.fix_class is None or meets(msg, self.fix_class))
+
+
+def _number(text, kind=float):
+    # pynmea2 leaves most fields as strings, and blank when unknown
+    try:
+        return kind(text)
+    except (TypeError, ValueError):
+        return None
+
+
+def correction_age(msg):
+    # Seconds since the receiver last had differential corrections, or None
+    return _number(getattr(msg, 'age_gps_data', None))
+
+
+def fix_rank(msg, max_age=None):
+    # 0 for no usable fix, otherwise the index into FIX_CLASSES plus one
+    if not has_position(msg):
+        return 0
+    qual = _number(getattr(msg, 'gps_qual', None), int)
+    rank = FIX_RANK.get(qual, 0)
+    age = correction_age(msg)
+    max_age = max_correction_age if max_age is None else max_age
+    if qual in DIFFERENTIAL and age is not None and age > max_age:
+        return FIX_RANK[FIX_GPS]
+    return rank
+
+
+def class_rank(fix_class):
+    # 'dgps' -> 2; None means any real fix
+    return FIX_CLASSES.index(fix_class) + 1 if fix_class else 1
+
+
+def meets(msg, fix_class=None, max_age=None):
+    # True if msg is at least fix_class (see FIX_CLASSES)
+    return fix_rank(msg, max_age) >= class_rank(fix_class)
+
+
+def fix_status(msg):
+    # FixStatus for msg, or None if there's no message at all
+    if msg is None:
+        return None
+    qual = _number(getattr(msg, 'gps_qual', None), int)
+    return FixStatus(qual, FIX_NAMES.get(qual, 'unknown'), fix_rank(msg),
+                     _number(getattr(msg, 'num_sats', None), int),
+                     _number(getattr(msg, 'horizontal_dil', None)),
+                     correction_age(msg) if qual in DIFFERENTIAL else None,
+                     getattr(msg, 'ref_station_id', None) or None)
+
+
+def status_text(status):
+    # One line for the status bar, e.g. 'RTK float, 12 sats, HDOP 0.8, corrections 1.2 s old'
+    if status is None:
+        return "No data from the GPS"
+    parts = [status.name]
+    if status.sats is not None:
+        parts.append("{0} sats".format(status.sats))
+    if status.hdop is not None:
+        parts.append("HDOP {0:.1f}".format(status.hdop))
+    if status.correction_age is not None:
+        parts.append("corrections {0:.1f} s old{1}".format(
+            status.correction_age, " (stale)" if status.correction_age > max_correction_age else ""))
+    return ", ".join(parts)
+
+
+def average_fixes(msgs):
+    if not msgs:
+        return None
+    lats = [float(m.latitude) for m in msgs]
+    lons = [float(m.longitude) for m in msgs]
+    alts = [float(m.altitude) for m in msgs if m.altitude is not None]
+    n = len(lats)
+    mean_lat = math.fsum(lats) / n
+    mean_lon = math.fsum(lons) / n
+    mean_alt = math.fsum(alts) / len(alts) if alts else None
+
+    # Project onto a local flat plane around the mean to get metres
+    m_per_deg = math.radians(1) * EARTH_RADIUS
+    m_per_deg_lon = m_per_deg * math.cos(math.radians(mean_lat))
+    var_y = math.fsum(((lat - mean_lat) * m_per_deg) ** 2 for lat in lats) / n
+    var_x = math.fsum(((lon - mean_lon) * m_per_deg_lon) ** 2 for lon in lons) / n
+    spread = math.sqrt(var_x + var_y)
+    return AveragedFix(mean_lat, mean_lon, mean_alt, n, spread)
@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------
+# gpstagger/reader.py
+#
+# Created on: 2026-10-18
+#
+# Keeps the GPS serial port open in a background thread and holds on to the
+# most recent fix, so pressing Get Long/Lat never has to touch the COM port
+
+from collections import deque
+import logging
+import threading
+import time
+
+import serial
+
+from gpstagger import metrics, nmea
+
+log = logging.getLogger(__name__)
+
+
+def has_position(msg):
+    # The receiver happily reports 0.0,0.0 until it has a fix
+    return msg is not None and float(msg.latitude) != 0.0
+
+
+class GPSReader(threading.Thread):
+    # Seconds to wait before re-opening the port after a serial error
+    retry_delay = 2
+    # Recent fixes kept around for averaging; a few seconds' worth at 10 Hz
+    history_size = 64
+
+    def __init__(self, ser):
+        threading.Thread.__init__(self, name='GPSReader')
+        # Don't hold the program open if someone forgets to call stop()
+        self.daemon = True
+        self.ser = ser
+        # Stamped on every fix, so fixes from several receivers can be told apart
+        self.source = ser.port
+        self._cond = threading.Condition()
+        self._fix = None
+        self._fix_time = None
+        self.framer = nmea.NMEAFramer()
+        # Bumped on every fix, so pollers can tell which ones they've seen
+        self._seq = 0
+        self._history = deque(maxlen=self.history_size)
+        # Called as listener(msg, time) on this thread for every fix, e.g. a TrackRecorder
+        self._listeners = []
+        # (listener, exception) for each listener dropped after it raised
+        self.failed_listeners = []
+        self._stop_event = threading.Event()
+        # Corrections are written from the feed's thread while this one reads
+        self._write_lock = threading.Lock()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            try:
+                if not self.ser.is_open:
+                    with metrics.span('serial_open'):
+                        self.ser.open()
+                        self.ser.reset_input_buffer()
+                # Whatever has arrived, or block (up to ser.timeout) for one byte
+                data = self.ser.read(self.ser.in_waiting or 1)
+            except (serial.SerialException, OSError):
+                # Unplugged or locked port - back off and try again
+                metrics.count('serial_retries')
+                self._close()
+                self._stop_event.wait(self.retry_delay)
+                continue
+            framer = self.framer
+            sentences, discarded = framer.sentences, framer.skipped + framer.bad_checksums
+            for line in framer.feed(data):
+                self._handle(line)
+            metrics.count('nmea_bytes', len(data))
+            metrics.count('nmea_sentences', framer.sentences - sentences)
+            metrics.count('nmea_discarded', framer.skipped + framer.bad_checksums - discarded)
+        self._close()
+
+    def _handle(self, line):
+        with metrics.span('nmea_parse'):
+            msg = nmea.parse(line)
+        if msg is None:
+            metrics.count('nmea_unparsed')
+            return
+        msg.source = self.source
+        with self._cond:
+            self._seq += 1
+            self._fix = msg
+            self._fix_time = time.time()
+            self._history.append((self._seq, msg))
+            self._cond.notify_all()
+            listeners = list(self._listeners)
+            when = self._fix_time
+        for listener in listeners:
+            try:
+                listener(msg, when)
+            except Exception as e:
+                # A full disk under the track log mustn't stop fixes reaching
+                # the form, so give up on this listener and carry on
+                log.exception("Dropping GPS listener %r", listener)
+                metrics.count('listener_errors')
+                self.remove_listener(listener)
+                with self._cond:
+                    self.failed_listeners.append((listener, e))
+
+    def add_listener(self, listener):
+        with self._cond:
+            self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        with self._cond:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+    def write(self, data):
+        # Sends data to the receiver, e.g. RTCM corrections from gpstagger.rtcm
+        # Returns False if the port isn't open right now
+        with self._write_lock:
+            try:
+                if not self.ser.is_open:
+                    return False
+                self.ser.write(data)
+            except (serial.SerialException, OSError):
+                return False
+        return True
+
+    def _close(self):
+        try:
+            self.ser.close()
+        except (serial.SerialException, OSError):
+            pass
+
+    def latest(self):
+        # Most recent GGA message, or None if nothing has been read yet
+        with self._cond:
+            return self._fix
+
+    def wait_since(self, seq, timeout=None):
+        # Like fixes_since, but blocks until there's something newer than seq
+        with self._cond:
+            if self._seq <= seq:
+                self._cond.wait(timeout)
+            return self._seq, [msg for s, msg in self._history if s > seq]
+
+    def fixes_since(self, seq):
+        # Buffered fixes newer than seq, along with the seq to pass next time
+        with self._cond:
+            return self._seq, [msg for s, msg in self._history if s > seq]
+
+    def fix_age(self):
+        # Seconds since the last GGA message arrived
+        with self._cond:
+            if self._fix_time is None:
+                return None
+            return time.time() - self._fix_time
+
+    def wait_for_fix(self, timeout=None, accept=has_position):
+        # Returns the latest fix with a real position, waiting for one if needed
+        # Returns None if the timeout expires first
+        # accept can ask for more than a position, e.g. quality.meets for a fix class
+        deadline = None if timeout is None else time.time() + timeout
+        with self._cond:
+            while not accept(self._fix):
+                if deadline is None:
+                    self._cond.wait()
+                else:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        return None
+                    self._cond.wait(remaining)
+            return self._fix
+
+    def stop(self):
+        self._stop_event.set()
+
+
+# One reader per port per process, so the Secondary Tagger running inside the
+# main tagger shares the port instead of fighting over it
+_readers = {}
+_readers_lock = threading.Lock()
+
+
+def shared_reader(ser):
+    with _readers_lock:
+        reader = _readers.get(ser.port)
+        if reader is None or not reader.is_alive():
+            reader = GPSReader(ser)
+            reader.start()
+            _readers[ser.port] = reader
+        return reader
+
+
+def stop_all():
+    with _readers_lock:
+        for reader in _readers.values():
+            reader.stop()
+        _readers.clear()
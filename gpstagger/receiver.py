@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------
+# gpstagger/receiver.py
+#
+# Created on: 2026-10-18
+#
+# Finding the GPS receiver. Listing every COM port takes seconds on a laptop
+# with a pile of virtual ones, so the receiver that worked last time is
+# remembered (by VID/PID/serial number as well as port name) and tried first;
+# a full scan only happens if that fails, and can run in the background while
+# the form comes up.
+
+import json
+import os
+import sys
+import threading
+
+import serial
+
+# Given as the port(s), every port that looks like a receiver - see scan_all()
+ALL = 'all'
+
+# Override with the GPSTAGGER_CONFIG environment variable
+CACHE_PATH = os.environ.get('GPSTAGGER_CONFIG') or \
+    os.path.join(os.path.expanduser('~'), '.gpstagger', 'receiver.json')
+
+
+def load_cached():
+    try:
+        with open(CACHE_PATH) as f:
+            return json.load(f)
+    except (IOError, OSError, ValueError):
+        return None
+
+
+def remember(port):
+    # port is a ListPortInfo from the scan
+    info = {'device': port.device, 'vid': port.vid, 'pid': port.pid,
+            'serial_number': port.serial_number, 'description': port.description}
+    try:
+        if not os.path.isdir(os.path.dirname(CACHE_PATH)):
+            os.makedirs(os.path.dirname(CACHE_PATH))
+        with open(CACHE_PATH, 'w') as f:
+            json.dump(info, f, indent=2)
+    except (IOError, OSError):
+        pass  # Only costs a slower start next time
+
+
+def port_info(device):
+    # The ListPortInfo for one port. Linux has it in sysfs; elsewhere it takes
+    # listing the ports, which is still far quicker than opening each one.
+    if sys.platform.startswith('linux'):
+        from serial.tools.list_ports_linux import SysFS
+        return SysFS(device)
+    import serial.tools.list_ports as test_ser
+    for p in test_ser.comports():
+        if p.device == device:
+            return p
+    return None
+
+
+def probe_cached():
+    # The cached receiver's port if that receiver is still on it and it opens.
+    # Anything else that's turned up under the same name doesn't count.
+    cached = load_cached()
+    if not cached or not cached.get('device'):
+        return None
+    info = port_info(cached['device'])
+    if info is None or not same_receiver(info, cached):
+        return None
+    try:
+        ser = serial.Serial(cached['device'], timeout=0)
+    except (serial.SerialException, OSError, ValueError):
+        return None
+    ser.close()
+    return cached['device']
+
+
+def same_receiver(port, cached):
+    # USB receivers can come back on a different COM number
+    if not cached:
+        return False
+    if cached.get('vid') is None or port.vid is None:
+        # Built-in and ACPI receivers have no USB IDs, but they don't move
+        # either - the same port with the same description is the same one
+        return cached.get('vid') is None and port.vid is None and \
+            (port.device, port.description) == (cached.get('device'), cached.get('description'))
+    return (port.vid, port.pid) == (cached['vid'], cached['pid']) and \
+        (not cached.get('serial_number') or port.serial_number == cached['serial_number'])
+
+
+def scan():
+    # Lists every port, preferring the cached receiver wherever it's got to,
+    # then anything describing itself as NMEA. Remembers what it finds.
+    import serial.tools.list_ports as test_ser
+    cached = load_cached()
+    found = None
+    for p in test_ser.comports():
+        if same_receiver(p, cached):
+            found = p
+            break
+        if 'NMEA' in p.description:
+            found = p
+    if found is None:
+        return None
+    remember(found)
+    return found.device
+
+
+def scan_all():
+    # Every port that looks like a receiver, for using several at once
+    import serial.tools.list_ports as test_ser
+    cached = load_cached()
+    return [p.device for p in test_ser.comports()
+            if same_receiver(p, cached) or 'NMEA' in p.description]
+
+
+def find_port():
+    return probe_cached() or scan()
+
+
+class PortFinder(threading.Thread):
+    # find_port() off the Tk thread, or scan_all() with every set; poll done()
+    # from root.after, then use ports - empty if nothing was found
+    def __init__(self, every=False):
+        threading.Thread.__init__(self, name='PortFinder')
+        self.daemon = True
+        self.every = every
+        self.ports = []
+        self._done = threading.Event()
+
+    def run(self):
+        try:
+            if self.every:
+                self.ports = scan_all()
+            else:
+                port = find_port()
+                self.ports = [port] if port else []
+        finally:
+            self._done.set()
+
+    def done(self):
+        return self._done.is_set()
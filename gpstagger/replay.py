@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------
+# gpstagger/replay.py
+#
+# Created on: 2026-10-18
+#
+# Stands in for a receiver by playing back a recorded NMEA log, either paced
+# by the timestamps in the log or as fast as it can be read. Anywhere a port
+# is asked for, 'replay:path/to/log.nmea' plays that log instead.
+#
+# synthetic_log() makes a repeatable log for benchmarks when there's no
+# recording to hand.
+
+import random
+import time
+
+import pynmea2 as gps
+
+REPLAY_PREFIX = 'replay:'
+
+
+def nmea_seconds(line):
+    # Seconds since midnight from the hhmmss.ss field of a GGA/RMC line, or None
+    if line[3:6] not in (b'GGA', b'RMC'):
+        return None
+    field = line.split(b',', 2)[1]
+    try:
+        return int(field[0:2]) * 3600 + int(field[2:4]) * 60 + float(field[4:])
+    except ValueError:
+        return None
+
+
+class ReplaySerial(object):
+    # Looks enough like serial.Serial for GPSReader
+    timeout = 1
+
+    def __init__(self, source, speed=1.0, loop=False):
+        # source is a file name or the log itself as bytes
+        # speed 1.0 is real time, 10 is ten times faster, None/0 is flat out
+        if isinstance(source, bytes):
+            self.port = REPLAY_PREFIX + '<memory>'
+            self._data = source
+        else:
+            self.port = REPLAY_PREFIX + source
+            with open(source, 'rb') as f:
+                self._data = f.read()
+        self.speed = speed
+        self.loop = loop
+        self.is_open = False
+        self._schedule = self._build_schedule()
+        self._pos = 0
+        self._line = 0
+        self._started = None
+        # Bytes written to the "receiver", e.g. by a correction feed
+        self.written = 0
+
+    def _build_schedule(self):
+        # (end offset, seconds into the log) for every line
+        schedule = []
+        start = prev = None
+        wrap = 0
+        offset = 0
+        for line in self._data.splitlines(True):
+            offset += len(line)
+            t = nmea_seconds(line.lstrip(b'\x00'))
+            if t is not None:
+                if prev is not None and t < prev:
+                    wrap += 86400  # Past midnight
+                prev = t
+                if start is None:
+                    start = t + wrap
+                due = t + wrap - start
+            else:
+                due = schedule[-1][1] if schedule else 0
+            schedule.append((offset, due))
+        return schedule
+
+    def open(self):
+        self.is_open = True
+        self._pos = 0
+        self._line = 0
+        self._started = time.time()
+
+    def close(self):
+        self.is_open = False
+
+    def reset_input_buffer(self):
+        pass
+
+    def write(self, data):
+        self.written += len(data)
+        return len(data)
+
+    def _available_to(self):
+        # Byte offset up to which the log has "arrived" by now
+        if not self.speed:
+            return len(self._data)
+        elapsed = (time.time() - self._started) * self.speed
+        while self._line < len(self._schedule) and self._schedule[self._line][1] <= elapsed:
+            self._line += 1
+        return self._schedule[self._line - 1][0] if self._line else 0
+
+    @property
+    def in_waiting(self):
+        # Chunked like a real UART buffer would be
+        return min(4096, self._available_to() - self._pos)
+
+    def read(self, size=1):
+        deadline = time.time() + self.timeout
+        while True:
+            end = min(self._available_to(), self._pos + size)
+            if end > self._pos:
+                data = self._data[self._pos:end]
+                self._pos = end
+                return data
+            if self._pos >= len(self._data):
+                if not self.loop:
+                    # Out of log - act like a receiver that's gone quiet
+                    time.sleep(max(0, deadline - time.time()))
+                    return b''
+                self.open()
+                continue
+            if time.time() >= deadline:
+                return b''
+            time.sleep(0.01)
+
+
+def synthetic_log(epochs=1000, seed=1, lat=48.1173, lon=11.5167, chatter=True):
+    # A repeatable 1 Hz log wandering a metre or so around lat/lon, with the
+    # GSA/GSV chatter a real receiver sends between fixes
+    rng = random.Random(seed)
+    lines = []
+    for i in range(epochs):
+        t = 12 * 3600 + i
+        hhmmss = '{0:02d}{1:02d}{2:02d}.00'.format(t // 3600 % 24, t // 60 % 60, t % 60)
+        fix_lat = lat + rng.gauss(0, 0.00001)
+        fix_lon = lon + rng.gauss(0, 0.00001)
+        # NMEA gives degrees and minutes unsigned, with the hemisphere after
+        lat_dm = '{0:02d}{1:07.4f}'.format(int(abs(fix_lat)), abs(fix_lat) % 1 * 60)
+        lon_dm = '{0:03d}{1:07.4f}'.format(int(abs(fix_lon)), abs(fix_lon) % 1 * 60)
+        ns = 'N' if fix_lat >= 0 else 'S'
+        ew = 'E' if fix_lon >= 0 else 'W'
+        sats = '{0:02d}'.format(rng.randint(4, 12))
+        hdop = '{0:.1f}'.format(rng.uniform(0.6, 3.0))
+        lines.append(gps.GGA('GP', 'GGA', (hhmmss, lat_dm, ns, lon_dm, ew, '1', sats, hdop,
+                                           '545.4', 'M', '46.9', 'M', '', '')).render())
+        lines.append(gps.RMC('GP', 'RMC', (hhmmss, 'A', lat_dm, ns, lon_dm, ew, '0.0', '0.0',
+                                           '181026', '', '')).render())
+        if chatter:
+            lines.append(gps.GSA('GP', 'GSA', ('A', '3', '04', '05', '09', '12', '', '', '',
+                                               '', '', '', '', '', '2.5', hdop, '2.1')).render())
+            for n in range(1, 4):
+                lines.append(gps.GSV('GP', 'GSV', ('3', str(n), '11', '03', '03', '111', '00',
+                                                   '04', '15', '270', '00', '06', '01', '010',
+                                                   '00', '13', '06', '292', '00')).render())
+    return ('\r\n'.join(lines) + '\r\n').encode('ascii')
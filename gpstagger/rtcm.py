@@ -0,0 +1,249 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------
+# gpstagger/rtcm.py
+#
+# Created on: 2026-10-18
+#
+# Feeds RTCM 3 differential corrections into the receiver, so it can get a
+# DGPS or RTK fix without an NTRIP client of its own. Corrections come from
+# a recorded file, replayed an epoch a second, or from a local TCP port
+# serving a raw RTCM stream (str2str, a base station on the LAN, or a test
+# stand-in for a caster):
+#
+#   corrections.rtcm3           a recorded stream
+#   tcp://127.0.0.1:2101        a raw stream from a TCP server
+#
+# Only whole frames that pass their CRC are passed on, so a dropped byte on
+# the way in never turns into garbage on the receiver's port.
+
+import socket
+import threading
+import time
+
+from gpstagger import metrics
+
+PREAMBLE = 0xD3
+TCP_PREFIX = 'tcp://'
+# Frames are the preamble, 2 bytes of length, the message and a 3 byte CRC
+HEADER_SIZE = 3
+CRC_SIZE = 3
+
+
+def _crc24q_table():
+    table = []
+    for i in range(256):
+        crc = i << 16
+        for _ in range(8):
+            crc <<= 1
+            if crc & 0x1000000:
+                crc ^= 0x1864CFB
+        table.append(crc & 0xFFFFFF)
+    return table
+
+
+CRC24Q = _crc24q_table()
+
+
+def crc24q(data):
+    crc = 0
+    for c in bytearray(data):
+        crc = ((crc << 8) & 0xFFFFFF) ^ CRC24Q[(crc >> 16) ^ c]
+    return crc
+
+
+def message_type(frame):
+    # The first 12 bits of the message, e.g. 1005 for the base station position
+    frame = bytearray(frame)
+    return (frame[3] << 4) | (frame[4] >> 4)
+
+
+def make_frame(message):
+    # Wraps a message in a frame, for tests and stand-ins
+    header = bytearray((PREAMBLE, len(message) >> 8 & 0x03, len(message) & 0xFF))
+    body = bytes(header) + bytes(message)
+    crc = crc24q(body)
+    return body + bytes(bytearray((crc >> 16, crc >> 8 & 0xFF, crc & 0xFF)))
+
+
+class RTCMFramer(object):
+    def __init__(self):
+        self._buf = bytearray()
+        # Running totals, like NMEAFramer's
+        self.frames = 0
+        self.bad_crcs = 0
+        self.skipped = 0
+
+    def feed(self, data):
+        # Returns every complete frame with a good CRC found so far, as bytes
+        self._buf += data
+        found = []
+        while True:
+            start = self._buf.find(bytearray((PREAMBLE,)))
+            if start < 0:
+                self.skipped += len(self._buf)
+                del self._buf[:]
+                break
+            if start:
+                self.skipped += start
+                del self._buf[:start]
+            if len(self._buf) < HEADER_SIZE:
+                break
+            # The 6 bits above the length are reserved and always zero, so
+            # anything else means this 0xD3 is just a byte in the middle of a frame
+            if self._buf[1] & 0xFC:
+                self.skipped += 1
+                del self._buf[:1]
+                continue
+            end = HEADER_SIZE + ((self._buf[1] << 8) | self._buf[2]) + CRC_SIZE
+            if len(self._buf) < end:
+                break
+            frame = bytes(self._buf[:end])
+            crc = bytearray(frame[-CRC_SIZE:])
+            if crc24q(frame[:-CRC_SIZE]) != (crc[0] << 16) | (crc[1] << 8) | crc[2]:
+                # Resync from the next preamble
+                self.bad_crcs += 1
+                self.skipped += 1
+                del self._buf[:1]
+                continue
+            del self._buf[:end]
+            self.frames += 1
+            found.append(frame)
+        return found
+
+
+def epochs(data):
+    # Splits a recorded stream into epochs, lists of frames sent together. A
+    # base station sends each message type once an epoch, so an epoch ends
+    # when a type comes round again.
+    epoch = []
+    seen = set()
+    for frame in RTCMFramer().feed(data):
+        kind = message_type(frame)
+        if kind in seen:
+            yield epoch
+            epoch = []
+            seen = set()
+        seen.add(kind)
+        epoch.append(frame)
+    if epoch:
+        yield epoch
+
+
+class FileSource(object):
+    # Replays a recorded stream, an epoch every interval seconds
+    interval = 1.0
+
+    def __init__(self, path, loop=True):
+        self.path = path
+        self.loop = loop
+        with open(path, 'rb') as f:
+            self._epochs = list(epochs(f.read()))
+        self._next = 0
+        self._due = None
+
+    def read(self, stop_event):
+        # The next epoch once it's due, or b'' at the end of the recording
+        if self._next >= len(self._epochs):
+            if not self.loop or not self._epochs:
+                stop_event.wait(self.interval)
+                return b''
+            self._next = 0
+        if self._due is not None:
+            stop_event.wait(max(0, self._due - time.time()))
+        self._due = time.time() + self.interval
+        self._next += 1
+        return b''.join(self._epochs[self._next - 1])
+
+    def close(self):
+        pass
+
+
+class TCPSource(object):
+    # A raw RTCM stream from a TCP server, reconnected if it drops
+    retry_delay = 5
+    timeout = 2
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self._sock = None
+
+    def read(self, stop_event):
+        if self._sock is None:
+            try:
+                self._sock = socket.create_connection((self.host, self.port), self.timeout)
+            except (socket.error, OSError):
+                stop_event.wait(self.retry_delay)
+                return b''
+        try:
+            data = self._sock.recv(4096)
+        except socket.timeout:
+            return b''
+        except (socket.error, OSError):
+            data = b''
+        if not data:
+            # Closed at the other end - try again in a bit
+            self.close()
+            stop_event.wait(self.retry_delay)
+        return data
+
+    def close(self):
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            except (socket.error, OSError):
+                pass
+            self._sock = None
+
+
+def open_source(spec):
+    # A FileSource or TCPSource for 'path/to/file.rtcm3' or 'tcp://host:port'
+    if spec.startswith(TCP_PREFIX):
+        host, _, port = spec[len(TCP_PREFIX):].rpartition(':')
+        return TCPSource(host or 'localhost', int(port))
+    return FileSource(spec)
+
+
+class CorrectionFeed(threading.Thread):
+    def __init__(self, source, receiver):
+        # source is a FileSource/TCPSource (or a spec for open_source), receiver
+        # anything with write(), e.g. a GPSReader or ReceiverSet
+        threading.Thread.__init__(self, name='CorrectionFeed')
+        self.daemon = True
+        self.source = open_source(source) if isinstance(source, str) else source
+        self.receiver = receiver
+        self.framer = RTCMFramer()
+        # Frames passed on, by message type
+        self.sent = {}
+        self.dropped = 0
+        self._last_sent = None
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        try:
+            while not self._stop_event.is_set():
+                for frame in self.framer.feed(self.source.read(self._stop_event)):
+                    self._send(frame)
+        finally:
+            self.source.close()
+
+    def _send(self, frame):
+        if not self.receiver.write(frame):
+            # The port's down; corrections are no use late, so don't queue them
+            self.dropped += 1
+            metrics.count('rtcm_dropped')
+            return
+        metrics.count('rtcm_bytes', len(frame))
+        kind = message_type(frame)
+        with self._lock:
+            self.sent[kind] = self.sent.get(kind, 0) + 1
+            self._last_sent = time.time()
+
+    def age(self):
+        # Seconds since corrections last went to the receiver, or None if none have
+        with self._lock:
+            return None if self._last_sent is None else time.time() - self._last_sent
+
+    def stop(self):
+        self._stop_event.set()
@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------
+# gpstagger/schema.py
+#
+# Created on: 2026-10-18
+#
+# The asset fields captured by GPS Tagger, shared by the form, the CSV writer
+# and the command line. Feel free to add more here if you need them
+
+FIELDS = 'gs_equipment_location', 'gs_serial_number', 'gs_rated_input_voltage', \
+         'gs_rated_output_voltage', 'gs_substype_cd', 'gs_rated_kva', 'gs_phase', 'gs_secondary_feeds',\
+         'gs_amr_identification', 'long', 'lat', 'gs_height', 'gs_class'
+
+LABELS = { 'gs_equipment_location':'Pole #', 'gs_serial_number':'Transformer Serial #', 'gs_rated_input_voltage':'Vpri',\
+           'gs_rated_output_voltage':'Vsec', 'gs_substype_cd':'Overhead/Padmount', 'gs_rated_kva':'kVA',\
+           'gs_phase':'Phase', 'gs_secondary_feeds':'Secondary Feeds (Meter #s)',\
+           'gs_amr_identification':'Pole Meter #','long':'Longitude', 'lat':'Latitude',\
+           'gs_height':'Pole Height', 'gs_class':'Pole Class' }
+
+# Filled in when an asset is saved rather than typed into the form
+STAMP_FIELDS = ('capture_time',)
+
+# Columns of a new columnar CSV
+CSV_FIELDS = FIELDS + STAMP_FIELDS
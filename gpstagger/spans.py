@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------
+# gpstagger/spans.py
+#
+# Created on: 2026-10-18
+#
+# Builds the spans from a primary pole out to each of its secondaries, with
+# lengths and bearings worked out for the whole pole in one batch
+
+from gpstagger.geodesy import FEET_PER_METRE, spans
+
+# Columns of the companion spans CSV
+SPAN_FIELDS = ('primary_pole', 'secondary', 'from_long', 'from_lat', 'to_long', 'to_lat',
+               'length_m', 'length_ft', 'bearing')
+
+
+def span_table(pole_num, primary, secondaries):
+    # primary is (lon, lat), secondaries a list of (name, lon, lat), all floats
+    # Returns one dict per span, keyed by SPAN_FIELDS
+    lons = [s[1] for s in secondaries]
+    lats = [s[2] for s in secondaries]
+    lengths, bearings = spans(primary[1], primary[0], lats, lons)
+    rows = []
+    for (name, lon, lat), length, bearing in zip(secondaries, lengths, bearings):
+        rows.append({'primary_pole': pole_num, 'secondary': name,
+                     'from_long': primary[0], 'from_lat': primary[1],
+                     'to_long': lon, 'to_lat': lat,
+                     'length_m': round(length, 2),
+                     'length_ft': round(length * FEET_PER_METRE, 1),
+                     'bearing': round(bearing, 1)})
+    return rows
+
+
+def span_lines(rows):
+    # KML LineStrings for the rows from span_table(), for KMLWriter.write_folder
+    return [("Span to " + row['secondary'],
+             (row['from_long'], row['from_lat']),
+             (row['to_long'], row['to_lat']),
+             [('length_m', row['length_m']), ('length_ft', row['length_ft']),
+              ('bearing', row['bearing'])])
+            for row in rows]
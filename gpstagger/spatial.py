@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------
+# gpstagger/spatial.py
+#
+# Created on: 2026-10-18
+#
+# An in-memory index of captured poles for "is this pole already in?" on save
+# and nearest-pole lookups. Poles go into a grid of fixed-size cells keyed by
+# (row, column), so a search only looks at the handful of cells around the
+# point instead of every pole in the territory.
+
+import math
+
+from gpstagger.csvout import read_records
+from gpstagger.geodesy import EARTH_RADIUS
+
+METRES_PER_DEGREE = EARTH_RADIUS * math.pi / 180
+
+
+def distance(lat0, lon0, lat1, lon1):
+    # Haversine, in metres
+    phi0 = math.radians(lat0)
+    phi1 = math.radians(lat1)
+    a = (math.sin((phi1 - phi0) / 2) ** 2 +
+         math.cos(phi0) * math.cos(phi1) * math.sin(math.radians(lon1 - lon0) / 2) ** 2)
+    return 2 * EARTH_RADIUS * math.asin(math.sqrt(min(max(a, 0.0), 1.0)))
+
+
+class PoleIndex(object):
+    # Cells are cell_size metres north-south. East-west they're the same number
+    # of degrees, so narrower in metres away from the equator - searches allow for it.
+    def __init__(self, cell_size=25.0):
+        self.cell_deg = cell_size / METRES_PER_DEGREE
+        self.cells = {}
+        self.count = 0
+        self._bounds = None
+
+    def __len__(self):
+        return self.count
+
+    def _cell(self, lat, lon):
+        return int(math.floor(lat / self.cell_deg)), int(math.floor(lon / self.cell_deg))
+
+    def add(self, lat, lon, name=None, source=None):
+        row, col = cell = self._cell(lat, lon)
+        self.cells.setdefault(cell, []).append((lat, lon, name, source))
+        self.count += 1
+        if self._bounds is None:
+            self._bounds = [row, row, col, col]
+        else:
+            b = self._bounds
+            b[0], b[1], b[2], b[3] = min(b[0], row), max(b[1], row), min(b[2], col), max(b[3], col)
+
+    def _reach(self, lat, metres):
+        # Cells either side of a point's cell that can hold something within metres
+        lat_cells = int(math.ceil(metres / (self.cell_deg * METRES_PER_DEGREE)))
+        cos_lat = max(math.cos(math.radians(abs(lat) + self.cell_deg * (lat_cells + 1))), 1e-6)
+        lon_cells = int(math.ceil(metres / (self.cell_deg * METRES_PER_DEGREE * cos_lat)))
+        return lat_cells, lon_cells
+
+    def _search(self, lat, lon, radius):
+        # (metres, cell, position in cell, pole) for every pole within radius
+        row, col = self._cell(lat, lon)
+        lat_cells, lon_cells = self._reach(lat, radius)
+        for r in range(row - lat_cells, row + lat_cells + 1):
+            for c in range(col - lon_cells, col + lon_cells + 1):
+                for i, pole in enumerate(self.cells.get((r, c), ())):
+                    d = distance(lat, lon, pole[0], pole[1])
+                    if d <= radius:
+                        yield d, (r, c), i, pole
+
+    def within(self, lat, lon, radius):
+        # Poles within radius metres, nearest first, as (metres, lat, lon, name, source)
+        found = [(d,) + pole for d, cell, i, pole in self._search(lat, lon, radius)]
+        found.sort(key=lambda p: p[0])
+        return found
+
+    def nearest(self, lat, lon, n=1):
+        # The n nearest poles, as (metres, lat, lon, name, source). Searches rings
+        # of cells outwards until nothing further out could be any closer.
+        if not self.count:
+            return []
+        row, col = self._cell(lat, lon)
+        # Narrowest a cell gets in metres, at the query or any pole in the index
+        b = self._bounds
+        widest_lat = max(abs(b[0]), abs(b[1]) + 1, abs(row) + 1) * self.cell_deg
+        cell_min = self.cell_deg * METRES_PER_DEGREE * max(math.cos(math.radians(min(widest_lat, 90))), 1e-6)
+        last_ring = max(abs(row - b[0]), abs(row - b[1]), abs(col - b[2]), abs(col - b[3]))
+        found = []
+        ring = 0
+        while ring <= last_ring:
+            # Out where the rings are mostly empty cells - far from every
+            # pole, or after more poles than there are - it's quicker to just
+            # measure them all
+            if 8 * ring > len(self.cells):
+                found = [(distance(lat, lon, pole[0], pole[1]),) + pole
+                         for poles in self.cells.values() for pole in poles]
+                break
+            for r, c in self._ring(row, col, ring):
+                for pole in self.cells.get((r, c), ()):
+                    found.append((distance(lat, lon, pole[0], pole[1]),) + pole)
+            if len(found) >= n:
+                found.sort(key=lambda p: p[0])
+                del found[n:]
+                # Anything in ring + 1 or beyond is at least ring whole cells away
+                if found[-1][0] <= ring * cell_min:
+                    break
+            ring += 1
+        found.sort(key=lambda p: p[0])
+        return found[:n]
+
+    def _ring(self, row, col, ring):
+        if ring == 0:
+            yield row, col
+            return
+        for c in range(col - ring, col + ring + 1):
+            yield row - ring, c
+            yield row + ring, c
+        for r in range(row - ring + 1, row + ring):
+            yield r, col - ring
+            yield r, col + ring
+
+    def duplicates(self, radius):
+        # Every pair of poles within radius metres of each other, once each,
+        # as (metres, pole, other pole)
+        pairs = []
+        for cell, poles in self.cells.items():
+            for i, pole in enumerate(poles):
+                for d, other_cell, j, other in self._search(pole[0], pole[1], radius):
+                    if (other_cell, j) > (cell, i):
+                        pairs.append((d, pole, other))
+        pairs.sort(key=lambda p: p[0])
+        return pairs
+
+
+def add_records(index, records, source=None):
+    # Asset dicts from a CSV (see csvout.read_records); ones without a position are skipped
+    for record in records:
+        try:
+            lat, lon = float(record['lat']), float(record['long'])
+        except (KeyError, ValueError):
+            continue
+        index.add(lat, lon, record.get('gs_equipment_location'), source)
+
+
+def index_files(paths, index=None):
+    # Asset CSVs and the primary poles from Secondary Tagger project KMLs
+    # kmlout imports this module for KMLWriter.poles
+    from gpstagger.kmlout import read_points
+    index = index if index is not None else PoleIndex()
+    for path in paths:
+        if path.lower().endswith('.kml'):
+            for folder, name, lon, lat in read_points(path):
+                if name == folder:
+                    index.add(lat, lon, name, path)
+        else:
+            add_records(index, read_records(path), path)
+    return index
@@ -0,0 +1,274 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------
+# gpstagger/tiles.py
+#
+# Created on: 2026-10-18
+#
+# Basemap tiles for the map preview, kept in an on-disk cache so the map still
+# works out of signal. Tiles are the usual 256 px Web Mercator z/x/y tiles,
+# fetched from a URL template such as
+#
+#   https://tiles.example.com/{z}/{x}/{y}.png
+#   file:///C:/maps/tiles/{z}/{x}/{y}.png     tiles already copied to disk
+#
+# and stored as <cache>/z/x/y.png. The cache is held under max_bytes by
+# throwing out the least recently used tiles first; a tile's modification
+# time is bumped whenever it's used, so the order survives a restart.
+#
+# seed() fetches every tile in a bounding box ahead of time - the day's work
+# area, say, while there's still wifi at the yard. Bulk downloading from
+# openstreetmap.org's own servers is against their tile usage policy, so
+# seed from your own tile server or a provider that allows it.
+
+from collections import OrderedDict
+import math
+import os
+import threading
+import time
+
+from gpstagger import metrics
+
+try:
+    from queue import LifoQueue  # Python 3.x
+    from urllib.request import Request, urlopen
+except ImportError:  # Python 2.x
+    from Queue import LifoQueue
+    from urllib2 import Request, urlopen
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional
+    np = None
+
+TILE_SIZE = 256
+MAX_ZOOM = 19
+# Web Mercator stops short of the poles
+MAX_LAT = 85.0511287798
+CACHE_DIR = os.environ.get('GPSTAGGER_TILES') or \
+    os.path.join(os.path.expanduser('~'), '.gpstagger', 'tiles')
+USER_AGENT = 'gpstagger'
+
+
+def mercator(lon, lat):
+    # Long/Lat -> (x, y) across the whole world from 0 to 1, y down from the
+    # top. Times TILE_SIZE * 2 ** zoom gives pixels at that zoom.
+    lat = min(max(lat, -MAX_LAT), MAX_LAT)
+    sin_lat = math.sin(math.radians(lat))
+    return (lon + 180.0) / 360.0, 0.5 - math.log((1 + sin_lat) / (1 - sin_lat)) / (4 * math.pi)
+
+
+def mercator_many(lons, lats):
+    # mercator() for whole lists at once, returned as two lists
+    if np is None:
+        xs = []
+        ys = []
+        for lon, lat in zip(lons, lats):
+            x, y = mercator(lon, lat)
+            xs.append(x)
+            ys.append(y)
+        return xs, ys
+    lat = np.clip(np.asarray(lats, dtype=np.float64), -MAX_LAT, MAX_LAT)
+    sin_lat = np.sin(np.radians(lat))
+    xs = (np.asarray(lons, dtype=np.float64) + 180.0) / 360.0
+    ys = 0.5 - np.log((1 + sin_lat) / (1 - sin_lat)) / (4 * math.pi)
+    return xs.tolist(), ys.tolist()
+
+
+def lonlat(x, y):
+    # Undoes mercator()
+    return x * 360.0 - 180.0, math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y))))
+
+
+def tiles_in_bbox(south, west, north, east, zoom):
+    # (zoom, x, y) of every tile covering the box
+    n = 2 ** zoom
+    left, top = mercator(west, north)
+    right, bottom = mercator(east, south)
+    x0, x1 = int(left * n), min(int(right * n), n - 1)
+    y0, y1 = int(top * n), min(int(bottom * n), n - 1)
+    return [(zoom, x, y) for x in range(x0, x1 + 1) for y in range(y0, y1 + 1)]
+
+
+class TileCache(object):
+    # Tiles kept on disk, in bytes, before the least recently used go
+    max_bytes = 500 * 1024 * 1024
+    # Refuse to seed more than this many tiles at once
+    max_seed = 50000
+    timeout = 10
+    # Seconds before a tile that failed to download is tried again, so an
+    # unreachable server isn't asked over and over while the map is panned
+    retry_after = 60
+
+    def __init__(self, directory=CACHE_DIR, url=None, max_bytes=None):
+        self.directory = directory
+        self.url = url
+        if max_bytes is not None:
+            self.max_bytes = max_bytes
+        # (z, x, y) -> bytes on disk, least recently used first
+        self._used = OrderedDict()
+        self.size = 0
+        self._failed = {}
+        # The map view and the fetcher thread both use the cache
+        self._lock = threading.Lock()
+        self._scan()
+
+    def _scan(self):
+        found = []
+        for z in os.listdir(self.directory) if os.path.isdir(self.directory) else ():
+            for dirpath, dirnames, filenames in os.walk(os.path.join(self.directory, z)):
+                for name in filenames:
+                    if not name.endswith('.png'):
+                        continue
+                    path = os.path.join(dirpath, name)
+                    try:
+                        key = (int(z), int(os.path.basename(dirpath)), int(name[:-len('.png')]))
+                        stat = os.stat(path)
+                    except (ValueError, OSError):
+                        continue
+                    found.append((stat.st_mtime, key, stat.st_size))
+        for mtime, key, size in sorted(found):
+            self._used[key] = size
+            self.size += size
+
+    def __len__(self):
+        return len(self._used)
+
+    def path(self, z, x, y):
+        return os.path.join(self.directory, str(z), str(x), '{0}.png'.format(y))
+
+    def get(self, z, x, y):
+        # The tile's file if it's cached, otherwise None - never downloads
+        key = (z, x, y)
+        with self._lock:
+            size = self._used.pop(key, None)
+            if size is None:
+                return None
+            self._used[key] = size
+        path = self.path(z, x, y)
+        try:
+            os.utime(path, None)
+        except OSError:
+            # Deleted from under us
+            with self._lock:
+                if self._used.pop(key, None) is not None:
+                    self.size -= size
+            return None
+        return path
+
+    def fetch(self, z, x, y):
+        # Downloads a tile into the cache; returns its file, or None if it
+        # couldn't be had
+        key = (z, x, y)
+        path = self.get(z, x, y)
+        if path or not self.url:
+            return path
+        failed = self._failed.get(key)
+        if failed is not None and time.time() - failed < self.retry_after:
+            return None
+        url = self.url.format(z=z, x=x, y=y)
+        try:
+            with metrics.span('tile_fetch'):
+                response = urlopen(Request(url, headers={'User-Agent': USER_AGENT}), timeout=self.timeout)
+                try:
+                    data = response.read()
+                finally:
+                    response.close()
+        except (IOError, OSError, ValueError):
+            self._failed[key] = time.time()
+            metrics.count('tile_errors')
+            return None
+        self._failed.pop(key, None)
+        path = self.path(z, x, y)
+        if not os.path.isdir(os.path.dirname(path)):
+            try:
+                os.makedirs(os.path.dirname(path))
+            except OSError:
+                pass  # Made by another thread in the meantime
+        # Written under another name and renamed, so a half-written tile is never used
+        temp = '{0}.{1}.tmp'.format(path, threading.current_thread().ident)
+        with open(temp, 'wb') as f:
+            f.write(data)
+        if os.path.exists(path):
+            os.remove(path)  # Windows won't rename over it
+        os.rename(temp, path)
+        metrics.count('tile_bytes', len(data))
+        with self._lock:
+            # The seeder and the map's fetcher may both have gone for it
+            self.size -= self._used.pop(key, 0)
+            self._used[key] = len(data)
+            self.size += len(data)
+            self._evict()
+        return path
+
+    def _evict(self):
+        # Throws out the least recently used tiles until it's under max_bytes
+        while self.size > self.max_bytes and len(self._used) > 1:
+            key, size = self._used.popitem(last=False)
+            self.size -= size
+            try:
+                os.remove(self.path(*key))
+            except OSError:
+                pass
+            metrics.count('tiles_evicted')
+
+    def seed(self, south, west, north, east, zooms, progress=None, stop_event=None):
+        # Fetches every tile of the box at each of zooms that isn't cached yet.
+        # progress(done, total) is called after each tile. Returns (fetched,
+        # cached already, failed).
+        tiles = []
+        for zoom in zooms:
+            tiles.extend(tiles_in_bbox(south, west, north, east, zoom))
+        if len(tiles) > self.max_seed:
+            raise ValueError("That's {0} tiles - seed a smaller area or fewer zoom levels "
+                             "(at most {1})".format(len(tiles), self.max_seed))
+        if not self.url:
+            raise ValueError("No tile URL to seed from")
+        fetched = cached = failed = 0
+        for n, tile in enumerate(tiles, 1):
+            if stop_event is not None and stop_event.is_set():
+                break
+            if self.get(*tile):
+                cached += 1
+            elif self.fetch(*tile):
+                fetched += 1
+            else:
+                failed += 1
+            if progress:
+                progress(n, len(tiles))
+        return fetched, cached, failed
+
+
+class TileFetcher(threading.Thread):
+    # Downloads tiles for the map in the background, newest request first, so
+    # the tiles for where the map is now come before ones it's been panned past
+    def __init__(self, cache):
+        threading.Thread.__init__(self, name='TileFetcher')
+        self.daemon = True
+        self.cache = cache
+        self._queue = LifoQueue()
+        self._pending = set()
+        self._lock = threading.Lock()
+        # Goes up as tiles arrive, for the map to notice and redraw
+        self.fetched = 0
+
+    def request(self, z, x, y):
+        key = (z, x, y)
+        with self._lock:
+            if key in self._pending:
+                return
+            self._pending.add(key)
+        self._queue.put(key)
+
+    def run(self):
+        while True:
+            key = self._queue.get()
+            if key is None:
+                return
+            path = self.cache.fetch(*key)
+            with self._lock:
+                self._pending.discard(key)
+                if path:
+                    self.fetched += 1
+
+    def stop(self):
+        self._queue.put(None)
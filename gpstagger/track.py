@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------
+# gpstagger/track.py
+#
+# Created on: 2026-10-18
+#
+# Records every fix the receiver reports while the tagger is running, and
+# afterwards matches saved assets to that track by their capture time - to
+# fill in positions nobody clicked Get Long/Lat for, or to replace single
+# readings with the track's.
+#
+# Track and assets are both stamped with the computer's clock, so they line
+# up with each other whether or not the clock agrees with GPS time.
+#
+# A track is either a CSV or, for a path ending in .fix, a binary fix log
+# (see gpstagger/fixlog.py); backfill() takes either.
+
+from bisect import bisect_right
+import calendar
+from datetime import datetime
+import threading
+import time
+
+from gpstagger.csvout import COLUMNAR, CSVWriter, read_header, read_records
+from gpstagger.fixlog import EXTENSION, FixLog, FixLogReader, is_fixlog
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional
+    np = None
+
+# Columns of a track (and of the fix log from the command line)
+TRACK_FIELDS = ('time', 'utc', 'gps_time', 'lat', 'long', 'alt', 'quality', 'sats', 'hdop', 'source')
+
+
+def to_iso(epoch):
+    return datetime.utcfromtimestamp(epoch).isoformat()
+
+
+def to_epoch(iso):
+    fmt = '%Y-%m-%dT%H:%M:%S.%f' if '.' in iso else '%Y-%m-%dT%H:%M:%S'
+    dt = datetime.strptime(iso, fmt)
+    return calendar.timegm(dt.timetuple()) + dt.microsecond / 1e6
+
+
+def fix_row(msg, when=None):
+    when = time.time() if when is None else when
+    return {'time': '{0:.3f}'.format(when), 'utc': to_iso(when), 'gps_time': msg.timestamp,
+            'lat': msg.latitude, 'long': msg.longitude, 'alt': msg.altitude,
+            'quality': msg.gps_qual, 'sats': msg.num_sats, 'hdop': msg.horizontal_dil,
+            'source': getattr(msg, 'source', '')}
+
+
+class TrackRecorder(object):
+    # A GPSReader listener that appends every fix to a track CSV. It runs on
+    # the reader thread, which is the only thing that ever touches the file.
+    def __init__(self, path):
+        self.writer = CSVWriter(path, TRACK_FIELDS, COLUMNAR, flush_every=60, flush_interval=10)
+        # close() comes from the main thread, possibly mid-write
+        self._lock = threading.Lock()
+
+    def __call__(self, msg, when):
+        if float(msg.latitude) == 0.0:
+            return
+        with self._lock:
+            if self.writer:
+                self.writer.write(fix_row(msg, when))
+                self.writer.poll()
+
+    def close(self):
+        with self._lock:
+            if self.writer:
+                self.writer.close()
+                self.writer = None
+
+
+def recorder(path):
+    # A listener recording every fix to path, as a fix log or a track CSV
+    if path.lower().endswith(EXTENSION):
+        return FixLog(path)
+    return TrackRecorder(path)
+
+
+def read_csv_track(path):
+    # (time, lat, long) of each fix in a track CSV
+    for row in read_records(path):
+        try:
+            yield float(row['time']), float(row['lat']), float(row['long'])
+        except (KeyError, ValueError):
+            continue
+
+
+class TrackIndex(object):
+    # Every fix from one or more track files, sorted by time. With NumPy these
+    # are arrays, and a fix log's are views of the memory-mapped file rather
+    # than copies of it.
+    def __init__(self, paths):
+        if np is not None:
+            self._load_numpy(paths)
+            return
+        fixes = []
+        for path in paths:
+            if is_fixlog(path):
+                with FixLogReader(path) as reader:
+                    fixes.extend(fix[:3] for fix in reader.rows())
+            else:
+                fixes.extend(read_csv_track(path))
+        fixes.sort()
+        self.times = [f[0] for f in fixes]
+        self.lats = [f[1] for f in fixes]
+        self.lons = [f[2] for f in fixes]
+
+    def _load_numpy(self, paths):
+        columns = []
+        for path in paths:
+            if is_fixlog(path):
+                with FixLogReader(path) as reader:
+                    # The views keep the file mapped after the reader's closed
+                    columns.append((reader.fixes['time'], reader.fixes['lat'], reader.fixes['lon']))
+                continue
+            fixes = np.array(list(read_csv_track(path)), dtype=np.float64).reshape(-1, 3)
+            columns.append((fixes[:, 0], fixes[:, 1], fixes[:, 2]))
+        if len(columns) == 1:
+            times, lats, lons = columns[0]
+        else:
+            times, lats, lons = [np.concatenate([c[i] for c in columns]) if columns else np.zeros(0)
+                                 for i in range(3)]
+        # A single log is already in time order, so this usually copies nothing
+        if len(times) > 1 and not (times[1:] >= times[:-1]).all():
+            order = np.argsort(times, kind='mergesort')
+            times, lats, lons = times[order], lats[order], lons[order]
+        self.times, self.lats, self.lons = times, lats, lons
+
+    def __len__(self):
+        return len(self.times)
+
+    def locate(self, times, max_gap=5.0):
+        # Interpolated (lat, long) at each time, or None where the time is outside
+        # the track or the fixes either side are more than max_gap seconds apart
+        if not len(self.times) or not times:
+            return [None] * len(times)
+        if np is not None:
+            return self._locate_numpy(times, max_gap)
+        return [self._locate_one(t, max_gap) for t in times]
+
+    def _locate_one(self, t, max_gap):
+        n = len(self.times)
+        hi = bisect_right(self.times, t)
+        if hi == 0 or (hi == n and self.times[-1] != t):
+            return None
+        lo = hi - 1
+        hi = min(hi, n - 1)
+        gap = self.times[hi] - self.times[lo]
+        if gap > max_gap:
+            return None
+        w = (t - self.times[lo]) / gap if gap else 0.0
+        return (self.lats[lo] + w * (self.lats[hi] - self.lats[lo]),
+                self.lons[lo] + w * (self.lons[hi] - self.lons[lo]))
+
+    def _locate_numpy(self, times, max_gap):
+        # Same as _locate_one, for every asset at once
+        track_t = np.asarray(self.times)
+        track_lat = np.asarray(self.lats)
+        track_lon = np.asarray(self.lons)
+        q = np.asarray(times, dtype=np.float64)
+        n = len(track_t)
+        hi = np.searchsorted(track_t, q, side='right')
+        lo = np.clip(hi - 1, 0, n - 1)
+        hi = np.clip(hi, 0, n - 1)
+        gap = track_t[hi] - track_t[lo]
+        inside = (q >= track_t[0]) & (q <= track_t[-1]) & (gap <= max_gap)
+        w = np.where(gap > 0, (q - track_t[lo]) / np.where(gap > 0, gap, 1), 0.0)
+        lat = track_lat[lo] + w * (track_lat[hi] - track_lat[lo])
+        lon = track_lon[lo] + w * (track_lon[hi] - track_lon[lo])
+        return [(a, b) if ok else None for a, b, ok in zip(lat.tolist(), lon.tolist(), inside.tolist())]
+
+
+def backfill(src, track_paths, dst, refine=False, max_gap=5.0):
+    # Writes src to dst with positions taken from the track: only where lat/long
+    # are missing, or for every asset if refine is set. Assets get a
+    # position_source of 'track' when their position came from here.
+    # Returns (assets, positioned).
+    index = TrackIndex(track_paths)
+    # First pass: every asset's capture time, and every column any asset uses -
+    # a Parameter,Value file has no header saying which those are
+    header = read_header(src) or []
+    fields = list(header) if header != ['Parameter', 'Value'] else []
+    seen = set(fields)
+    times = []
+    for record in read_records(src):
+        for k in record:
+            if k not in seen:
+                seen.add(k)
+                fields.append(k)
+        try:
+            times.append(to_epoch(record['capture_time']))
+        except (KeyError, ValueError):
+            times.append(None)
+    located = index.locate([t if t is not None else -1.0 for t in times], max_gap)
+
+    for extra in ('long', 'lat', 'capture_time', 'position_source'):
+        if extra not in fields:
+            fields.append(extra)
+    writer = CSVWriter(dst, fields, COLUMNAR, flush_every=1000)
+    positioned = 0
+    for record, when, position in zip(read_records(src), times, located):
+        if when is not None and position and (refine or not (record.get('lat') and record.get('long'))):
+            record['lat'], record['long'] = position
+            record['position_source'] = 'track'
+            positioned += 1
+        writer.write(record)
+    writer.close()
+    return len(times), positioned
@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------
+# gpstagger/validate.py
+#
+# Created on: 2026-10-18
+#
+# Sanity checks on an asset before it's saved. Nothing here talks to the
+# user - the form decides whether to ask, the command line just reports.
+#
+# The checks are data rather than code: SCHEMA says how to read each field
+# and what's out of range, RULES say which combinations of values are
+# suspicious. check_entry() applies them to one asset as it's saved;
+# check_records() applies them to a whole CSV at once for QA.
+
+from collections import namedtuple
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional
+    np = None
+
+COMMON_INPUT_VOLTAGES = (2770, 4800, 7200, 12470, 13220, 22900, 19920, 34500,
+                         39840, 69000, 66400, 115000, 132800, 230000, 199200, 345000,
+                         288680, 500000, 441690, 765000)
+COMMON_OUTPUT_VOLTAGES = (120, 208, 240, 415, 277, 480)
+
+# Input voltages are listed in line-ground/line-phase pairs; the same goes for
+# output voltages. Mixing one kind on the primary with the other on the
+# secondary is usually a typo.
+LINE_PHASE_INPUTS = frozenset(COMMON_INPUT_VOLTAGES[1::2])
+LINE_GROUND_OUTPUTS = frozenset(COMMON_OUTPUT_VOLTAGES[0::2])
+
+# Standard transformer sizes. Three-phase banks of single-phase pots are
+# recorded as the total, so three of each single-phase size count too.
+SINGLE_PHASE_KVA = frozenset((5, 10, 15, 25, 37.5, 50, 75, 100, 167, 250, 333, 500))
+THREE_PHASE_KVA = frozenset((15, 30, 45, 75, 112.5, 150, 225, 300, 500, 750, 1000, 1500,
+                             2000, 2500, 3000, 3750, 5000)) | frozenset(3 * k for k in SINGLE_PHASE_KVA)
+
+# Warning codes, so the form can remember which ones the user has waved through
+MIXED_VOLTAGES = 'mixed_voltages'
+ODD_KVA = 'odd_kva'
+# Raised by CaptureEngine.check(), paired with the pole's name
+NEARBY_POLE = 'nearby_pole'
+DUPLICATE_POLE = 'duplicate_pole'
+
+NUMBERS_ONLY = "Please only input numbers into voltage and kVA fields."
+
+
+def phase_count(text):
+    # '1', '3', 'A', 'BC', 'ABC' -> 1, 2, 3; anything else -> None
+    text = text.strip().upper()
+    if text.isdigit():
+        return int(text)
+    if text and set(text) <= set('ABC'):
+        return len(set(text))
+    return None
+
+
+# parse turns the text into a value (ValueError if it can't); if it can't and
+# error is set, that's an error, otherwise the field is just left out of the rules
+Field = namedtuple('Field', 'parse error low high')
+
+SCHEMA = {
+    'gs_rated_input_voltage': Field(int, NUMBERS_ONLY, None, None),
+    'gs_rated_output_voltage': Field(int, NUMBERS_ONLY, None, None),
+    'gs_rated_kva': Field(float, NUMBERS_ONLY, None, None),
+    'gs_phase': Field(phase_count, None, 1, 3),
+    'lat': Field(float, "Latitude should be a number between -90 and 90.", -90, 90),
+    'long': Field(float, "Longitude should be a number between -180 and 180.", -180, 180),
+}
+
+# A rule warns when every field in `when` has a value in its set, and every
+# field in `unless` has a value that isn't. The message is formatted with the
+# asset's fields as typed.
+Rule = namedtuple('Rule', 'code message when unless')
+
+RULES = (
+    Rule(MIXED_VOLTAGES, "Did you mean to mix line-ground and line-phase voltages?",
+         {'gs_rated_output_voltage': LINE_GROUND_OUTPUTS, 'gs_rated_input_voltage': LINE_PHASE_INPUTS}, {}),
+    Rule(ODD_KVA, "{gs_rated_kva} kVA isn't a standard single-phase size - is that right?",
+         {'gs_phase': frozenset((1,))}, {'gs_rated_kva': SINGLE_PHASE_KVA}),
+    Rule(ODD_KVA, "{gs_rated_kva} kVA isn't a standard three-phase size - is that right?",
+         {'gs_phase': frozenset((3,))}, {'gs_rated_kva': THREE_PHASE_KVA}),
+)
+
+
+def parse_fields(inputs):
+    # (values, errors): the fields in SCHEMA that have a usable value, typed
+    values = {}
+    errors = []
+    for name, field in SCHEMA.items():
+        text = inputs.get(name)
+        if not text:
+            continue
+        try:
+            value = field.parse(text)
+        except ValueError:
+            value = None
+        if value is None or (field.low is not None and value < field.low) or \
+                (field.high is not None and value > field.high):
+            if field.error and field.error not in errors:
+                errors.append(field.error)
+            continue
+        values[name] = value
+    return values, errors
+
+
+def rule_applies(rule, values):
+    for name, allowed in rule.when.items():
+        if values.get(name) not in allowed:
+            return False
+    for name, allowed in rule.unless.items():
+        if name not in values or values[name] in allowed:
+            return False
+    return True
+
+
+def check_entry(inputs):
+    # inputs is a field -> text dict, blank fields left out
+    # Returns (errors, warnings): errors are messages that should stop the save,
+    # warnings are (code, message) pairs that might be deliberate
+    values, errors = parse_fields(inputs)
+    if errors:
+        return errors, []
+    return errors, [(rule.code, rule.message.format(**inputs))
+                    for rule in RULES if rule_applies(rule, values)]
+
+
+def check_records(records):
+    # check_entry() for a whole CSV's worth of assets (see csvout.read_records),
+    # returned as one (errors, warnings) per asset. Each field is parsed once,
+    # then every rule is tested against the whole column at a time.
+    records = list(records)
+    parsed = [parse_fields(inputs) for inputs in records]
+    results = [(errors, []) for values, errors in parsed]
+    # Assets with errors don't get warnings, same as check_entry()
+    ok = [not errors for values, errors in parsed]
+    for rule in RULES:
+        fires = _rule_mask(rule, [values for values, errors in parsed])
+        for i, (inputs, fired) in enumerate(zip(records, fires)):
+            if fired and ok[i]:
+                results[i][1].append((rule.code, rule.message.format(**inputs)))
+    return results
+
+
+def _rule_mask(rule, rows):
+    # Which rows the rule applies to
+    if np is None:
+        return [rule_applies(rule, values) for values in rows]
+    mask = np.ones(len(rows), dtype=bool)
+    for conditions, wanted in ((rule.when, True), (rule.unless, False)):
+        for name, allowed in conditions.items():
+            # NaN for missing, which is never in a set
+            column = np.array([values.get(name, np.nan) for values in rows], dtype=np.float64)
+            inside = np.isin(column, sorted(allowed))
+            mask &= inside if wanted else (~inside & ~np.isnan(column))
+    return mask.tolist()
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------
+# gpstagger/widgets.py
+#
+# Created on: 2026-10-18
+#
+# Tk widgets shared by the taggers
+
+try:
+    import tkinter as tk  # Python 3.x
+except ImportError:  # Python 2.x
+    import Tkinter as tk
+
+from gpstagger.coords import Coordinate
+
+
+class CoordsList(tk.Frame):
+    # A scrolling list of Long,Lat rows backed by a plain Python list, for
+    # however many secondaries a pole has. Only `visible` rows of widgets
+    # ever exist; scrolling just changes which items they show.
+    # items holds Coordinates (or (long, lat) pairs), or None for a skipped slot, and
+    # there's always one blank row past the end for the next one.
+
+    def __init__(self, master, items, label, visible=10, on_change=None):
+        tk.Frame.__init__(self, master)
+        self.items = items
+        self.label = label  # index -> row label
+        self.on_change = on_change
+        self.top = 0
+        self.selected = None
+        self.rows = []
+        body = tk.Frame(self)
+        body.pack(side=tk.LEFT, fill=tk.BOTH, expand=tk.YES)
+        for i in range(visible):
+            row = tk.Frame(body)
+            lab = tk.Label(row, width=25, anchor='w')
+            ent = tk.Entry(row)
+            row.pack(side=tk.TOP, fill=tk.X, padx=5, pady=5)
+            lab.pack(side=tk.LEFT)
+            ent.pack(side=tk.RIGHT, expand=tk.YES, fill=tk.X)
+            ent.bind('<KeyRelease>', (lambda event, i=i: self._edited(i)))
+            ent.bind('<MouseWheel>', self._wheel)
+            ent.bind('<Button-4>', (lambda event: self.yview('scroll', -1, 'units')))
+            ent.bind('<Button-5>', (lambda event: self.yview('scroll', 1, 'units')))
+            self.rows.append((lab, ent))
+        self.scrollbar = tk.Scrollbar(self, command=self.yview)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.refresh()
+
+    def total(self):
+        return len(self.items) + 1
+
+    def refresh(self, keep=None):
+        # Re-point the row widgets at items[top:top + visible]
+        # The text of row `keep` is left alone, so it isn't reformatted mid-typing
+        self.top = max(0, min(self.top, self.total() - len(self.rows)))
+        for i, (lab, ent) in enumerate(self.rows):
+            index = self.top + i
+            if i == keep:
+                continue
+            ent.config(state=tk.NORMAL, bg='white')
+            ent.delete(0, tk.END)
+            if index < self.total():
+                lab.config(text=self.label(index))
+                if index < len(self.items) and self.items[index] is not None:
+                    ent.insert(0, Coordinate(*self.items[index]).format())
+                if index == self.selected:
+                    ent.config(bg='light yellow')
+            else:
+                lab.config(text='')
+                ent.config(state=tk.DISABLED)
+        total = float(self.total())
+        self.scrollbar.set(self.top / total, min(1.0, (self.top + len(self.rows)) / total))
+
+    def yview(self, *args):
+        if args[0] == 'moveto':
+            self.top = int(round(float(args[1]) * self.total()))
+        elif args[0] == 'scroll':
+            step = len(self.rows) if args[2] == 'pages' else 1
+            self.top += int(args[1]) * step
+        self.refresh()
+
+    def _wheel(self, event):
+        self.yview('scroll', -1 if event.delta > 0 else 1, 'units')
+
+    def select(self, index):
+        # Highlights an item (None for nothing) and scrolls it into view
+        self.selected = index
+        if index is not None and not self.top <= index < self.top + len(self.rows):
+            self.top = index - len(self.rows) // 2
+        self.refresh()
+
+    def set(self, index, value):
+        if index == len(self.items):
+            self.items.append(value)
+        else:
+            self.items[index] = value
+        self.refresh()
+
+    def _edited(self, i):
+        index = self.top + i
+        ent = self.rows[i][1]
+        try:
+            value = Coordinate.parse(ent.get())
+        except ValueError:
+            # Leave the last good value in place until it parses
+            ent.config(bg='pink')
+            return
+        ent.config(bg='light yellow' if index == self.selected else 'white')
+        if index == len(self.items):
+            if value is None:
+                return
+            self.items.append(value)
+            # The next blank row needs enabling
+            self.refresh(keep=i)
+        else:
+            self.items[index] = value
+        if self.on_change:
+            self.on_change()
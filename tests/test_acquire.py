@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+
+from gpstagger.acquire import AveragingRequest, FixRequest
+from tests import FakeRoot, gga
+
+
+class Feed(object):
+    # Hands out one more of fixes each time it's polled, like a receiver
+    # reporting once between checks
+    def __init__(self, fixes):
+        self.fixes = list(fixes)
+        self.polls = 0
+
+    def latest(self):
+        self.polls += 1
+        return self.fixes[min(self.polls, len(self.fixes)) - 1] if self.fixes else None
+
+    def fixes_since(self, seq):
+        # Like GPSReader.fixes_since, with seq the number of fixes seen so far
+        arrived = min(self.polls, len(self.fixes))
+        self.polls += 1
+        return arrived, self.fixes[max(seq, 0):arrived]
+
+
+class FixRequestTest(unittest.TestCase):
+    def setUp(self):
+        self.root = FakeRoot()
+        self.done = []
+        self.statuses = []
+
+    def request(self, get_fix, **kwargs):
+        request = FixRequest(self.root, get_fix, self.done.append, self.statuses.append, **kwargs)
+        request.start()
+        return request
+
+    def test_waits_for_a_position(self):
+        # The receiver reports 0,0 until it has a fix
+        fix = gga()
+        feed = Feed([None, gga(0.0, 0.0, quality=0), fix])
+        request = self.request(feed.latest)
+        self.assertTrue(request.active)
+        self.assertEqual(self.done, [])
+        self.assertTrue(self.statuses[-1].startswith('Waiting for GPS fix...'))
+        self.root.run()
+        self.assertEqual(self.done, [fix])
+        self.assertFalse(request.active)
+        self.assertEqual(self.statuses[-1], '')
+        self.assertIsNotNone(request.waited)
+
+    def test_holds_out_for_a_fix_class(self):
+        rtk_float = gga(quality=5, age=1.5)
+        feed = Feed([gga(quality=1), gga(quality=2, age=60), rtk_float])
+        self.request(feed.latest, fix_class='float')
+        self.assertIn('have GPS', self.statuses[-1])
+        self.root.run()
+        self.assertEqual(self.done, [rtk_float])
+        # Stale DGPS only counted as GPS
+        self.assertIn('Waiting for RTK float fix... 0/30s, have GPS (Esc to cancel)', self.statuses)
+
+    def test_timeout(self):
+        self.request(Feed([gga(0.0, 0.0)]).latest, timeout=0)
+        self.assertEqual(self.done, [None])
+        self.assertEqual(self.statuses[-1], 'No GPS fix after 0s - try again')
+        self.assertEqual(self.root.pending, {})
+
+    def test_cancel(self):
+        request = self.request(Feed([]).latest)
+        self.assertEqual(len(self.root.pending), 1)
+        request.cancel()
+        self.assertEqual(self.done, [None])
+        self.assertEqual(self.root.pending, {})
+        self.assertEqual(self.statuses[-1], 'GPS request cancelled')
+        # A second cancel is a no-op
+        request.cancel()
+        self.assertEqual(self.done, [None])
+
+
+class AveragingRequestTest(unittest.TestCase):
+    def test_averages_good_fixes(self):
+        root = FakeRoot()
+        done = []
+        statuses = []
+        fixes = [gga(33.75, -84.39), gga(33.7502, -84.3902, hdop=9.9), gga(33.7501, -84.3901),
+                 gga(33.7502, -84.3902, sats=3), gga(33.7502, -84.3902)]
+        request = AveragingRequest(root, Feed(fixes).fixes_since, done.append, statuses.append,
+                                   samples=3)
+        request.start()
+        root.run()
+        self.assertEqual(len(done), 1)
+        avg = done[0]
+        self.assertEqual(avg.samples, 3)
+        self.assertEqual(request.rejected, 2)
+        self.assertAlmostEqual(avg.latitude, 33.7501, places=6)
+        self.assertAlmostEqual(avg.longitude, -84.3901, places=6)
+        self.assertTrue(statuses[-1].startswith('Averaged 3 fixes (2 rejected), spread'))
+
+    def test_nothing_usable(self):
+        root = FakeRoot()
+        done = []
+        request = AveragingRequest(root, Feed([gga(hdop=9.9)] * 3).fixes_since, done.append,
+                                   timeout=0)
+        request.start()
+        root.run()
+        self.assertEqual(done, [None])
+        self.assertEqual(request.rejected, 1)
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+
+from gpstagger import coords
+from gpstagger.coords import Coordinate, Projection, format_number, project_records, utm_zone
+from tests import without_numpy
+
+# The CN Tower, the example on Wikipedia's UTM page: 17T 630084 4833438
+CN_TOWER = (-(79 + 23 / 60.0 + 13.7 / 3600), 43 + 38 / 60.0 + 33.24 / 3600)
+
+
+class FormatTest(unittest.TestCase):
+    def test_trailing_zeros(self):
+        self.assertEqual(format_number(12.5), '12.5')
+        self.assertEqual(format_number(33.0), '33.0')
+        self.assertEqual(format_number(-84.388123456789), '-84.3881235')
+        self.assertEqual(format_number(-84.388123456789, 3), '-84.388')
+
+    def test_no_exponent_or_negative_zero(self):
+        self.assertEqual(format_number(1e-7), '0.0000001')
+        self.assertEqual(format_number(-0.0), '0.0')
+        self.assertEqual(format_number(-1e-9), '0.0')
+
+    def test_coordinate_text(self):
+        position = Coordinate.parse(' -84.3881, 33.7490 ')
+        self.assertEqual((position.lon, position.lat), (-84.3881, 33.749))
+        self.assertEqual(position.format(), '-84.3881,33.749')
+        self.assertIsNone(Coordinate.parse(''))
+        self.assertRaises(ValueError, Coordinate.parse, '33.7')
+
+    def test_list_round_trip(self):
+        position = Coordinate(-84.1, 33.2, hdop=0.7, source='COM3')
+        self.assertEqual(Coordinate.from_list(position.to_list()).to_list(), position.to_list())
+        self.assertEqual(Coordinate.from_list([-84.1, 33.2]), position)
+
+
+class UTMTest(unittest.TestCase):
+    def check_cn_tower(self):
+        projection = Projection('utm')
+        eastings, northings = projection.transform([CN_TOWER[0]], [CN_TOWER[1]])
+        self.assertAlmostEqual(eastings[0], 630084, delta=1)
+        self.assertAlmostEqual(northings[0], 4833438, delta=1)
+        self.assertEqual(projection.name, 'EPSG:32617')
+
+    def test_known_point(self):
+        self.check_cn_tower()
+
+    def test_known_point_without_numpy(self):
+        with without_numpy(coords):
+            self.check_cn_tower()
+
+    def test_central_meridian(self):
+        # On the central meridian the easting is the false easting, and the
+        # northing is the scaled meridian arc - 4984944.378 m to 45 degrees
+        eastings, northings = Projection('utm:31n').transform([3.0, 3.0], [0.0, 45.0])
+        self.assertAlmostEqual(eastings[0], 500000, places=3)
+        self.assertAlmostEqual(northings[0], 0, places=3)
+        self.assertAlmostEqual(northings[1], 0.9996 * 4984944.378, delta=0.01)
+
+    def test_southern_hemisphere(self):
+        projection = Projection('utm:21s')
+        eastings, northings = projection.transform([-57.0], [0.0])
+        self.assertAlmostEqual(northings[0], 10000000, places=3)
+        self.assertEqual(projection.name, 'EPSG:32721')
+
+    def test_zone(self):
+        self.assertEqual(utm_zone(*CN_TOWER), (17, True))
+        self.assertEqual(utm_zone(151.2, -33.9), (56, False))
+        self.assertRaises(ValueError, Projection, 'utm:61n')
+
+    def test_project_records(self):
+        records = [{'long': CN_TOWER[0], 'lat': CN_TOWER[1]}, {'name': 'no position'}]
+        out = list(project_records(records, 'utm', chunk=1))
+        self.assertAlmostEqual(out[0]['easting'], 630084, delta=1)
+        self.assertEqual(out[0]['crs'], 'EPSG:32617')
+        self.assertNotIn('easting', out[1])
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+
+import os
+
+from gpstagger.csvout import (COLUMNAR, PARAMETER, CSVWriter, cell, convert_to_columnar, read_header,
+                              read_records)
+from tests import TempDirTestCase
+
+
+class CSVWriterTest(TempDirTestCase):
+    def setUp(self):
+        TempDirTestCase.setUp(self)
+        self.path = os.path.join(self.dir, 'assets.csv')
+
+    def test_parameter_layout(self):
+        writer = CSVWriter(self.path, layout=PARAMETER)
+        writer.write({'gs_equipment_location': 'BRW4', 'lat': 33.123456789})
+        writer.write({'gs_equipment_location': 'BRW5'})
+        writer.close()
+        self.assertEqual(list(read_records(self.path)),
+                         [{'gs_equipment_location': 'BRW4', 'lat': '33.1234568'},
+                          {'gs_equipment_location': 'BRW5'}])
+
+    def test_batches_until_flush(self):
+        writer = CSVWriter(self.path, ('a',), COLUMNAR, flush_every=3)
+        writer.write_many([{'a': 1}, {'a': 2}])
+        self.assertEqual(list(read_records(self.path)), [])
+        writer.write({'a': 3})
+        self.assertEqual(len(list(read_records(self.path))), 3)
+        writer.close()
+
+    def test_append_keeps_header(self):
+        writer = CSVWriter(self.path, ('a', 'b'), COLUMNAR)
+        writer.write({'a': 1, 'b': 2})
+        writer.close()
+        writer = CSVWriter(self.path, ('b',), COLUMNAR)
+        writer.write({'b': 3})
+        writer.close()
+        self.assertEqual(writer.path, self.path)
+        self.assertEqual(list(read_records(self.path)), [{'a': '1', 'b': '2'}, {'b': '3'}])
+
+    def test_new_fields_roll_over(self):
+        writer = CSVWriter(self.path, ('a',), COLUMNAR)
+        writer.write({'a': 1})
+        writer.close()
+        writer = CSVWriter(self.path, ('a', 'capture_time'), COLUMNAR)
+        writer.write({'a': 2, 'capture_time': 'now'})
+        writer.close()
+        rolled = os.path.join(self.dir, 'assets_2.csv')
+        self.assertEqual(writer.path, rolled)
+        self.assertEqual(read_header(self.path), ['a'])
+        self.assertEqual(list(read_records(rolled)), [{'a': '2', 'capture_time': 'now'}])
+        # And it's picked up again next time
+        self.assertEqual(CSVWriter(rolled, ('a', 'capture_time'), COLUMNAR).path, rolled)
+
+    def test_convert_to_columnar(self):
+        writer = CSVWriter(self.path, layout=PARAMETER)
+        writer.write({'gs_equipment_location': 'BRW4', 'extra': 'x'})
+        writer.write({'gs_equipment_location': 'BRW5', 'lat': '33.5'})
+        writer.close()
+        out = os.path.join(self.dir, 'columnar.csv')
+        self.assertEqual(convert_to_columnar(self.path, out, ('gs_equipment_location',)), 2)
+        self.assertEqual(read_header(out), ['gs_equipment_location', 'extra', 'lat'])
+
+    def test_only_positions_rounded(self):
+        self.assertEqual(cell(-84.388123456789, 'long'), '-84.3881235')
+        self.assertEqual(cell(1e-7, 'lat'), '0.0000001')
+        self.assertEqual(cell(0.123456789, 'hdop'), 0.123456789)
+        self.assertEqual(cell('text', 'lat'), 'text')
+
+    def test_metres_to_a_millimetre(self):
+        self.assertEqual(cell(630084.123456789, 'easting'), '630084.123')
+        self.assertEqual(cell(4833438.0, 'northing'), '4833438.0')
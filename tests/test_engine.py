@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+
+import os
+import time
+
+from gpstagger import validate
+from gpstagger.csvout import COLUMNAR, read_records
+from gpstagger.engine import CaptureEngine
+from gpstagger.fixlog import FixLogReader
+from gpstagger.reader import GPSReader
+from gpstagger.replay import synthetic_log
+from tests import TempDirTestCase, replay_port
+
+
+class CaptureEngineTest(TempDirTestCase):
+    def setUp(self):
+        TempDirTestCase.setUp(self)
+        self.csv = os.path.join(self.dir, 'assets.csv')
+
+    def engine(self, **kwargs):
+        engine = CaptureEngine(self.csv, **kwargs)
+        self.addCleanup(engine.close)
+        return engine
+
+    def test_save(self):
+        engine = self.engine()
+        engine.save({'gs_equipment_location': 'BRW4', 'long': '-84.39', 'lat': '33.75'})
+        engine.close()
+        records = list(read_records(self.csv))
+        self.assertEqual(len(records), 1)
+        self.assertEqual(records[0]['gs_equipment_location'], 'BRW4')
+        self.assertEqual(records[0]['lat'], '33.75')
+        self.assertIn('capture_time', records[0])
+        # Written out, so nothing left to recover
+        self.assertEqual(CaptureEngine(self.csv).recovered, [])
+
+    def test_recovers_saves_after_a_crash(self):
+        engine = CaptureEngine(self.csv, layout=COLUMNAR)
+        engine.save({'gs_equipment_location': 'BRW4'})
+        # Still buffered in the writer when the power goes
+        self.assertEqual(list(read_records(self.csv)), [])
+        engine.journal._file.close()
+        engine.writer._file.close()
+        engine = self.engine(layout=COLUMNAR)
+        self.assertEqual([r['gs_equipment_location'] for r in engine.recovered], ['BRW4'])
+        self.assertEqual([r['gs_equipment_location'] for r in read_records(self.csv)], ['BRW4'])
+        self.assertIn('BRW4', engine.pole_ids)
+
+    def test_check_against_saved_poles(self):
+        engine = self.engine()
+        engine.save({'gs_equipment_location': 'BRW4', 'long': '-84.39', 'lat': '33.75'})
+        errors, warnings = engine.check({'gs_equipment_location': 'BRW4'})
+        self.assertEqual([code for code, message in warnings], [(validate.DUPLICATE_POLE, 'BRW4')])
+        # A metre away under another number
+        errors, warnings = engine.check({'gs_equipment_location': 'BRW5', 'long': '-84.39',
+                                         'lat': '33.75001'})
+        self.assertEqual([code for code, message in warnings], [(validate.NEARBY_POLE, 'BRW4')])
+        self.assertEqual(engine.check({'gs_equipment_location': 'BRW9', 'long': '-84.0', 'lat': '33.0'}),
+                         ([], []))
+        self.assertEqual(engine.next_pole_number('BRW4'), 'BRW5')
+
+    def test_poles_from_last_time(self):
+        engine = CaptureEngine(self.csv)
+        engine.save({'gs_equipment_location': 'BRW4', 'long': '-84.39', 'lat': '33.75'})
+        engine.close()
+        self.assertEqual(self.engine().next_pole_number('BRW4'), 'BRW5')
+
+    def test_fix_to_saved_position(self):
+        reader = GPSReader(replay_port(synthetic_log(epochs=20, lat=33.75, lon=-84.39)))
+        track = os.path.join(self.dir, 'assets_track.fix')
+        engine = self.engine(reader=reader, track_path=track)
+        reader.start()
+        self.addCleanup(reader.join, 5)
+        self.addCleanup(reader.stop)
+        msg = engine.wait_for_fix(timeout=5)
+        self.assertIsNotNone(msg)
+        self.assertIsNotNone(engine.last_wait)
+        self.assertEqual(engine.fix_status().name, 'GPS')
+        position = engine.record_fix(msg)
+        engine.save({'gs_equipment_location': 'BRW4'}, position)
+        # The whole log read, and the reader done with the track
+        deadline = time.time() + 5
+        while reader.fixes_since(0)[0] < 20 and time.time() < deadline:
+            time.sleep(0.01)
+        reader.stop()
+        reader.join(5)
+        engine.close()
+        record = list(read_records(self.csv))[0]
+        self.assertAlmostEqual(float(record['lat']), msg.latitude, places=7)
+        self.assertAlmostEqual(float(record['long']), msg.longitude, places=7)
+        # Every fix went to the track as well
+        with FixLogReader(track) as log:
+            self.assertEqual(len(log), 20)
+
+    def test_no_receiver(self):
+        engine = self.engine()
+        self.assertIsNone(engine.latest_fix())
+        self.assertIsNone(engine.fix_status())
+        self.assertIsNone(engine.wait_for_fix(timeout=0))
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+
+import os
+import xml.etree.ElementTree as ET
+import zipfile
+
+from gpstagger import export
+from gpstagger.csvout import COLUMNAR, CSVWriter
+from gpstagger.journal import Journal
+from gpstagger.kmlout import read_points
+from tests import TempDirTestCase
+
+NS = '{http://www.opengis.net/kml/2.2}'
+
+
+def regions(kml):
+    # partition name -> (south, north, west, east, href) from an index KML
+    found = {}
+    for link in ET.fromstring(kml).iter(NS + 'NetworkLink'):
+        box = link.find(NS + 'Region/' + NS + 'LatLonAltBox')
+        name = link.find(NS + 'name').text.rsplit(' (', 1)[0]
+        found[name] = tuple(float(box.find(NS + side).text) for side in ('south', 'north', 'west', 'east'))
+        found[name] += (link.find(NS + 'Link/' + NS + 'href').text,)
+    return found
+
+
+class ExportTest(TempDirTestCase):
+    def setUp(self):
+        TempDirTestCase.setUp(self)
+        self.assets = os.path.join(self.dir, 'assets.csv')
+        writer = CSVWriter(self.assets, ('gs_equipment_location', 'feeder', 'lat', 'long'), COLUMNAR)
+        writer.write({'gs_equipment_location': 'P1', 'feeder': 'F1', 'lat': 33.751, 'long': -84.391})
+        writer.write({'gs_equipment_location': 'P2', 'feeder': 'F1', 'lat': 33.752, 'long': -84.392})
+        writer.write({'gs_equipment_location': 'P3', 'feeder': 'index', 'lat': 33.9, 'long': -84.1})
+        writer.write({'gs_equipment_location': 'P4', 'feeder': 'F2'})
+        writer.close()
+        # A save still waiting in the journal counts too
+        journal = Journal(self.assets + '.journal')
+        journal.record_entry({'gs_equipment_location': 'P5', 'lat': '33.7515', 'long': '-84.3915'})
+        journal.close(discard=False)
+
+    def test_tiles_kmz(self):
+        out = os.path.join(self.dir, 'project.kmz')
+        self.assertEqual(export.export([self.assets], out, jobs=1), (4, 1, 2))
+        with zipfile.ZipFile(out) as z:
+            found = regions(z.read('doc.kml'))
+            self.assertEqual(len(found), 2)
+            for name, (south, north, west, east, href) in found.items():
+                # Each Region is the whole grid tile, however few poles it has
+                self.assertAlmostEqual(north - south, export.TILE_SIZE)
+                self.assertAlmostEqual(east - west, export.TILE_SIZE)
+                self.assertIn(href, z.namelist())
+            self.assertEqual(found[export.tile_name(33.9, -84.1)][:4], export.tile_bounds(33.9, -84.1))
+            names = [p[1] for p in read_points(self.extract(z, found[export.tile_name(33.751, -84.391)][4]))]
+        self.assertEqual(sorted(names), ['P1', 'P2', 'P5'])
+
+    def extract(self, z, member):
+        path = os.path.join(self.dir, 'part.kml')
+        with open(path, 'wb') as f:
+            f.write(z.read(member))
+        return path
+
+    def test_by_field_folder(self):
+        out = os.path.join(self.dir, 'project')
+        self.assertEqual(export.export([self.assets], out, field='feeder', jobs=1), (4, 1, 3))
+        with open(os.path.join(out, 'index.kml'), 'rb') as f:
+            found = regions(f.read())
+        self.assertEqual(sorted(found), ['F1', 'index', 'unassigned'])
+        # A partition named index is written alongside index.kml, not over it
+        self.assertEqual(found['index'][4], 'index_.kml')
+        self.assertEqual([p[1] for p in read_points(os.path.join(out, 'index_.kml'))], ['P3'])
+        for name, (south, north, west, east, href) in found.items():
+            # A lone pole still gets a box with some area to it
+            self.assertGreaterEqual(north - south, export.TILE_SIZE - 1e-9)
+            self.assertGreaterEqual(east - west, export.TILE_SIZE - 1e-9)
+        south, north, west, east, href = found['index']
+        self.assertTrue(south < 33.9 < north and west < -84.1 < east)
+
+    def test_padded_bounds(self):
+        # Wide partitions aren't padded, narrow ones are centred on their poles
+        wide = [{'lat': 30.0, 'long': -85.0}, {'lat': 31.0, 'long': -84.0}]
+        self.assertEqual(export.padded_bounds(wide), (30.0, 31.0, -85.0, -84.0))
+        south, north, west, east = export.padded_bounds([{'lat': 89.99, 'long': 10.0}])
+        self.assertEqual(north, 90.0)
+        self.assertAlmostEqual((west + east) / 2, 10.0)
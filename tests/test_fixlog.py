@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+
+from collections import namedtuple
+import math
+import os
+
+from gpstagger import fixlog
+from gpstagger.csvout import read_records
+from gpstagger.fixlog import (HEADER, MAGIC_V1, NO_HDOP, NO_SATS, NO_SOURCE, RECORD_V1, FixLog,
+                              FixLogReader, is_fixlog, to_csv)
+from tests import TempDirTestCase, without_numpy
+
+# What FixLog needs from a GGA message
+Fix = namedtuple('Fix', 'latitude longitude altitude gps_qual num_sats horizontal_dil source')
+
+
+def fixes(count, start=1000.0):
+    # (when, fix) pairs a tenth of a second apart, alternating receivers
+    for i in range(count):
+        yield start + i * 0.1, Fix(33.75 + i * 1e-6, -84.39 - i * 1e-6, '300.25', '4', '12', '0.8',
+                                   ('COM3', 'COM7')[i % 2])
+
+
+class FixLogTest(TempDirTestCase):
+    def setUp(self):
+        TempDirTestCase.setUp(self)
+        self.path = os.path.join(self.dir, 'day.fix')
+
+    def write(self, pairs):
+        log = FixLog(self.path)
+        for when, fix in pairs:
+            log.write(fix, when)
+        log.close()
+
+    def check_round_trip(self):
+        written = list(fixes(250))
+        self.write(written)
+        self.assertTrue(is_fixlog(self.path))
+        with FixLogReader(self.path) as reader:
+            self.assertEqual(len(reader), 250)
+            self.assertEqual(reader.sources, ['COM3', 'COM7'])
+            rows = list(reader.rows(chunk=100))
+            for (when, fix), row in zip(written, rows):
+                self.assertEqual(row[:3], (when, fix.latitude, fix.longitude))
+                self.assertAlmostEqual(row[3], 300.25)
+                self.assertEqual(row[4:7], (80, 12, 4))
+                self.assertEqual(reader.source_name(row[7]), fix.source)
+            # Time ranges by bisection: [start, end)
+            self.assertEqual(reader.index_range(1001.0, 1002.0), (10, 20))
+            self.assertEqual(len(reader.query(1001.0, 1002.0)), 10)
+            self.assertEqual([r[0] for r in reader.rows(every=100)], [1000.0, 1010.0, 1020.0])
+
+    def test_round_trip(self):
+        if fixlog.np is None:
+            self.skipTest("NumPy isn't installed")
+        self.check_round_trip()
+
+    def test_round_trip_without_numpy(self):
+        with without_numpy(fixlog):
+            self.check_round_trip()
+
+    def test_unknowns(self):
+        self.write([(5.0, Fix(1.0, 2.0, '', '1', '', '', None))])
+        with FixLogReader(self.path) as reader:
+            row = list(reader.rows())[0]
+        self.assertTrue(math.isnan(row[3]))
+        self.assertEqual(row[4:], (NO_HDOP, NO_SATS, 1, NO_SOURCE))
+
+    def test_torn_record_dropped_on_reopen(self):
+        self.write(fixes(10))
+        with open(self.path, 'ab') as f:
+            f.write(b'\x01\x02\x03')
+        with FixLogReader(self.path) as reader:
+            self.assertEqual(len(reader), 10)
+        # Appending carries on from the last whole record, keeping the receivers
+        self.write(fixes(5, start=2000.0))
+        with FixLogReader(self.path) as reader:
+            rows = list(reader.rows())
+            self.assertEqual(len(rows), 15)
+            self.assertEqual(rows[10][0], 2000.0)
+            self.assertEqual(reader.sources, ['COM3', 'COM7'])
+
+    def test_version_1_log(self):
+        with open(self.path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC_V1, RECORD_V1.size))
+            for i in range(3):
+                f.write(RECORD_V1.pack(1.0 + i, 33.0, -84.0, 1.5, 80, 9, 1))
+        self.write(fixes(1, start=10.0))
+        with FixLogReader(self.path) as reader:
+            self.assertEqual(reader.version, 1)
+            rows = list(reader.rows())
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[0], (1.0, 33.0, -84.0, 1.5, 80, 9, 1, NO_SOURCE))
+        self.assertEqual(rows[3][0], 10.0)
+
+    def test_not_a_fix_log(self):
+        with open(self.path, 'wb') as f:
+            f.write(b'time,lat,long\n1000.0,33.75,-84.39\n')
+        self.assertFalse(is_fixlog(self.path))
+        self.assertRaises(ValueError, FixLogReader, self.path)
+        self.assertRaises(ValueError, FixLog, self.path)
+
+    def test_to_csv(self):
+        self.write(fixes(20))
+        out = os.path.join(self.dir, 'day.csv')
+        self.assertEqual(to_csv(self.path, out, 1000.5, every=2), 8)
+        records = list(read_records(out))
+        self.assertEqual([r['source'] for r in records[:2]], ['COM7', 'COM7'])
+        self.assertEqual(records[0]['time'], '1000.500')
+        self.assertEqual(records[0]['hdop'], '0.80')
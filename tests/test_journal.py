@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+
+import os
+import struct
+import zlib
+
+from gpstagger.journal import HEADER, Journal, pending_entries, read_journal, replay
+from tests import TempDirTestCase
+
+
+class JournalTest(TempDirTestCase):
+    def setUp(self):
+        TempDirTestCase.setUp(self)
+        self.path = os.path.join(self.dir, 'assets.csv.journal')
+
+    def write_entries(self, *entries):
+        journal = Journal(self.path)
+        for inputs in entries:
+            journal.record_entry(inputs)
+        journal.close(discard=False)
+
+    def test_entries_survive_a_restart(self):
+        self.write_entries({'gs_equipment_location': 'BRW4'}, {'gs_equipment_location': 'BRW5'})
+        journal = Journal(self.path)
+        self.assertEqual([e['gs_equipment_location'] for e in journal.pending], ['BRW4', 'BRW5'])
+        journal.close(discard=False)
+
+    def test_torn_tail_is_dropped_and_truncated(self):
+        self.write_entries({'gs_equipment_location': 'BRW4'})
+        good = os.path.getsize(self.path)
+        # A record whose payload was only half written when the power went
+        payload = b'{"kind": "entry", "data": {"gs_equipment_location": "BRW5"}}'
+        with open(self.path, 'ab') as f:
+            f.write(HEADER.pack(len(payload), zlib.crc32(payload) & 0xffffffff) + payload[:20])
+        records, end = read_journal(self.path)
+        self.assertEqual(end, good)
+        self.assertEqual(len(records), 1)
+
+        journal = Journal(self.path)
+        self.assertEqual([e['gs_equipment_location'] for e in journal.pending], ['BRW4'])
+        self.assertEqual(os.path.getsize(self.path), good)
+        # New records go straight after the last good one
+        journal.record_entry({'gs_equipment_location': 'BRW6'})
+        journal.close(discard=False)
+        self.assertEqual([e['gs_equipment_location'] for e in pending_entries(self.path)],
+                         ['BRW4', 'BRW6'])
+
+    def test_bad_crc_drops_the_rest(self):
+        self.write_entries({'n': 1}, {'n': 2}, {'n': 3})
+        with open(self.path, 'rb') as f:
+            data = bytearray(f.read())
+        # Flip a byte in the second record's payload
+        length = struct.unpack_from('<I', data, 0)[0]
+        data[HEADER.size + length + HEADER.size + 2] ^= 0xFF
+        with open(self.path, 'wb') as f:
+            f.write(bytes(data))
+        self.assertEqual(pending_entries(self.path), [{'n': 1}])
+
+    def test_pending_entries_replay(self):
+        journal = Journal(self.path)
+        journal.record_entry({'n': 1})
+        journal.record_draft({'gs_equipment_location': 'typed'})
+        journal.mark_exported()
+        journal.record_entry({'n': 2})
+        journal.record_draft({'gs_equipment_location': 'half'})
+        journal.close(discard=False)
+        self.assertEqual(pending_entries(self.path), [{'n': 2}])
+        pending, draft = replay(read_journal(self.path)[0])
+        self.assertEqual(draft, {'gs_equipment_location': 'half'})
+
+    def test_missing_journal_has_nothing_pending(self):
+        self.assertEqual(pending_entries(self.path), [])
+
+    def test_clean_close_removes_it(self):
+        journal = Journal(self.path)
+        journal.record_entry({'n': 1})
+        journal.mark_exported()
+        journal.close()
+        self.assertFalse(os.path.exists(self.path))
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+
+import os
+import xml.etree.ElementTree as ET
+import zipfile
+
+from gpstagger.kmlout import KML_TAIL, KMLWriter, read_points, to_kmz
+from tests import TempDirTestCase
+
+NS = '{http://www.opengis.net/kml/2.2}'
+
+
+class KMLWriterTest(TempDirTestCase):
+    def setUp(self):
+        TempDirTestCase.setUp(self)
+        self.path = os.path.join(self.dir, 'project.kml')
+
+    def write_pole(self, writer, name, lon, lat, secondaries=()):
+        placemarks = [(name, lon, lat, [('Height', 40.0)])] + list(secondaries)
+        lines = [(s[0], (lon, lat), (s[1], s[2]), [('Length (ft)', 120)]) for s in secondaries]
+        writer.write_folder(name, placemarks, lines)
+
+    def test_valid_kml(self):
+        writer = KMLWriter(self.path)
+        self.write_pole(writer, 'BRW4 & co', -84.39, 33.75, [('S1', -84.3905, 33.7504)])
+        writer.close()
+        doc = ET.parse(self.path).getroot().find(NS + 'Document')
+        self.assertEqual(doc.find(NS + 'name').text, 'project')
+        folder = doc.find(NS + 'Folder')
+        self.assertEqual(folder.find(NS + 'name').text, 'BRW4 & co')
+        self.assertEqual(len(folder.findall(NS + 'Placemark')), 3)
+        self.assertEqual(list(read_points(self.path)),
+                         [('BRW4 & co', 'BRW4 & co', -84.39, 33.75), ('BRW4 & co', 'S1', -84.3905, 33.7504)])
+
+    def test_reopen_appends(self):
+        writer = KMLWriter(self.path, 'Territory')
+        self.write_pole(writer, 'P1', -84.39, 33.75)
+        writer.close()
+        writer = KMLWriter(self.path)
+        # What's already there is known about
+        self.assertTrue(writer.has_folder('P1'))
+        self.assertEqual(writer.poles.nearest(33.75, -84.39)[0][3], 'P1')
+        self.write_pole(writer, 'P2', -84.38, 33.76)
+        writer.close()
+        doc = ET.parse(self.path).getroot().find(NS + 'Document')
+        self.assertEqual(doc.find(NS + 'name').text, 'Territory')
+        self.assertEqual([f.find(NS + 'name').text for f in doc.findall(NS + 'Folder')], ['P1', 'P2'])
+
+    def test_unclosed_after_a_crash(self):
+        writer = KMLWriter(self.path)
+        self.write_pole(writer, 'P1', -84.39, 33.75)
+        # No close() - the file just stops after the folder
+        writer._file.close()
+        with open(self.path, 'rb') as f:
+            self.assertFalse(f.read().endswith(KML_TAIL.encode('utf-8')))
+        writer = KMLWriter(self.path)
+        self.write_pole(writer, 'P2', -84.38, 33.76)
+        writer.close()
+        self.assertEqual([p[1] for p in read_points(self.path)], ['P1', 'P2'])
+        ET.parse(self.path)
+
+    def test_to_kmz(self):
+        writer = KMLWriter(self.path)
+        self.write_pole(writer, 'P1', -84.39, 33.75)
+        writer.close()
+        kmz = to_kmz(self.path)
+        self.assertEqual(kmz, os.path.join(self.dir, 'project.kmz'))
+        with zipfile.ZipFile(kmz) as z, open(self.path, 'rb') as f:
+            self.assertEqual(z.read('doc.kml'), f.read())
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import threading
+
+from gpstagger.metrics import Histogram, Metrics, format_seconds
+from tests import TempDirTestCase
+
+
+class HistogramTest(TempDirTestCase):
+    def test_buckets_and_percentiles(self):
+        histogram = Histogram()
+        for ms in range(1, 101):
+            histogram.observe(ms / 1000.0)
+        self.assertEqual(histogram.count, 100)
+        self.assertAlmostEqual(histogram.sum, 5.05)
+        self.assertAlmostEqual(histogram.percentile(50), 0.051)
+        self.assertAlmostEqual(histogram.percentile(95), 0.096)
+        # 1 ms is in the <= 1 ms bucket, 100 ms in <= 100 ms
+        self.assertEqual(histogram.to_dict()['buckets']['0.001'], 1)
+        self.assertEqual(histogram.to_dict()['buckets']['0.1'], 50)
+        self.assertEqual(sum(histogram.buckets), 100)
+
+    def test_only_recent_samples_kept(self):
+        histogram = Histogram()
+        for i in range(Histogram.window + 10):
+            histogram.observe(1.0 if i < 10 else 0.001)
+        self.assertEqual(histogram.percentile(100), 0.001)
+        self.assertEqual(histogram.count, Histogram.window + 10)
+
+    def test_sparkline(self):
+        histogram = Histogram()
+        self.assertEqual(histogram.sparkline(), u'')
+        for seconds in (0.001, 0.001, 0.001, 0.001, 0.01):
+            histogram.observe(seconds)
+        # From the fastest bucket used to the slowest
+        line = histogram.sparkline()
+        self.assertEqual(len(line), 4)
+        self.assertEqual(line[0], u'█')
+        self.assertEqual(line[1:3], u'  ')
+
+
+class MetricsTest(TempDirTestCase):
+    def setUp(self):
+        TempDirTestCase.setUp(self)
+        self.metrics = Metrics()
+
+    def test_span_and_timed(self):
+        with self.metrics.span('save'):
+            pass
+
+        @self.metrics.timed('save')
+        def save():
+            "Saves"
+            return 42
+        self.assertEqual(save(), 42)
+        self.assertEqual((save.__name__, save.__doc__), ('save', 'Saves'))
+        self.assertEqual(self.metrics.spans['save'].count, 2)
+
+    def test_counters_from_several_threads(self):
+        def count():
+            for _ in range(1000):
+                self.metrics.count('bytes', 2)
+        threads = [threading.Thread(target=count) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.metrics.count('nothing', 0)
+        self.assertEqual(self.metrics.counters, {'bytes': 8000})
+
+    def test_summary(self):
+        self.metrics.observe('fix_wait', 0.25)
+        self.metrics.count('fix_timeouts')
+        self.assertEqual(self.metrics.summary(), u'fix_wait █ 250.0 ms  fix_timeouts 1')
+        self.assertEqual(self.metrics.summary(names=[], counters=['missing']), u'')
+
+    def test_prometheus_dump(self):
+        self.metrics.observe('engine_save', 0.003)
+        self.metrics.count('nmea_bytes', 82)
+        path = os.path.join(self.dir, 'gpstagger.prom')
+        self.metrics.dump(path)
+        with open(path) as f:
+            lines = f.read().splitlines()
+        self.assertIn('# TYPE gpstagger_engine_save_seconds histogram', lines)
+        self.assertIn('gpstagger_engine_save_seconds_bucket{le="0.0025"} 0', lines)
+        self.assertIn('gpstagger_engine_save_seconds_bucket{le="0.005"} 1', lines)
+        self.assertIn('gpstagger_engine_save_seconds_bucket{le="+Inf"} 1', lines)
+        self.assertIn('gpstagger_engine_save_seconds_count 1', lines)
+        self.assertIn('gpstagger_nmea_bytes_total 82', lines)
+        # Dumping again replaces the file
+        self.metrics.count('nmea_bytes', 1)
+        self.metrics.dump(path)
+        with open(path) as f:
+            self.assertIn('gpstagger_nmea_bytes_total 83', f.read())
+        self.assertFalse(os.path.exists(path + '.tmp'))
+
+    def test_json_dump_and_reset(self):
+        self.metrics.observe('kml_write', 0.002)
+        path = os.path.join(self.dir, 'metrics.json')
+        self.metrics.dump(path)
+        with open(path) as f:
+            data = json.load(f)
+        self.assertEqual(data['spans']['kml_write']['count'], 1)
+        self.metrics.reset()
+        self.assertEqual((self.metrics.spans, self.metrics.counters), ({}, {}))
+
+    def test_format_seconds(self):
+        self.assertEqual(format_seconds(0.0123), '12.3 ms')
+        self.assertEqual(format_seconds(2.5), '2.5 s')
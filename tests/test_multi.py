@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+
+from gpstagger.multi import BEST, BLEND, ReceiverSet, blend, expected_error
+from gpstagger.quality import FIX_FLOAT_RTK, FIX_GPS
+from tests import gga
+
+
+class StubReader(object):
+    # What ReceiverSet needs from a GPSReader, with a fixed latest fix
+    def __init__(self, source, fixes=(), age=0.1, writable=True):
+        self.source = source
+        self.fixes = list(fixes)
+        self.age = age
+        self.writable = writable
+        self.written = []
+        self.listeners = []
+
+    def latest(self):
+        return self.fixes[-1] if self.fixes else None
+
+    def fix_age(self):
+        return self.age if self.fixes else None
+
+    def fixes_since(self, seq):
+        return len(self.fixes), self.fixes[max(seq, 0):]
+
+    def write(self, data):
+        if self.writable:
+            self.written.append(data)
+        return self.writable
+
+    def add_listener(self, listener):
+        self.listeners.append(listener)
+
+    def remove_listener(self, listener):
+        self.listeners.remove(listener)
+
+
+class ExpectedErrorTest(unittest.TestCase):
+    def test_by_fix_type_and_hdop(self):
+        self.assertAlmostEqual(expected_error(gga(quality=FIX_GPS, hdop=2.0)), 10.0)
+        self.assertAlmostEqual(expected_error(gga(quality=FIX_FLOAT_RTK, hdop=1.0)), 0.5)
+        self.assertIsNone(expected_error(gga(quality=6)))
+        self.assertIsNone(expected_error(gga(0.0, 0.0)))
+        self.assertIsNone(expected_error(None))
+
+    def test_blend_weights_by_accuracy(self):
+        # An RTK float fix a hundred times the weight of a GPS one at the same HDOP
+        rtk = gga(33.0, -84.0, quality=5, hdop=1.0, source='COM7')
+        plain = gga(33.001, -84.001, hdop=1.0)
+        fix = blend([rtk, plain])
+        self.assertAlmostEqual(fix.latitude, 33.0 + 0.001 / 101, places=9)
+        self.assertAlmostEqual(fix.longitude, -84.0 - 0.001 / 101, places=9)
+        self.assertEqual(fix.gps_qual, rtk.gps_qual)
+        self.assertEqual(fix.source, 'COM7+COM3')
+        # Reported as an HDOP at the best fix type: slightly better than its own
+        self.assertLess(fix.horizontal_dil, 1.0)
+        self.assertAlmostEqual(expected_error(fix), 0.5 / 101 ** 0.5 * 10, places=9)
+
+
+class ReceiverSetTest(unittest.TestCase):
+    def setUp(self):
+        self.internal = StubReader('COM3', [gga(33.0, -84.0, hdop=1.2, source='COM3')])
+        self.external = StubReader('COM7', [gga(33.00001, -84.00001, quality=5, hdop=0.9,
+                                                source='COM7')])
+        self.receivers = ReceiverSet([self.internal, self.external])
+
+    def test_best(self):
+        self.assertIs(self.receivers.latest(), self.external.latest())
+        self.assertIs(self.receivers.best_reader(), self.external)
+        self.assertEqual(self.receivers.source, 'COM3+COM7')
+        # Only the best receiver's fixes go to averaging
+        seq, msgs = self.receivers.fixes_since(None)
+        self.assertEqual(seq, (1, 1))
+        self.assertEqual(msgs, self.external.fixes)
+
+    def test_stale_receiver_skipped(self):
+        self.external.age = 5.0
+        self.assertIs(self.receivers.latest(), self.internal.latest())
+        self.assertEqual(self.receivers.fix_age(), 0.1)
+
+    def test_blend(self):
+        self.receivers.mode = BLEND
+        fix = self.receivers.latest()
+        self.assertEqual(fix.source, 'COM7+COM3')
+        self.assertTrue(33.0 < fix.latitude < 33.00001)
+        # Every receiver's fixes still go to the log
+        self.assertEqual(len(self.receivers.wait_since(None, timeout=0)[1]), 2)
+
+    def test_nothing_usable_yet(self):
+        waiting = StubReader('COM3', [gga(0.0, 0.0, quality=0)])
+        receivers = ReceiverSet([StubReader('COM7'), waiting], BEST)
+        self.assertIs(receivers.latest(), waiting.latest())
+        self.assertIsNone(receivers.wait_for_fix(timeout=0))
+        self.assertIsNone(ReceiverSet([StubReader('COM7')]).latest())
+
+    def test_corrections_and_listeners_go_to_every_receiver(self):
+        self.internal.writable = False
+        self.assertTrue(self.receivers.write(b'rtcm'))
+        self.assertEqual(self.external.written, [b'rtcm'])
+        listener = object()
+        self.receivers.add_listener(listener)
+        self.assertEqual((self.internal.listeners, self.external.listeners), ([listener], [listener]))
+        self.receivers.remove_listener(listener)
+        self.assertEqual(self.internal.listeners, [])
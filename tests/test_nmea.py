@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+
+from gpstagger.nmea import MAX_SENTENCE, NMEAFramer, checksum_ok
+
+
+def sentence(body):
+    calc = 0
+    for c in bytearray(body):
+        calc ^= c
+    return b'$' + body + '*{0:02X}'.format(calc).encode('ascii')
+
+
+GGA = sentence(b'GPGGA,123519,4807.038,N,01131.000,E,1,08,0.9,545.4,M,46.9,M,,')
+RMC = sentence(b'GNRMC,123519,A,4807.038,N,01131.000,E,022.4,084.4,230394,003.1,W')
+GSV = sentence(b'GPGSV,3,1,11,03,03,111,00,04,15,270,00,06,01,010,00,13,06,292,00')
+
+
+class ChecksumTest(unittest.TestCase):
+    def test_good(self):
+        self.assertTrue(checksum_ok(GGA))
+
+    def test_wrong_digits(self):
+        self.assertFalse(checksum_ok(GGA[:-2] + b'00'))
+
+    def test_missing_or_malformed(self):
+        self.assertFalse(checksum_ok(GGA[:GGA.rfind(b'*')]))
+        self.assertFalse(checksum_ok(GGA + b'0'))
+        self.assertFalse(checksum_ok(GGA[:-2] + b'ZZ'))
+
+
+class FramerTest(unittest.TestCase):
+    def test_only_gga_by_default(self):
+        framer = NMEAFramer()
+        found = framer.feed(GGA + b'\r\n' + GSV + b'\r\n' + RMC + b'\r\n')
+        self.assertEqual(found, [GGA])
+        self.assertEqual((framer.sentences, framer.skipped, framer.bad_checksums), (3, 2, 0))
+
+    def test_wanted_sentences_any_talker(self):
+        framer = NMEAFramer((b'GGA', b'RMC'))
+        found = framer.feed(GGA + b'\r\n' + GSV + b'\r\n' + RMC + b'\r\n')
+        self.assertEqual(found, [GGA, RMC])
+
+    def test_split_across_reads(self):
+        framer = NMEAFramer()
+        data = GGA + b'\r\n'
+        self.assertEqual(framer.feed(data[:10]), [])
+        self.assertEqual(framer.feed(data[10:]), [GGA])
+
+    def test_bad_checksum_rejected(self):
+        framer = NMEAFramer()
+        corrupt = GGA.replace(b'4807.038', b'4807.039')
+        self.assertEqual(framer.feed(corrupt + b'\r\n'), [])
+        self.assertEqual(framer.bad_checksums, 1)
+
+    def test_cut_short_sentence_resyncs(self):
+        framer = NMEAFramer()
+        # A dropped byte leaves half a sentence in front of the next one
+        self.assertEqual(framer.feed(RMC[:30] + GGA + b'\r\n'), [GGA])
+
+    def test_over_length_garbage_dropped(self):
+        framer = NMEAFramer()
+        # A '$' followed by noise and no newline never becomes a sentence
+        framer.feed(b'$GPGGA,' + b'9' * (MAX_SENTENCE + 10))
+        self.assertEqual(framer.feed(b'\r\n'), [])
+        self.assertEqual(framer.feed(GGA + b'\r\n'), [GGA])
+
+    def test_noise_without_dollar_dropped(self):
+        framer = NMEAFramer()
+        self.assertEqual(framer.feed(b'\x00\xff' * 100), [])
+        self.assertEqual(framer.feed(GGA + b'\n'), [GGA])
+
+    def test_proprietary_skipped(self):
+        framer = NMEAFramer()
+        self.assertEqual(framer.feed(sentence(b'PGGA,1,2') + b'\r\n'), [])
+        self.assertEqual(framer.skipped, 1)
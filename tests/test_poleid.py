@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+
+from gpstagger.poleid import PoleRegistry, looks_like_typo, parse
+
+
+class ParseTest(unittest.TestCase):
+    def test_parts(self):
+        self.assertEqual(parse('BRW4')[:4], ('', 'BRW', 4, ''))
+        self.assertEqual(parse('BRW4-N9')[:4], ('BRW4-', 'N', 9, ''))
+        self.assertEqual(parse('BRW4-6A')[:4], ('BRW4-', '', 6, 'A'))
+
+    def test_no_number(self):
+        self.assertIsNone(parse('BRW'))
+        self.assertIsNone(parse('BRW4-N'))
+
+    def test_increment(self):
+        self.assertEqual(parse('BRW4').with_number(5), 'BRW5')
+        self.assertEqual(parse('BRW4-N9').with_number(10), 'BRW4-N10')
+        self.assertEqual(parse('BRW4-6A').with_number(7), 'BRW4-7A')
+
+    def test_zero_padding_kept(self):
+        self.assertEqual(parse('BRW09').with_number(10), 'BRW10')
+        self.assertEqual(parse('P007').with_number(8), 'P008')
+        self.assertEqual(parse('P099').with_number(100), 'P100')
+        # Unpadded numbers stay unpadded
+        self.assertEqual(parse('P9').with_number(10), 'P10')
+
+    def test_typos(self):
+        self.assertTrue(looks_like_typo('BRW4-N9!'))
+        self.assertFalse(looks_like_typo('BRW4-N9'))
+        self.assertFalse(looks_like_typo('Substation'))
+
+
+class RegistryTest(unittest.TestCase):
+    def test_next_free_skips_used(self):
+        registry = PoleRegistry(['BRW4', 'BRW5', 'BRW7'])
+        self.assertEqual(registry.next_free('BRW4'), 'BRW6')
+        self.assertEqual(registry.next_free('BRW6'), 'BRW8')
+
+    def test_next_free_padded(self):
+        registry = PoleRegistry(['P008', 'P009'])
+        self.assertEqual(registry.next_free('P007'), 'P010')
+
+    def test_sequences_are_separate(self):
+        registry = PoleRegistry(['BRW4-N1', 'BRW4-N2', 'BRW5-N1'])
+        self.assertEqual(registry.next_free('BRW5-N1'), 'BRW5-N2')
+        self.assertEqual(registry.next_free('BRW4-N1'), 'BRW4-N3')
+
+    def test_case_insensitive(self):
+        registry = PoleRegistry(['brw5'])
+        self.assertIn('BRW5', registry)
+        self.assertEqual(registry.next_free('BRW4'), 'BRW6')
+
+    def test_no_number(self):
+        self.assertIsNone(PoleRegistry().next_free('Substation'))
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+
+import math
+import unittest
+
+from gpstagger import quality
+from gpstagger.geodesy import EARTH_RADIUS
+from gpstagger.quality import (FIX_FLOAT_RTK, QualityFilter, average_fixes, fix_rank, fix_status, meets,
+                               status_text)
+from tests import gga
+
+
+class QualityFilterTest(unittest.TestCase):
+    def test_screening(self):
+        screen = QualityFilter()
+        self.assertTrue(screen.accepts(gga()))
+        self.assertFalse(screen.accepts(None))
+        self.assertFalse(screen.accepts(gga(0.0, 0.0)))
+        self.assertFalse(screen.accepts(gga(hdop=2.6)))
+        self.assertFalse(screen.accepts(gga(sats=4)))
+        self.assertFalse(screen.accepts(gga(quality=6)))
+        self.assertFalse(screen.accepts(gga(hdop='')))
+
+    def test_fix_class(self):
+        screen = QualityFilter(fix_class='dgps')
+        self.assertFalse(screen.accepts(gga(quality=1)))
+        self.assertTrue(screen.accepts(gga(quality=2, age=3)))
+        self.assertTrue(screen.accepts(gga(quality=4, age=1)))
+
+
+class FixClassTest(unittest.TestCase):
+    def test_ranks(self):
+        self.assertEqual([fix_rank(gga(quality=q)) for q in range(9)], [0, 1, 2, 1, 4, 3, 0, 0, 0])
+        self.assertEqual(fix_rank(gga(0.0, 0.0, quality=4)), 0)
+
+    def test_stale_corrections_count_as_gps(self):
+        stale = gga(quality=4, age=quality.max_correction_age + 1)
+        self.assertEqual(fix_rank(stale), 1)
+        self.assertTrue(meets(stale, 'gps'))
+        self.assertFalse(meets(stale, 'dgps'))
+        self.assertTrue(meets(stale, 'rtk', max_age=60))
+
+    def test_meets(self):
+        rtk_float = gga(quality=5, age=1)
+        self.assertTrue(meets(rtk_float, 'float'))
+        self.assertFalse(meets(rtk_float, 'rtk'))
+        self.assertTrue(meets(gga(), None))
+        self.assertFalse(meets(None, None))
+
+    def test_status(self):
+        status = fix_status(gga(quality=5, sats=12, hdop=0.8, age=1.2, station='0042'))
+        self.assertEqual((status.quality, status.name, status.rank), (FIX_FLOAT_RTK, 'RTK float', 3))
+        self.assertEqual(status.station, '0042')
+        self.assertEqual(status_text(status), 'RTK float, 12 sats, HDOP 0.8, corrections 1.2 s old')
+        stale = fix_status(gga(quality=2, age=45))
+        self.assertTrue(status_text(stale).endswith('corrections 45.0 s old (stale)'))
+        # An autonomous fix has no correction age, whatever the GGA says
+        self.assertIsNone(fix_status(gga(quality=1, age=5)).correction_age)
+        self.assertEqual(status_text(fix_status(None)), 'No data from the GPS')
+
+
+class AverageTest(unittest.TestCase):
+    def test_mean_and_spread(self):
+        # Four fixes a metre north, south, east and west of a point
+        lat, lon = 45.0, -75.0
+        dlat = math.degrees(1.0 / EARTH_RADIUS)
+        dlon = dlat / math.cos(math.radians(lat))
+        fixes = [gga(lat + dlat, lon), gga(lat - dlat, lon), gga(lat, lon + dlon), gga(lat, lon - dlon)]
+        avg = average_fixes(fixes)
+        self.assertAlmostEqual(avg.latitude, lat, places=6)
+        self.assertAlmostEqual(avg.longitude, lon, places=6)
+        self.assertAlmostEqual(avg.altitude, 300.0)
+        self.assertEqual(avg.samples, 4)
+        self.assertAlmostEqual(avg.spread, 1.0, places=2)
+
+    def test_nothing_to_average(self):
+        self.assertIsNone(average_fixes([]))
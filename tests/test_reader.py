@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+
+import logging
+import time
+import unittest
+
+import serial
+
+from gpstagger import metrics, reader
+from gpstagger.reader import GPSReader, has_position, shared_reader
+from gpstagger.replay import ReplaySerial, synthetic_log
+from tests import replay_port
+
+LOG = synthetic_log(epochs=20, lat=33.75, lon=-84.39)
+
+
+def port(cls=ReplaySerial, log=LOG):
+    return replay_port(log, cls)
+
+
+class FlakySerial(ReplaySerial):
+    # A port that can't be opened the first time, like one still held by
+    # another program
+    def __init__(self, *args, **kwargs):
+        ReplaySerial.__init__(self, *args, **kwargs)
+        self.failures = 1
+
+    def open(self):
+        if self.failures:
+            self.failures -= 1
+            raise serial.SerialException('port busy')
+        ReplaySerial.open(self)
+
+
+class GPSReaderTest(unittest.TestCase):
+    def start(self, ser):
+        gps = GPSReader(ser)
+        gps.start()
+        self.addCleanup(gps.join, 5)
+        self.addCleanup(gps.stop)
+        return gps
+
+    def test_latest_fix_without_touching_the_port(self):
+        gps = self.start(port())
+        fix = gps.wait_for_fix(timeout=5)
+        self.assertIsNotNone(fix)
+        self.assertAlmostEqual(fix.latitude, 33.75, places=3)
+        self.assertEqual(fix.source, 'replay:<memory>')
+        self.assertIsNotNone(gps.fix_age())
+
+    def test_fixes_since(self):
+        gps = self.start(port())
+        seen = 0
+        fixes = []
+        while len(fixes) < 20:
+            seen, new = gps.wait_since(seen, timeout=5)
+            self.assertTrue(new, "reader stopped delivering fixes")
+            fixes.extend(new)
+        self.assertEqual(len(fixes), 20)
+        self.assertEqual(gps.fixes_since(seen), (seen, []))
+        self.assertIs(gps.latest(), fixes[-1])
+
+    def test_reopens_after_a_serial_error(self):
+        gps = GPSReader(port(FlakySerial))
+        gps.retry_delay = 0.01
+        gps.start()
+        self.addCleanup(gps.join, 5)
+        self.addCleanup(gps.stop)
+        self.assertIsNotNone(gps.wait_for_fix(timeout=5))
+
+    def test_stop_closes_the_port(self):
+        ser = port()
+        gps = GPSReader(ser)
+        gps.start()
+        gps.wait_for_fix(timeout=5)
+        gps.stop()
+        gps.join(5)
+        self.assertFalse(gps.is_alive())
+        self.assertFalse(ser.is_open)
+
+    def test_wait_times_out(self):
+        gps = GPSReader(port(log=b''))
+        self.assertIsNone(gps.wait_for_fix(timeout=0.05))
+        self.assertFalse(has_position(None))
+
+    def test_failing_listener_is_dropped(self):
+        # e.g. the track log's disk filling up
+        def full_disk(msg, when):
+            raise IOError(28, 'No space left on device')
+        heard = []
+        before = metrics.METRICS.counters.get('listener_errors', 0)
+        gps = GPSReader(port())
+        gps.add_listener(full_disk)
+        gps.add_listener(lambda msg, when: heard.append(msg))
+        logging.disable(logging.CRITICAL)
+        self.addCleanup(logging.disable, logging.NOTSET)
+        gps.start()
+        self.addCleanup(gps.join, 5)
+        self.addCleanup(gps.stop)
+        deadline = time.time() + 5
+        while len(heard) < 20 and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(len(heard), 20)
+        self.assertTrue(gps.is_alive())
+        self.assertEqual([(l, type(e)) for l, e in gps.failed_listeners], [(full_disk, IOError)])
+        self.assertEqual(metrics.METRICS.counters['listener_errors'], before + 1)
+
+    def test_shared_reader(self):
+        self.addCleanup(reader.stop_all)
+        ser = port()
+        first = shared_reader(ser)
+        self.assertIs(shared_reader(ser), first)
+        self.assertTrue(first.is_alive())
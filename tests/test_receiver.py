@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+
+import os
+
+import serial.tools.list_ports as list_ports
+from serial.tools.list_ports_common import ListPortInfo
+
+from gpstagger import receiver
+from gpstagger.receiver import PortFinder, find_port, load_cached, remember, same_receiver, scan, scan_all
+from tests import TempDirTestCase
+
+
+def port(device, description='n/a', vid=None, pid=None, serial_number=None):
+    info = ListPortInfo(device)
+    info.description = description
+    info.vid, info.pid, info.serial_number = vid, pid, serial_number
+    return info
+
+
+USB = port('COM7', 'u-blox GNSS receiver', 0x1546, 0x01a8, 'A1')
+BUILT_IN = port('COM3', 'Generic GNSS Sensor')
+NMEA = port('COM9', 'NMEA Device')
+MODEM = port('COM4', 'Modem', 0x1234, 0x0001, 'Z9')
+
+
+class ReceiverTest(TempDirTestCase):
+    def setUp(self):
+        TempDirTestCase.setUp(self)
+        self.patch(receiver, 'CACHE_PATH', os.path.join(self.dir, 'config', 'receiver.json'))
+        self.ports = [MODEM, USB, NMEA]
+        self.patch(list_ports, 'comports', lambda: list(self.ports))
+
+    def patch(self, owner, name, value):
+        self.addCleanup(setattr, owner, name, getattr(owner, name))
+        setattr(owner, name, value)
+
+    def test_remember(self):
+        self.assertIsNone(load_cached())
+        remember(USB)
+        self.assertEqual(load_cached(), {'device': 'COM7', 'vid': 0x1546, 'pid': 0x01a8,
+                                         'serial_number': 'A1', 'description': 'u-blox GNSS receiver'})
+
+    def test_usb_receiver_on_another_port(self):
+        remember(USB)
+        moved = port('COM12', 'u-blox GNSS receiver', 0x1546, 0x01a8, 'A1')
+        self.assertTrue(same_receiver(moved, load_cached()))
+        other = port('COM7', 'u-blox GNSS receiver', 0x1546, 0x01a8, 'B2')
+        self.assertFalse(same_receiver(other, load_cached()))
+        self.assertFalse(same_receiver(BUILT_IN, load_cached()))
+
+    def test_receiver_without_usb_ids(self):
+        remember(BUILT_IN)
+        self.assertTrue(same_receiver(port('COM3', 'Generic GNSS Sensor'), load_cached()))
+        self.assertFalse(same_receiver(port('COM5', 'Generic GNSS Sensor'), load_cached()))
+        self.assertFalse(same_receiver(port('COM3', 'Bluetooth link'), load_cached()))
+        self.assertFalse(same_receiver(port('COM3', 'Generic GNSS Sensor', 0x1546, 0x01a8), load_cached()))
+        self.assertFalse(same_receiver(BUILT_IN, None))
+
+    def test_scan_prefers_the_cached_receiver(self):
+        self.assertEqual(scan(), 'COM9')
+        remember(USB)
+        self.assertEqual(scan(), 'COM7')
+        self.ports = [MODEM]
+        self.assertIsNone(scan())
+
+    def test_scan_all(self):
+        remember(USB)
+        self.assertEqual(scan_all(), ['COM7', 'COM9'])
+
+    def test_cached_port_with_something_else_on_it(self):
+        # Not even opened - a full scan finds where the receiver went
+        remember(USB)
+        self.patch(receiver, 'port_info', lambda device: port(device, 'Modem', 0x1234, 0x0001))
+        self.ports = [MODEM, port('COM8', 'u-blox GNSS receiver', 0x1546, 0x01a8, 'A1')]
+        self.assertIsNone(receiver.probe_cached())
+        self.assertEqual(find_port(), 'COM8')
+        self.assertEqual(load_cached()['device'], 'COM8')
+
+    def test_port_finder(self):
+        finder = PortFinder(every=True)
+        finder.start()
+        finder.join(5)
+        self.assertTrue(finder.done())
+        self.assertEqual(finder.ports, ['COM9'])
+        self.ports = []
+        finder = PortFinder()
+        finder.start()
+        finder.join(5)
+        self.assertEqual(finder.ports, [])
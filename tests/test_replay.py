@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+
+import os
+import time
+
+from gpstagger import nmea
+from gpstagger.replay import REPLAY_PREFIX, ReplaySerial, nmea_seconds, synthetic_log
+from tests import TempDirTestCase
+
+
+def read_all(ser):
+    data = b''
+    while True:
+        chunk = ser.read(ser.in_waiting or 1)
+        if not chunk:
+            return data
+        data += chunk
+
+
+class SyntheticLogTest(TempDirTestCase):
+    def test_repeatable(self):
+        self.assertEqual(synthetic_log(50, seed=3), synthetic_log(50, seed=3))
+        self.assertNotEqual(synthetic_log(50, seed=3), synthetic_log(50, seed=4))
+
+    def test_every_sentence_valid(self):
+        log = synthetic_log(10)
+        framer = nmea.NMEAFramer((b'GGA', b'RMC', b'GSA', b'GSV'))
+        self.assertEqual(len(framer.feed(log)), 10 * 6)
+        self.assertEqual(framer.bad_checksums, 0)
+        self.assertEqual(len(nmea.NMEAFramer().feed(synthetic_log(10, chatter=False))), 10)
+
+    def test_southern_and_western_hemispheres(self):
+        lines = nmea.NMEAFramer().feed(synthetic_log(5, lat=-33.9, lon=-70.65))
+        for line in lines:
+            msg = nmea.parse(line)
+            self.assertAlmostEqual(msg.latitude, -33.9, places=3)
+            self.assertAlmostEqual(msg.longitude, -70.65, places=3)
+
+    def test_nmea_seconds(self):
+        self.assertEqual(nmea_seconds(b'$GPGGA,123519.50,4807.038,N'), 12 * 3600 + 35 * 60 + 19.5)
+        self.assertEqual(nmea_seconds(b'$GNRMC,000001,A'), 1)
+        self.assertIsNone(nmea_seconds(b'$GPGSV,3,1,11'))
+        self.assertIsNone(nmea_seconds(b'$GPGGA,,,'))
+
+
+class ReplaySerialTest(TempDirTestCase):
+    def test_flat_out(self):
+        log = synthetic_log(20)
+        ser = ReplaySerial(log, speed=None)
+        ser.timeout = 0.01
+        ser.open()
+        self.assertEqual(read_all(ser), log)
+        self.assertEqual(ser.port, REPLAY_PREFIX + '<memory>')
+        self.assertEqual(ser.write(b'\xd3\x00'), 2)
+        self.assertEqual(ser.written, 2)
+
+    def test_from_a_file(self):
+        path = os.path.join(self.dir, 'day.nmea')
+        with open(path, 'wb') as f:
+            f.write(synthetic_log(5))
+        ser = ReplaySerial(path, speed=None)
+        self.assertEqual(ser.port, REPLAY_PREFIX + path)
+        ser.timeout = 0.01
+        ser.open()
+        self.assertEqual(read_all(ser), synthetic_log(5))
+
+    def test_paced_by_the_log(self):
+        # One epoch a second, played twenty times as fast
+        log = synthetic_log(3, chatter=False)
+        ser = ReplaySerial(log, speed=20)
+        ser.open()
+        first = ser.read(ser.in_waiting)
+        self.assertEqual(first.count(b'GGA'), 1)
+        time.sleep(0.06)
+        self.assertEqual(ser.read(ser.in_waiting).count(b'GGA'), 1)
+
+    def test_past_midnight(self):
+        log = b'$GPGGA,235959.00,,*00\r\n$GPGSV,1*00\r\n$GPGGA,000000.00,,*00\r\n'
+        self.assertEqual([due for end, due in ReplaySerial(log)._schedule], [0, 0, 1])
+
+    def test_loop(self):
+        log = synthetic_log(2)
+        ser = ReplaySerial(log, speed=None, loop=True)
+        ser.open()
+        data = ser.read(len(log))
+        self.assertEqual(data + ser.read(len(log)), log * 2)
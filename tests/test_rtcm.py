@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+
+from gpstagger.rtcm import RTCMFramer, crc24q, epochs, make_frame, message_type
+
+
+def message(kind, size=10):
+    # A message of the given type: 12 bits of type, then zeros
+    return bytes(bytearray((kind >> 4, (kind & 0x0F) << 4))) + b'\x00' * size
+
+
+class CRCTest(unittest.TestCase):
+    def test_check_value(self):
+        # The standard check value for CRC-24Q
+        self.assertEqual(crc24q(b'123456789'), 0xCDE703)
+
+    def test_empty(self):
+        self.assertEqual(crc24q(b''), 0)
+
+
+class FramerTest(unittest.TestCase):
+    def test_frames_and_types(self):
+        frames = [make_frame(message(k)) for k in (1005, 1077, 1087)]
+        found = RTCMFramer().feed(b''.join(frames))
+        self.assertEqual(found, frames)
+        self.assertEqual([message_type(f) for f in found], [1005, 1077, 1087])
+
+    def test_split_and_noise(self):
+        frame = make_frame(message(1230))
+        framer = RTCMFramer()
+        self.assertEqual(framer.feed(b'noise' + frame[:6]), [])
+        self.assertEqual(framer.feed(frame[6:]), [frame])
+        self.assertEqual(framer.skipped, len(b'noise'))
+
+    def test_bad_crc_resyncs(self):
+        good = make_frame(message(1005))
+        bad = bytearray(make_frame(message(1077)))
+        bad[5] ^= 0x01
+        framer = RTCMFramer()
+        self.assertEqual(framer.feed(bytes(bad) + good), [good])
+        self.assertEqual(framer.bad_crcs, 1)
+
+    def test_epochs(self):
+        kinds = (1005, 1077, 1087, 1005, 1077, 1087, 1005)
+        data = b''.join(make_frame(message(k)) for k in kinds)
+        self.assertEqual([[message_type(f) for f in epoch] for epoch in epochs(data)],
+                         [[1005, 1077, 1087], [1005, 1077, 1087], [1005]])
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+
+import random
+import unittest
+
+from gpstagger.spatial import PoleIndex, distance
+
+
+def brute_force(poles, lat, lon):
+    return sorted((distance(lat, lon, p[0], p[1]),) + p for p in poles)
+
+
+class PoleIndexTest(unittest.TestCase):
+    def setUp(self):
+        rng = random.Random(7)
+        # A couple of km of poles, some bunched together, and a far-off stray
+        self.poles = [(33.75 + rng.uniform(-0.01, 0.01), -84.39 + rng.uniform(-0.01, 0.01),
+                       'P{0}'.format(i), None) for i in range(500)]
+        self.poles += [(33.751 + rng.uniform(-2e-5, 2e-5), -84.391 + rng.uniform(-2e-5, 2e-5),
+                        'Q{0}'.format(i), None) for i in range(20)]
+        self.poles.append((34.5, -85.2, 'far', None))
+        self.index = PoleIndex()
+        for pole in self.poles:
+            self.index.add(*pole)
+        self.queries = [(33.751, -84.391), (33.75, -84.39), (33.7601, -84.3799), (34.0, -84.9)]
+
+    def test_within_matches_brute_force(self):
+        for lat, lon in self.queries:
+            for radius in (3.0, 25.0, 100.0, 1000.0):
+                expected = [p for p in brute_force(self.poles, lat, lon) if p[0] <= radius]
+                self.assertEqual(self.index.within(lat, lon, radius), expected)
+
+    def test_nearest_matches_brute_force(self):
+        for lat, lon in self.queries:
+            for n in (1, 5, 30):
+                self.assertEqual(self.index.nearest(lat, lon, n), brute_force(self.poles, lat, lon)[:n])
+
+    def test_nearest_far_away(self):
+        # Has to search out past every empty cell in between
+        found = self.index.nearest(34.49, -85.19)
+        self.assertEqual(found[0][3], 'far')
+
+    def test_nearest_more_than_there_are(self):
+        self.assertEqual(len(self.index.nearest(33.75, -84.39, 10000)), len(self.poles))
+
+    def test_high_latitude(self):
+        # Cells get narrow east-west near the poles
+        index = PoleIndex()
+        poles = [(78.2 + i * 1e-4, 15.6 + i * 3e-4, str(i), None) for i in range(50)]
+        for pole in poles:
+            index.add(*pole)
+        self.assertEqual(index.within(78.201, 15.603, 50.0),
+                         [p for p in brute_force(poles, 78.201, 15.603) if p[0] <= 50.0])
+        self.assertEqual(index.nearest(78.21, 15.7, 3), brute_force(poles, 78.21, 15.7)[:3])
+
+    def test_duplicates(self):
+        pairs = self.index.duplicates(3.0)
+        expected = set()
+        for i, a in enumerate(self.poles):
+            for b in self.poles[i + 1:]:
+                if distance(a[0], a[1], b[0], b[1]) <= 3.0:
+                    expected.add(frozenset((a[2], b[2])))
+        self.assertEqual(set(frozenset((a[2], b[2])) for d, a, b in pairs), expected)
+
+    def test_empty(self):
+        self.assertEqual(PoleIndex().nearest(0, 0), [])
+        self.assertEqual(PoleIndex().within(0, 0, 10), [])
@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+
+import os
+import unittest
+
+try:
+    from urllib.request import pathname2url  # Python 3.x
+    from urllib.parse import urljoin
+except ImportError:  # Python 2.x
+    from urllib import pathname2url
+    from urlparse import urljoin
+
+from gpstagger import mapview, tiles
+from gpstagger.kmlout import KMLWriter
+from gpstagger.mapview import PRIMARY, SECONDARY, MapData, clusters, visible_lines
+from gpstagger.spatial import PoleIndex
+from gpstagger.tiles import TILE_SIZE, TileCache, lonlat, mercator, mercator_many, tiles_in_bbox
+from tests import TempDirTestCase, without_numpy
+
+
+class MercatorTest(unittest.TestCase):
+    def test_round_trip(self):
+        self.assertEqual(mercator(-180.0, 0.0), (0.0, 0.5))
+        x, y = mercator(-84.39, 33.75)
+        lon, lat = lonlat(x, y)
+        self.assertAlmostEqual(lon, -84.39, places=9)
+        self.assertAlmostEqual(lat, 33.75, places=9)
+        # Clamped short of the poles
+        self.assertAlmostEqual(mercator(0.0, 90.0)[1], 0.0, places=9)
+
+    def check_many(self):
+        lons, lats = [-84.39, 151.2, 0.0], [33.75, -33.87, 89.0]
+        xs, ys = mercator_many(lons, lats)
+        for x, y, lon, lat in zip(xs, ys, lons, lats):
+            self.assertAlmostEqual(x, mercator(lon, lat)[0], places=12)
+            self.assertAlmostEqual(y, mercator(lon, lat)[1], places=12)
+
+    def test_many(self):
+        if tiles.np is None:
+            self.skipTest("NumPy isn't installed")
+        self.check_many()
+
+    def test_many_without_numpy(self):
+        with without_numpy(tiles):
+            self.check_many()
+
+    def test_tiles_in_bbox(self):
+        self.assertEqual(tiles_in_bbox(-85, -180, 85, 180, 0), [(0, 0, 0)])
+        self.assertEqual(len(tiles_in_bbox(-85, -180, 85, 180, 2)), 16)
+        # A point is in one tile; a box spanning tile edges in each it touches
+        self.assertEqual(tiles_in_bbox(33.75, -84.39, 33.75, -84.39, 10), [(10, 271, 409)])
+        self.assertEqual(tiles_in_bbox(33.70, -84.39, 33.75, -84.02, 10),
+                         [(10, x, y) for x in (271, 272, 273) for y in (409, 410)])
+
+
+class TileCacheTest(TempDirTestCase):
+    def setUp(self):
+        TempDirTestCase.setUp(self)
+        # A tile server on disk, ten bytes a tile
+        self.server = os.path.join(self.dir, 'server')
+        for z, x, y in tiles_in_bbox(-85, -180, 85, 180, 0) + tiles_in_bbox(-85, -180, 85, 180, 1):
+            folder = os.path.join(self.server, str(z), str(x))
+            if not os.path.isdir(folder):
+                os.makedirs(folder)
+            with open(os.path.join(folder, '{0}.png'.format(y)), 'wb') as f:
+                f.write('{0:010d}'.format(z * 100 + x * 10 + y).encode('ascii'))
+        self.url = urljoin('file:', pathname2url(self.server)) + '/{z}/{x}/{y}.png'
+        self.directory = os.path.join(self.dir, 'cache')
+
+    def test_fetch_and_get(self):
+        cache = TileCache(self.directory, self.url)
+        self.assertIsNone(cache.get(1, 1, 0))
+        path = cache.fetch(1, 1, 0)
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), b'0000000110')
+        self.assertEqual(cache.get(1, 1, 0), path)
+        self.assertEqual((len(cache), cache.size), (1, 10))
+        # Found again on the next start
+        self.assertEqual(len(TileCache(self.directory)), 1)
+
+    def test_missing_tile_not_asked_for_again(self):
+        cache = TileCache(self.directory, self.url)
+        self.assertIsNone(cache.fetch(5, 0, 0))
+        self.assertIn((5, 0, 0), cache._failed)
+        cache.url = None
+        self.assertIsNone(cache.fetch(5, 0, 0))
+
+    def test_least_recently_used_evicted(self):
+        cache = TileCache(self.directory, self.url, max_bytes=25)
+        first = cache.fetch(1, 0, 0)
+        cache.fetch(1, 0, 1)
+        # Looked at again, so the other one goes first
+        cache.get(1, 0, 0)
+        cache.fetch(1, 1, 0)
+        self.assertEqual((len(cache), cache.size), (2, 20))
+        self.assertEqual(cache.get(1, 0, 0), first)
+        self.assertIsNone(cache.get(1, 0, 1))
+        self.assertFalse(os.path.exists(cache.path(1, 0, 1)))
+
+    def test_seed(self):
+        cache = TileCache(self.directory, self.url)
+        cache.fetch(0, 0, 0)
+        progress = []
+        self.assertEqual(cache.seed(-85, -180, 85, 180, (0, 1, 2), lambda *a: progress.append(a)),
+                         (4, 1, 16))
+        self.assertEqual(progress[-1], (21, 21))
+        self.assertEqual(len(cache), 5)
+        cache.max_seed = 4
+        self.assertRaises(ValueError, cache.seed, -85, -180, 85, 180, (0, 1))
+        self.assertRaises(ValueError, TileCache(self.directory).seed, -85, -180, 85, 180, (0,))
+
+
+class MapDataTest(TempDirTestCase):
+    def test_points_poles_and_spans(self):
+        data = MapData()
+        self.assertIsNone(data.bounds())
+        data.add_points([('BRW4', -84.39, 33.75)])
+        # Saved by both taggers, shown once
+        data.add_pole('BRW4', (-84.39, 33.75), [('BRW4 #1', -84.3899, 33.7501)])
+        self.assertEqual(len(data), 2)
+        self.assertEqual(data.kinds, [PRIMARY, SECONDARY])
+        self.assertEqual(len(data.lines), 1)
+        left, top, right, bottom = data.bounds()
+        self.assertEqual((left, top), mercator(-84.39, 33.7501))
+        self.assertEqual(data.latest, mercator(-84.3899, 33.7501))
+        data.clear()
+        self.assertEqual((len(data), data.lines), (0, []))
+
+    def test_from_an_index_and_a_kml(self):
+        index = PoleIndex()
+        index.add(33.75, -84.39, 'BRW4')
+        path = os.path.join(self.dir, 'project.kml')
+        writer = KMLWriter(path)
+        writer.write_folder('BRW5', [('BRW5', -84.38, 33.75), ('BRW5 #1', -84.3801, 33.7501)])
+        writer.close()
+        data = MapData()
+        data.add_index(index)
+        data.add_kml(path)
+        self.assertEqual(data.names, ['BRW4', 'BRW5', 'BRW5 #1'])
+        self.assertEqual(len(data.lines), 1)
+
+    def check_arrays_and_clusters(self):
+        data = MapData()
+        # Three poles a few metres apart, and one a kilometre off
+        data.add_points([('BRW{0}'.format(i), -84.39 + i * 1e-5, 33.75) for i in range(3)])
+        data.add_points([('BRW9', -84.38, 33.75)])
+        data.add_pole(None, None, [('BRW9 #1', -84.3801, 33.75)])
+        by_kind, lines = data.arrays()
+        self.assertIs(data.arrays()[0], by_kind)
+        xs, ys, indexes = by_kind[PRIMARY]
+        self.assertEqual(list(indexes), [0, 1, 2, 3])
+        self.assertEqual(list(by_kind[SECONDARY][2]), [4])
+        scale = TILE_SIZE * 2 ** 15
+        left, top = xs[0] * scale - 100, ys[0] * scale - 100
+        found = sorted(clusters(xs, ys, indexes, scale, left, top, 400, 300))
+        self.assertEqual([(count, index) for x, y, count, index in found], [(3, 0), (1, 3)])
+        self.assertAlmostEqual(found[0][0], (xs[1] * scale - left), places=6)
+        # Panned away, nothing to draw
+        self.assertEqual(clusters(xs, ys, indexes, scale, left + 10000, top, 400, 300), [])
+        self.assertEqual(visible_lines(lines, scale, left, top, 400, 300), [])
+        data.add_pole('BRW9', (-84.38, 33.75), [('BRW9 #2', -84.3801, 33.75)])
+        by_kind, lines = data.arrays()
+        shown = visible_lines(lines, scale, left, top, 400, 300)
+        self.assertEqual(len(shown), 1)
+        self.assertAlmostEqual(shown[0][0], mercator(-84.38, 33.75)[0] * scale - left, places=6)
+        self.assertEqual(visible_lines(lines, scale, left - 10000, top, 400, 300), [])
+
+    def test_arrays_and_clusters(self):
+        if mapview.np is None:
+            self.skipTest("NumPy isn't installed")
+        self.check_arrays_and_clusters()
+
+    def test_arrays_and_clusters_without_numpy(self):
+        with without_numpy(mapview):
+            self.check_arrays_and_clusters()
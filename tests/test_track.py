@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+
+from collections import namedtuple
+import os
+
+from gpstagger import track
+from gpstagger.csvout import COLUMNAR, PARAMETER, CSVWriter, read_header, read_records
+from gpstagger.fixlog import FixLog
+from gpstagger.track import TRACK_FIELDS, TrackIndex, backfill, to_epoch, to_iso
+from tests import TempDirTestCase, without_numpy
+
+Fix = namedtuple('Fix', 'latitude longitude altitude gps_qual num_sats horizontal_dil source')
+
+
+class TrackIndexTest(TempDirTestCase):
+    def setUp(self):
+        TempDirTestCase.setUp(self)
+        # A fix log heading north-east once a second, with a gap in the middle
+        self.log = os.path.join(self.dir, 'day.fix')
+        log = FixLog(self.log)
+        for i in list(range(10)) + list(range(30, 40)):
+            log.write(Fix(30.0 + i * 1e-4, -80.0 + i * 1e-4, '', '1', '8', '1.0', None), 1000.0 + i)
+        log.close()
+        # And an earlier track CSV
+        self.csv = os.path.join(self.dir, 'early.csv')
+        writer = CSVWriter(self.csv, TRACK_FIELDS, COLUMNAR)
+        for i in range(5):
+            writer.write({'time': 500.0 + i, 'lat': 40.0 + i, 'long': -70.0 - i})
+        writer.close()
+        self.times = [999.0, 1000.0, 1002.5, 1008.5, 1015.0, 1035.25, 1039.0, 1040.0, 502.5]
+
+    def expected(self):
+        return [None, (30.0, -80.0), (30.00025, -79.99975), (30.00085, -79.99915), None,
+                (30.003525, -79.996475), (30.0039, -79.9961), None, (42.5, -72.5)]
+
+    def check(self, located):
+        for got, want in zip(located, self.expected()):
+            if want is None:
+                self.assertIsNone(got)
+            else:
+                self.assertAlmostEqual(got[0], want[0], places=9)
+                self.assertAlmostEqual(got[1], want[1], places=9)
+
+    def test_locate(self):
+        if track.np is None:
+            self.skipTest("NumPy isn't installed")
+        index = TrackIndex([self.log, self.csv])
+        self.assertEqual(len(index), 25)
+        self.check(index.locate(self.times))
+
+    def test_locate_without_numpy(self):
+        with without_numpy(track):
+            index = TrackIndex([self.log, self.csv])
+            self.assertEqual(len(index), 25)
+            self.check(index.locate(self.times))
+
+    def test_empty(self):
+        self.assertEqual(TrackIndex([]).locate([1.0]), [None])
+
+    def test_backfill(self):
+        assets = os.path.join(self.dir, 'assets.csv')
+        writer = CSVWriter(assets, ('gs_equipment_location', 'lat', 'long', 'capture_time'), COLUMNAR)
+        writer.write({'gs_equipment_location': 'A', 'capture_time': to_iso(1002.5)})
+        writer.write({'gs_equipment_location': 'B', 'capture_time': to_iso(1020.0)})
+        writer.write({'gs_equipment_location': 'C', 'lat': '1', 'long': '2', 'capture_time': to_iso(1001.0)})
+        writer.close()
+        out = os.path.join(self.dir, 'out.csv')
+        self.assertEqual(backfill(assets, [self.log], out), (3, 1))
+        records = list(read_records(out))
+        self.assertAlmostEqual(float(records[0]['lat']), 30.00025)
+        self.assertEqual(records[0]['position_source'], 'track')
+        self.assertNotIn('lat', records[1])
+        self.assertEqual(records[2]['lat'], '1')
+
+    def test_backfill_parameter_layout(self):
+        # Every attribute comes across, not just the position columns
+        assets = os.path.join(self.dir, 'assets.csv')
+        writer = CSVWriter(assets, layout=PARAMETER)
+        writer.write({'gs_equipment_location': 'A', 'gs_phase': 'B', 'capture_time': to_iso(1002.5)})
+        writer.write({'gs_equipment_location': 'B', 'gs_rated_kva': '25', 'capture_time': to_iso(1003.0)})
+        writer.close()
+        out = os.path.join(self.dir, 'out.csv')
+        self.assertEqual(backfill(assets, [self.log], out), (2, 2))
+        self.assertEqual(read_header(out), ['gs_equipment_location', 'gs_phase', 'capture_time',
+                                            'gs_rated_kva', 'long', 'lat', 'position_source'])
+        records = list(read_records(out))
+        self.assertEqual(records[0]['gs_phase'], 'B')
+        self.assertEqual(records[1]['gs_rated_kva'], '25')
+        self.assertEqual(records[1]['gs_equipment_location'], 'B')
+
+    def test_iso_round_trip(self):
+        self.assertAlmostEqual(to_epoch(to_iso(1234567890.25)), 1234567890.25)
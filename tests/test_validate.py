@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+
+import itertools
+import unittest
+
+from gpstagger import validate
+from gpstagger.validate import MIXED_VOLTAGES, NUMBERS_ONLY, ODD_KVA, check_entry, check_records
+from tests import without_numpy
+
+
+def sample_records():
+    # Every combination of a few values for the fields the rules look at,
+    # blanks included
+    values = {
+        'gs_rated_input_voltage': ('', '7200', '12470', '4800', 'x'),
+        'gs_rated_output_voltage': ('', '120', '240', '480'),
+        'gs_rated_kva': ('', '25', '37.5', '30', '112.5', '75', '333'),
+        'gs_phase': ('', '1', 'A', '3', 'ABC', 'BC', '?'),
+    }
+    names = sorted(values)
+    for combo in itertools.product(*(values[n] for n in names)):
+        yield dict((n, v) for n, v in zip(names, combo) if v)
+
+
+class CheckEntryTest(unittest.TestCase):
+    def test_numbers_only(self):
+        errors, warnings = check_entry({'gs_rated_kva': 'lots'})
+        self.assertEqual(errors, [NUMBERS_ONLY])
+
+    def test_coordinate_range(self):
+        errors, warnings = check_entry({'lat': '91', 'long': '-84'})
+        self.assertEqual(len(errors), 1)
+
+    def test_mixed_voltages(self):
+        errors, warnings = check_entry({'gs_rated_input_voltage': '12470', 'gs_rated_output_voltage': '120'})
+        self.assertEqual([code for code, message in warnings], [MIXED_VOLTAGES])
+
+    def test_odd_kva(self):
+        errors, warnings = check_entry({'gs_phase': 'A', 'gs_rated_kva': '30'})
+        self.assertEqual([code for code, message in warnings], [ODD_KVA])
+        self.assertIn('30 kVA', warnings[0][1])
+        self.assertEqual(check_entry({'gs_phase': 'ABC', 'gs_rated_kva': '75'}), ([], []))
+
+
+class CheckRecordsTest(unittest.TestCase):
+    def test_matches_check_entry(self):
+        records = list(sample_records())
+        expected = [check_entry(r) for r in records]
+        self.assertEqual(check_records(records), expected)
+
+    def test_numpy_and_python_agree(self):
+        if validate.np is None:
+            self.skipTest("NumPy isn't installed")
+        records = list(sample_records())
+        with_numpy = check_records(records)
+        with without_numpy(validate):
+            self.assertEqual(check_records(records), with_numpy)
+        # And there's something to compare
+        self.assertTrue(any(warnings for errors, warnings in with_numpy))
+        self.assertTrue(any(errors for errors, warnings in with_numpy))
+
+    def test_empty(self):
+        self.assertEqual(check_records([]), [])
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+
+try:
+    import tkinter as tk  # Python 3.x
+except ImportError:  # Python 2.x
+    import Tkinter as tk
+
+from gpstagger.coords import Coordinate
+from gpstagger.widgets import CoordsList
+
+
+def label(index):
+    return 'Secondary #{0}'.format(index + 1)
+
+
+class CoordsListTest(unittest.TestCase):
+    def setUp(self):
+        try:
+            self.root = tk.Tk()
+        except tk.TclError:
+            self.skipTest("No display")
+        self.addCleanup(self.root.destroy)
+        self.root.withdraw()
+        self.changes = []
+        self.items = [Coordinate(-84.39 + i * 1e-4, 33.75) for i in range(25)]
+        self.view = CoordsList(self.root, self.items, label, visible=10,
+                               on_change=lambda: self.changes.append(len(self.items)))
+
+    def row(self, i):
+        lab, ent = self.view.rows[i]
+        return lab.cget('text'), ent.get()
+
+    def test_only_visible_rows_exist(self):
+        self.assertEqual(len(self.view.rows), 10)
+        self.assertEqual(self.row(0), ('Secondary #1', self.items[0].format()))
+        self.assertEqual(self.row(9), ('Secondary #10', self.items[9].format()))
+
+    def test_scrolling(self):
+        self.view.select(20)
+        self.assertEqual(self.view.top, 15)
+        self.assertEqual(self.row(5), ('Secondary #21', self.items[20].format()))
+        self.assertEqual(self.view.rows[5][1].cget('bg'), 'light yellow')
+        # Past the end stops at the blank row for the next secondary
+        self.view.yview('moveto', 1.0)
+        self.assertEqual(self.view.top, 16)
+        self.assertEqual(self.row(9), ('Secondary #26', ''))
+        self.view.yview('scroll', -1, 'pages')
+        self.assertEqual(self.view.top, 6)
+
+    def test_typing_a_new_secondary(self):
+        del self.items[2:]
+        self.view.refresh()
+        self.assertEqual(str(self.view.rows[3][1].cget('state')), 'disabled')
+        ent = self.view.rows[2][1]
+        ent.insert(0, '-84.1, 33.2')
+        self.view._edited(2)
+        self.assertEqual(self.items[2], Coordinate(-84.1, 33.2))
+        self.assertEqual(self.changes, [3])
+        # The next blank row is enabled, and the typed one left as typed
+        self.assertEqual(str(self.view.rows[3][1].cget('state')), 'normal')
+        self.assertEqual(ent.get(), '-84.1, 33.2')
+
+    def test_bad_text_keeps_the_last_good_value(self):
+        before = self.items[1]
+        ent = self.view.rows[1][1]
+        ent.delete(0, tk.END)
+        ent.insert(0, '33.2')
+        self.view._edited(1)
+        self.assertEqual(ent.cget('bg'), 'pink')
+        self.assertIs(self.items[1], before)
+        self.assertEqual(self.changes, [])
+
+    def test_set(self):
+        self.view.set(25, Coordinate(-84.0, 33.0))
+        self.view.set(0, None)
+        self.assertEqual(len(self.items), 26)
+        self.assertEqual(self.row(0), ('Secondary #1', ''))